@@ -0,0 +1,142 @@
+"""
+환자 발화 기록(JSONL)을 Streamlit 없이 규칙 경로로 재생해 분류 결과를 JSONL로 내보내는 배치 도구.
+
+    python batch_triage.py transcripts.jsonl -o results.jsonl --workers 8 --chunk-size 256
+
+입력 한 줄: {"id": "...", "utterances": ["가슴이 아파요", "네", ...],
+             "patient_info": {...}(선택), "location_consent": false(선택)}
+출력 한 줄: {"id", "triage_level", "summary", "questions_asked", "turns"} 또는 {"id", "error"}
+
+화면(step2)과 같은 순서로 진행한다: 발화마다 step() → 자동 진단 조건이 되면 안내 문구 후 diagnose().
+입력은 청크 단위로 읽고 처리 중인 청크 수를 제한하므로 파일 크기와 무관하게 메모리가 일정하다.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, Iterable, Iterator, List, Optional, TextIO
+
+from triage_session import DIAGNOSIS_PHRASE, TriageSession
+
+
+def run_transcript(
+    utterances: Iterable[str],
+    patient_info: Optional[dict] = None,
+    location_consent: bool = False,
+) -> TriageSession:
+    """발화 목록을 한 세션으로 재생 (자동 진단 조건이 되면 남은 발화는 무시)"""
+    session = TriageSession(patient_info=patient_info, location_consent=location_consent)
+    for text in utterances:
+        text = (text or "").strip()
+        if not text:
+            continue
+        session.step(text)
+        if session.should_autodiagnose():
+            break
+    session.add_message("assistant", DIAGNOSIS_PHRASE)
+    session.diagnose()
+    return session
+
+
+def _result_for(line: str) -> dict:
+    rec = {}
+    try:
+        rec = json.loads(line)
+        session = run_transcript(
+            rec.get("utterances") or [],
+            patient_info=rec.get("patient_info"),
+            location_consent=bool(rec.get("location_consent", False)),
+        )
+    except Exception as e:  # 한 줄의 오류가 배치 전체를 멈추지 않도록
+        return {"id": rec.get("id") if isinstance(rec, dict) else None, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "id": rec.get("id"),
+        "triage_level": session.diagnosis["triage_level"],
+        "summary": session.diagnosis["summary"],
+        "questions_asked": [
+            m.content for m in session.messages[1:]
+            if m.role == "assistant" and m.content != DIAGNOSIS_PHRASE
+        ],
+        "turns": sum(1 for m in session.messages if m.role == "user"),
+    }
+
+
+def run_chunk(lines: List[str]) -> List[str]:
+    """워커 프로세스에서 실행: 입력 줄 묶음 → 출력 JSON 줄 묶음"""
+    return [json.dumps(_result_for(line), ensure_ascii=False) for line in lines]
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = (ln for ln in lines if ln.strip())
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(
+    src: TextIO,
+    dst: TextIO,
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    max_inflight: Optional[int] = None,
+) -> int:
+    """입력 순서대로 결과를 기록하고 처리한 세션 수를 반환"""
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or workers * 2
+    done = 0
+    pending: Deque[Future] = deque()
+
+    def drain_one() -> int:
+        out = pending.popleft().result()
+        dst.write("\n".join(out) + "\n")
+        return len(out)
+
+    if workers == 1:
+        for chunk in _chunks(src, chunk_size):
+            out = run_chunk(chunk)
+            dst.write("\n".join(out) + "\n")
+            done += len(out)
+        return done
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(src, chunk_size):
+            if len(pending) >= max_inflight:
+                done += drain_one()
+            pending.append(pool.submit(run_chunk, chunk))
+        while pending:
+            done += drain_one()
+    return done
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="규칙 경로로 발화 기록을 일괄 분류합니다.")
+    ap.add_argument("input", help="입력 JSONL 경로 ('-'는 stdin)")
+    ap.add_argument("-o", "--output", default="-", help="출력 JSONL 경로 (기본: stdout)")
+    ap.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본: CPU 수, 1이면 단일 프로세스)")
+    ap.add_argument("--chunk-size", type=int, default=256, help="워커에 한 번에 넘기는 세션 수")
+    ap.add_argument("--max-inflight", type=int, default=None, help="동시에 처리 중인 청크 상한 (기본: workers*2)")
+    args = ap.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    try:
+        n = run_batch(src, dst, workers=args.workers, chunk_size=args.chunk_size, max_inflight=args.max_inflight)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    elapsed = time.perf_counter() - t0
+    rate = n / elapsed if elapsed > 0 else float("inf")
+    print(f"{n} sessions in {elapsed:.2f}s ({rate:,.0f} sessions/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
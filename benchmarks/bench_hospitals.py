@@ -0,0 +1,97 @@
+"""
+병원 공간 인덱스 조회 지연 벤치마크 (전국 규모 합성 데이터).
+
+    python benchmarks/bench_hospitals.py [--facilities 60000] [--queries 2000]
+
+국내 위경도 범위에 기관을 무작위로 배치하고, 격자 인덱스의 nearest/within 조회를
+전체 배열 haversine(브루트포스)과 비교한다. 결과가 같은지도 함께 확인한다.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from hospitals import HospitalDirectory, haversine_km  # noqa: E402
+
+_LAT = (33.1, 38.6)
+_LON = (124.6, 131.9)
+
+
+def _records(n: int, rng: random.Random) -> List[dict]:
+    return [
+        {
+            "name": f"기관{i}",
+            "kind": "er" if rng.random() < 0.05 else "outpatient",
+            "lat": rng.uniform(*_LAT),
+            "lon": rng.uniform(*_LON),
+            "doctors": rng.randint(1, 60),
+            "beds": rng.randint(0, 800),
+        }
+        for i in range(n)
+    ]
+
+
+def _pctl(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, math.ceil(p / 100 * len(xs)) - 1))]
+
+
+def _bench(fn: Callable[[float, float], object], points: List[tuple]) -> List[float]:
+    out = []
+    for lat, lon in points:
+        t0 = time.perf_counter()
+        fn(lat, lon)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--facilities", type=int, default=60000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    recs = _records(args.facilities, rng)
+    t0 = time.perf_counter()
+    directory = HospitalDirectory(recs)
+    print(f"build: {args.facilities} facilities in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    lats = np.array([r["lat"] for r in recs])
+    lons = np.array([r["lon"] for r in recs])
+    kinds = np.array([r["kind"] for r in recs])
+    points = [(rng.uniform(*_LAT), rng.uniform(*_LON)) for _ in range(args.queries)]
+
+    for kind in ("er", "outpatient"):
+        mask = kinds == kind
+
+        def brute_nearest(lat: float, lon: float) -> np.ndarray:
+            d = haversine_km(lat, lon, lats[mask], lons[mask])
+            return np.sort(d)[:3]
+
+        for lat, lon in points[:200]:
+            got = [h["distance_km"] for h in directory.nearest(lat, lon, 3, kind)]
+            assert got == [round(x, 2) for x in brute_nearest(lat, lon).tolist()], "결과 불일치"
+
+        cases = {
+            "nearest k=3": lambda lat, lon: directory.nearest(lat, lon, 3, kind),
+            "within 10km": lambda lat, lon: directory.within(lat, lon, 10.0, kind, limit=50),
+            "brute-force k=3": brute_nearest,
+        }
+        print(f"\n[{kind}] {int(mask.sum())} facilities")
+        print(f"{'query':<18} {'p50(us)':>9} {'p99(us)':>9}")
+        for label, fn in cases.items():
+            xs = _bench(fn, points)
+            print(f"{label:<18} {_pctl(xs, 50):>9.1f} {_pctl(xs, 99):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
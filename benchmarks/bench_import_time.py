@@ -0,0 +1,91 @@
+"""
+단계별 콜드 스타트 import 시간 (`python -X importtime` 분해).
+
+    python benchmarks/bench_import_time.py [--repeat 5] [--top 15] [--budget-ms 1=60,2=400]
+
+새 인터프리터에서 streamlit을 먼저 불러온 뒤(서버 프로세스에는 이미 올라와 있으므로 제외)
+main.py가 그 단계에서 부르는 모듈(state + 단계 모듈)을 import하고, -X importtime 출력으로
+단계별 추가 import 시간과 오래 걸린 모듈을 보여준다. 반복 중 중앙값을 쓴다.
+--budget-ms를 주면 예산을 넘긴 단계가 있을 때 종료 코드 1 (첫 화면 회귀 검사용).
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = {1: "step1_info", 2: "step2_chatbot", 3: "step3_triage", 4: "step4_report"}
+_PRELOADED = "streamlit"
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$")
+
+
+def profile(modules: List[str]) -> List[Tuple[int, int, int, str]]:
+    """새 프로세스에서 modules를 import한 -X importtime 기록: (self_us, cumulative_us, depth, name)"""
+    code = f"import {_PRELOADED}, sys; sys.stderr.write('--mark--\\n'); import " + ", ".join(modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows, started = [], False
+    for line in proc.stderr.splitlines():
+        if line == "--mark--":
+            started = True
+            continue
+        m = _LINE.match(line)
+        if started and m:
+            rows.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return rows
+
+
+def step_profile(step: int, repeat: int) -> Tuple[float, Dict[str, float]]:
+    """(단계 전체 ms 중앙값, 모듈별 self ms 중앙값)"""
+    totals: List[float] = []
+    selfs: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        rows = profile(["state", STEPS[step]])
+        totals.append(sum(cum for _, cum, depth, _ in rows if depth == 0) / 1000)
+        for self_us, _, _, name in rows:
+            selfs.setdefault(name, []).append(self_us / 1000)
+    return statistics.median(totals), {k: statistics.median(v) for k, v in selfs.items()}
+
+
+def _parse_budget(spec: Optional[str]) -> Dict[int, float]:
+    if not spec:
+        return {}
+    out = {}
+    for part in spec.split(","):
+        step, ms = part.split("=")
+        out[int(step)] = float(ms)
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="단계별 콜드 스타트 import 시간")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="단계별로 보여줄 느린 모듈 수 (self 시간 기준)")
+    ap.add_argument("--budget-ms", default=None, help="단계별 예산, 예: 1=60,2=400")
+    args = ap.parse_args(argv)
+    budget = _parse_budget(args.budget_ms)
+
+    over = []
+    for step, module in STEPS.items():
+        total_ms, selfs = step_profile(step, args.repeat)
+        limit = budget.get(step)
+        flag = ""
+        if limit is not None and total_ms > limit:
+            flag = f"  OVER BUDGET ({limit:.0f} ms)"
+            over.append(step)
+        print(f"step {step} ({module}): {total_ms:8.1f} ms beyond {_PRELOADED}{flag}")
+        for name, ms in sorted(selfs.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {ms:8.2f} ms  {name}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
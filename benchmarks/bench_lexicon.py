@@ -0,0 +1,218 @@
+"""
+사전 스캔 마이크로 벤치마크: 기존 분석기별 `any(w in t ...)` 루프 vs 단일 패스 매처.
+
+    python benchmarks/bench_lexicon.py [--repeat 200]
+
+한 턴에 일어나는 분석(엔티티, 토픽, 요약, 위험도, 조기 종료)을 길이별 대화록에 대해
+두 방식으로 수행하고, 결과가 같은지 확인한 뒤 1회당 평균 시간을 출력한다.
+긴 대화록 한 덩어리에서는 any()로 일찍 끝나는 기존 루프가 유리하므로, 앱이 실제로 하는 방식
+(메시지마다 한 번 스캔해 SymptomIndex에 누적)으로 대화 전체를 처리한 시간도 비교한다.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexicon import (  # noqa: E402
+    KeywordMatcher, _fever_words, _gi_words, _pain_words, _region_map, _resp_words, _severity_words, _sweat_words,
+    _lexicons, entities_from_hits, risk_score_from_words, scan, strong_flags_from_words,
+    summary_from_words, topics_from_hits,
+)
+from symptom_index import SymptomIndex  # noqa: E402
+
+_TURNS = [
+    "어제 저녁부터 가슴이 조이듯이 아파요",
+    "네. 더 심해집니다.",
+    "숨이 좀 차고 식은땀도 나요",
+    "배도 살짝 아프고 메스꺼워요",
+    "열은 없는 것 같아요. 기침은 조금 있어요",
+    "아니요. 없습니다.",
+]
+
+
+# ---------------- 기존(베이스라인) 루프 구현 ----------------
+def _legacy_entities(t: str) -> Dict[str, str]:
+    region = None
+    for key, kws in _region_map.items():
+        if any(kw in t for kw in kws):
+            region = key
+            break
+    severity = None
+    for w in _severity_words:
+        if w in t:
+            severity = w
+            break
+    main_symptom = None
+    if any(w in t for w in _pain_words):
+        main_symptom = "통증"
+    elif any(w in t for w in _resp_words):
+        main_symptom = "호흡곤란/호흡불편"
+    elif any(w in t for w in _gi_words):
+        main_symptom = "위장관 증상"
+    assoc: List[str] = []
+    if any(w in t for w in _sweat_words):
+        assoc.append("식은땀")
+    if any(w in t for w in _fever_words):
+        assoc.append("발열")
+    return {
+        "region": region or "",
+        "severity": severity or "",
+        "main_symptom": main_symptom or "",
+        "assoc": ", ".join(assoc) if assoc else "",
+    }
+
+
+def _legacy_topics(t: str) -> List[str]:
+    topics: List[str] = []
+    if any(k in t for k in ["통증", "아픔", "쑤심", "찌름", "아려움"]):
+        topics.append("통증")
+    if any(k in t for k in ["가슴", "흉통", "심장", "흉부", "명치"]):
+        topics.append("가슴")
+    if any(k in t for k in ["호흡", "숨", "호흡곤란"]):
+        topics.append("호흡")
+    if any(k in t for k in ["기침", "가래"]):
+        topics.append("기침")
+    if any(k in t for k in ["발열", "열", "식은땀"]):
+        topics.append("발열/식은땀")
+    if any(k in t for k in ["어지럼", "실신", "쓰러짐"]):
+        topics.append("어지럼증")
+    if any(k in t for k in ["복부", "배", "아랫배", "윗배"]):
+        topics.append("복부")
+    return topics
+
+
+def _legacy_summary(text: str) -> str:
+    found: List[str] = []
+    if ("가슴" in text and "통증" in text) or "흉통" in text:
+        found.append("가슴 통증")
+    if ("숨" in text or "호흡" in text or "호흡곤란" in text):
+        found.append("호흡 곤란")
+    if "식은땀" in text:
+        found.append("식은땀")
+    if "실신" in text or "의식" in text:
+        found.append("실신/의식저하")
+    if "복부" in text and "통증" in text:
+        found.append("복부 통증")
+    if "발열" in text or "열" in text:
+        found.append("발열")
+    if "기침" in text:
+        found.append("기침")
+    if all(kw in text for kw in ["가슴", "통증", "식은땀"]) and ("숨" in text or "호흡" in text or "호흡곤란" in text):
+        return "가슴 통증, 식은땀, 호흡 곤란 증상."
+    if not found:
+        return "특이 증상 없음."
+    return f"{', '.join(found)} 증상."
+
+
+def _legacy_risk(convo: str) -> int:
+    risk_score = 0
+    if "가슴" in convo and "통증" in convo: risk_score += 3
+    if "숨" in convo or "호흡" in convo: risk_score += 2
+    if "식은땀" in convo: risk_score += 2
+    if "실신" in convo: risk_score += 2
+    if "복부" in convo and "통증" in convo: risk_score += 1
+    if "발열" in convo or "열" in convo: risk_score += 1
+    return risk_score
+
+
+def _legacy_strong(convo: str) -> bool:
+    return all(flag in convo for flag in ["가슴", "통증", "숨"]) and "식은땀" in convo
+
+
+def legacy_turn(text: str) -> tuple:
+    return (_legacy_entities(text), _legacy_topics(text), _legacy_summary(text),
+            _legacy_risk(text), _legacy_strong(text))
+
+
+def matcher_turn(text: str) -> tuple:
+    hits = scan(text)
+    return (entities_from_hits(hits), topics_from_hits(hits), summary_from_words(hits.words),
+            risk_score_from_words(hits.words), strong_flags_from_words(hits.words))
+
+
+def _analyze(hits) -> tuple:
+    return (entities_from_hits(hits), topics_from_hits(hits), summary_from_words(hits.words),
+            risk_score_from_words(hits.words), strong_flags_from_words(hits.words))
+
+
+def legacy_session(messages: List[str]) -> tuple:
+    """기존 방식: 턴마다 지금까지의 대화 전체를 이어붙여 다시 분석"""
+    out = ()
+    for i in range(1, len(messages) + 1):
+        out = legacy_turn(" ".join(messages[:i]))
+    return out
+
+
+def index_session(messages: List[str]) -> tuple:
+    """앱 방식: 새 메시지만 스캔해 인덱스에 더하고 누적 결과를 분석"""
+    index = SymptomIndex()
+    out = ()
+    for m in messages:
+        index.add(m)
+        out = _analyze(index.hits())
+    return out
+
+
+def _synthetic_words(n: int) -> List[str]:
+    # 실제 대화에 등장하지 않는 2~3음절 한글 키워드 (사전 확장 시뮬레이션)
+    base = 0xD0A0
+    return [chr(base + i % 300) + chr(base + 300 + i // 300) + ("쿠" if i % 2 else "") for i in range(n)]
+
+
+def _time(fn: Callable[..., tuple], text, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"{'turns':>6} {'chars':>7} {'legacy(us)':>11} {'matcher(us)':>12} {'ratio':>6}")
+    for n_turns in (1, 6, 30, 120, 480):
+        text = " ".join(_TURNS[i % len(_TURNS)] for i in range(n_turns))
+        assert legacy_turn(text) == matcher_turn(text), "결과 불일치"
+        repeat = max(5, args.repeat * 6 // n_turns)
+        legacy = _time(legacy_turn, text, repeat)
+        matcher = _time(matcher_turn, text, repeat)
+        print(f"{n_turns:>6} {len(text):>7} {legacy:>11.1f} {matcher:>12.1f} {legacy / matcher:>6.2f}")
+
+    # 대화 한 세션 전체 (턴마다 분석): 기존 전체 재스캔 vs 메시지당 1회 스캔 + 인덱스
+    print(f"\n{'turns':>6} {'legacy(us)':>11} {'index(us)':>11} {'ratio':>6}")
+    for n_turns in (6, 30, 120):
+        messages = [_TURNS[i % len(_TURNS)] for i in range(n_turns)]
+        assert legacy_session(messages) == index_session(messages), "결과 불일치"
+        repeat = max(3, args.repeat // n_turns)
+        legacy = _time(legacy_session, messages, repeat)
+        indexed = _time(index_session, messages, repeat)
+        print(f"{n_turns:>6} {legacy:>11.1f} {indexed:>11.1f} {legacy / indexed:>6.2f}")
+
+    # 사전이 커질 때: 둘 다 단어 수에 비례 (기존 루프는 any()로 일찍 끝나는 만큼 유리)
+    text = " ".join(_TURNS[i % len(_TURNS)] for i in range(30))
+    print(f"\n{'extra_kw':>8} {'legacy(us)':>11} {'matcher(us)':>12} {'ratio':>6}")
+    for n_extra in (0, 200, 1000, 5000):
+        extra = _synthetic_words(n_extra)
+        big = KeywordMatcher({**_lexicons(), "extra": extra})
+
+        def legacy_grown(t: str) -> tuple:
+            return legacy_turn(t) + (any(w in t for w in extra),)
+
+        def matcher_grown(t: str) -> tuple:
+            hits = big.scan(t)
+            return (entities_from_hits(hits), topics_from_hits(hits), summary_from_words(hits.words),
+                    risk_score_from_words(hits.words), strong_flags_from_words(hits.words), hits.has("extra"))
+
+        assert legacy_grown(text) == matcher_grown(text), "결과 불일치"
+        legacy = _time(legacy_grown, text, args.repeat)
+        matcher = _time(matcher_grown, text, args.repeat)
+        print(f"{n_extra:>8} {legacy:>11.1f} {matcher:>12.1f} {legacy / matcher:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
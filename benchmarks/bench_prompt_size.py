@@ -0,0 +1,103 @@
+"""
+LLM 후속 질문 프롬프트 크기 비교 (이전 형식 vs llm_prompt.build_messages).
+
+    python benchmarks/bench_prompt_size.py --dialogs 200 --turns 12
+
+합성 대화를 TriageSession으로 재생하면서 턴마다 LLM에 보냈을 메시지를 두 형식으로 만들어
+호출당 바이트(전체/고정 접두부/가변부)를 비교한다. tiktoken이 설치되어 있으면 토큰 수도 센다.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_turns import _SCENARIOS, synthetic_dialog  # noqa: E402
+from llm_prompt import build_messages, prompt_bytes  # noqa: E402
+from triage_session import TriageSession  # noqa: E402
+
+
+def legacy_messages(ents: Dict[str, str], context_topics: List[str], slots: Dict[str, Optional[object]], user_text: str) -> List[Dict[str, str]]:
+    """비교 기준: 이전 utils._llm_messages 형식 (들여쓴 JSON, 빈 필드/고정 규칙 문자열 포함)"""
+    system_prompt = (
+        "당신은 한국어 의학 챗봇입니다. 공감 문장은 쓰지 말고, 다음 단계에 꼭 필요한 "
+        "구체적인 질문을 단 한 문장으로 반환하세요. 이미 답한 항목은 반복하지 않습니다. "
+        "가능하면 예/아니오로 답할 수 있는 질문을 선호하세요. "
+        "반드시 JSON만 출력하세요: "
+        "{\"followup\": \"질문?\", \"yesno_options\": [\"선택지1\",\"선택지2\"]}"
+    )
+    tool_context = {
+        "entities": ents,
+        "context_topics": context_topics,
+        "slots": slots,
+        "rule": "질문은 1개, 공감문 금지, 한국어 존댓말",
+    }
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"사용자 입력: {user_text}"},
+        {"role": "user", "content": f"컨텍스트: {json.dumps(tool_context, ensure_ascii=False)}"},
+    ]
+
+
+def _token_counter():
+    try:
+        import tiktoken   # 선택 의존성
+    except ImportError:
+        return None
+    enc = tiktoken.get_encoding("o200k_base")
+    return lambda messages: sum(len(enc.encode(m["content"])) + 4 for m in messages)
+
+
+def collect(dialogs: int, turns: int, seed: int) -> List[tuple]:
+    rng = random.Random(seed)
+    calls: List[tuple] = []
+
+    def capture(ents, context_topics, slots, user_text, fallback):
+        calls.append((dict(ents), list(context_topics), dict(slots), user_text))
+        return fallback
+
+    names = list(_SCENARIOS)
+    for i in range(dialogs):
+        s = TriageSession()
+        for text in synthetic_dialog(names[i % len(names)], turns, rng):
+            s.step(text, followup_fn=capture)
+    return calls
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="LLM 프롬프트 크기 비교")
+    ap.add_argument("--dialogs", type=int, default=200)
+    ap.add_argument("--turns", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    calls = collect(args.dialogs, args.turns, args.seed)
+    count_tokens = _token_counter()
+    print(f"calls={len(calls)}" + ("" if count_tokens else "  (tiktoken 없음: 바이트만)"))
+    print(f"{'format':>8} {'bytes/call':>11} {'static':>8} {'variable':>9} {'tokens/call':>12}")
+    base = None   # (total, variable)
+    for name, build in (("legacy", legacy_messages), ("compact", build_messages)):
+        total = variable = tokens = 0
+        static = 0
+        for call in calls:
+            messages = build(*call)
+            size = prompt_bytes(messages)
+            static = len(messages[0]["content"].encode("utf-8"))
+            total += size
+            variable += size - static
+            if count_tokens:
+                tokens += count_tokens(messages)
+        n = max(1, len(calls))
+        tok = f"{tokens / n:>12.1f}" if count_tokens else f"{'-':>12}"
+        print(f"{name:>8} {total / n:>11.1f} {static:>8} {variable / n:>9.1f} {tok}")
+        if base is None:
+            base = (total, variable)
+        else:
+            print(f"reduction vs legacy: total {100 * (1 - total / base[0]):.1f}%, variable {100 * (1 - variable / base[1]):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
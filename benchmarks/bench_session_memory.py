@@ -0,0 +1,62 @@
+"""
+세션당 메모리 측정 (파드 크기 산정용).
+
+    python benchmarks/bench_session_memory.py --sessions 500 --lengths 8,32,128,512
+
+합성 대화를 길이별로 TriageSession에 재생하고, 살아 있는 세션 N개가 차지하는 메모리를
+tracemalloc으로 재서 세션당 바이트로 나눈다. --max-messages로 링 버퍼 크기를 바꿔 비교할 수 있다
+(매우 크게 주면 사실상 무제한 기록).
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_turns import _SCENARIOS, synthetic_dialog  # noqa: E402
+from session_memory import DEFAULT_MAX_MESSAGES  # noqa: E402
+from triage_session import TriageSession  # noqa: E402
+
+
+def measure(sessions: int, length: int, max_messages: int, seed: int) -> float:
+    """길이 length 대화를 마친 세션 1개당 평균 바이트"""
+    rng = random.Random(seed)
+    dialogs = [synthetic_dialog(list(_SCENARIOS)[i % len(_SCENARIOS)], length, rng) for i in range(sessions)]
+    TriageSession(max_messages=max_messages).step("워밍업")   # 사전/정규식 등 공용 객체는 측정에서 제외
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    live = []
+    for dialog in dialogs:
+        s = TriageSession(max_messages=max_messages)
+        for text in dialog:
+            s.step(text)
+        live.append(s)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del live
+    return used / sessions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="TriageSession 세션당 메모리 측정")
+    ap.add_argument("--sessions", type=int, default=500, help="동시에 유지할 세션 수")
+    ap.add_argument("--lengths", default="8,32,128,512", help="대화 길이(턴) 목록")
+    ap.add_argument("--max-messages", type=int, default=DEFAULT_MAX_MESSAGES, help="세션당 메시지 링 버퍼 크기")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    print(f"sessions={args.sessions} max_messages={args.max_messages}")
+    print(f"{'turns':>6} {'bytes/session':>14} {'KiB/session':>12} {'MiB/1k sessions':>16}")
+    for length in [int(x) for x in args.lengths.split(",") if x.strip()]:
+        per = measure(args.sessions, length, args.max_messages, args.seed)
+        print(f"{length:>6} {per:>14,.0f} {per / 1024:>12.1f} {per * 1000 / 2**20:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+턴 단위 지연 시간 벤치마크.
+
+    python benchmarks/bench_turns.py -o benchmarks/turn_latency_baseline.json
+    python benchmarks/bench_turns.py --compare benchmarks/turn_latency_baseline.json
+
+흉통/호흡곤란/위장관/발열 합성 대화를 길이별로 만들어 TriageSession으로 재생하고,
+단계별(슬롯 반영, 엔티티 추출, 토픽, 후속 질문 선택, 진단) 시간을 p50/p95/p99로 집계한다.
+같은 시드로 --runs번 반복해 각 값의 중앙값을 쓴다 (한 번 실행의 잡음이 판정에 그대로 들어가지 않도록).
+엔진 경로를 직접 측정하므로 화면용 time.sleep(utils.py)은 포함되지 않는다.
+--compare를 주면 저장된 기준 결과와 비교해 느려진 항목을 표시하고 종료 코드 1을 반환한다.
+기준 결과(turn_latency_baseline.json)는 측정한 환경(meta)에서만 의미가 있으니, 환경이 바뀌면 다시 만든다.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from functools import wraps
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import triage_session  # noqa: E402
+from triage_session import TriageSession  # noqa: E402
+
+_SCENARIOS: Dict[str, List[str]] = {
+    "chest_pain": [
+        "가슴이 조이듯이 아파요", "30분 전부터 계속 아파요", "네. 더 심해집니다.",
+        "왼쪽 가슴이 쑤시고 식은땀이 나요", "명치 쪽이 답답하고 통증이 심해요",
+    ],
+    "dyspnea": [
+        "숨이 차요", "계단 오를 때 호흡이 가빠요", "네. 안정 시에도 숨이 찹니다.",
+        "기침이 나고 가래도 있어요", "어제부터 숨쉬기가 힘들어요",
+    ],
+    "gi": [
+        "배가 아프고 설사를 해요", "아랫배가 쑤셔요", "네. 있습니다.",
+        "구토를 두 번 했어요", "오늘부터 메스꺼워요",
+    ],
+    "fever": [
+        "열이 나요", "고열이 사흘째예요", "아니요. 없습니다.",
+        "미열이 있고 몸이 쑤셔요", "두 시간 전부터 발열이 있어요",
+    ],
+}
+_FILLERS = ["잘 모르겠어요", "조금 나아진 것 같아요", "네", "아니요", "그냥 불편해요"]
+
+STAGES = ("index_add", "apply_yesno", "extract_entities", "detect_topics", "choose_followup", "step", "diagnose")
+
+
+def synthetic_dialog(scenario: str, turns: int, rng: random.Random) -> List[str]:
+    pool = _SCENARIOS[scenario]
+    return [rng.choice(pool) if rng.random() < 0.7 else rng.choice(_FILLERS) for _ in range(turns)]
+
+
+class _StageTimer:
+    """엔진 코드를 바꾸지 않고 단계 함수들을 감싸서 호출별 시간을 모은다"""
+
+    def __init__(self) -> None:
+        self.current: Dict[str, float] = {}
+        self._patched: List[tuple] = []
+
+    def _wrap(self, owner, attr: str, stage: str) -> None:
+        orig = getattr(owner, attr)
+        current = self.current
+
+        @wraps(orig)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return orig(*args, **kwargs)
+            finally:
+                current[stage] = current.get(stage, 0.0) + (time.perf_counter() - t0)
+
+        setattr(owner, attr, timed)
+        self._patched.append((owner, attr, orig))
+
+    def install(self) -> None:
+        self._wrap(triage_session.SymptomIndex, "add", "index_add")
+        self._wrap(TriageSession, "_apply_yesno_to_slots", "apply_yesno")
+        self._wrap(triage_session, "entities_from_hits", "extract_entities")
+        self._wrap(triage_session, "extract_duration_str", "extract_entities")
+        self._wrap(triage_session, "topics_from_hits", "detect_topics")
+        self._wrap(TriageSession, "choose_followup", "choose_followup")
+
+    def uninstall(self) -> None:
+        for owner, attr, orig in reversed(self._patched):
+            setattr(owner, attr, orig)
+        self._patched.clear()
+
+    def take(self) -> Dict[str, float]:
+        out = dict(self.current)
+        self.current.clear()
+        return out
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    xs = sorted(samples)
+    n = len(xs)
+
+    def rank(p: float) -> float:  # nearest-rank
+        return xs[min(n - 1, max(0, math.ceil(p / 100.0 * n) - 1))]
+
+    return {
+        "p50_us": rank(50) * 1e6,
+        "p95_us": rank(95) * 1e6,
+        "p99_us": rank(99) * 1e6,
+        "n": n,
+    }
+
+
+def run(lengths: List[int], dialogs_per_length: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    timer = _StageTimer()
+    timer.install()
+    results: Dict[str, Dict[str, dict]] = {}
+    try:
+        for length in lengths:
+            samples: Dict[str, List[float]] = {s: [] for s in STAGES}
+            for i in range(dialogs_per_length):
+                scenario = list(_SCENARIOS)[i % len(_SCENARIOS)]
+                session = TriageSession(location_consent=True)
+                timer.take()
+                for text in synthetic_dialog(scenario, length, rng):
+                    t0 = time.perf_counter()
+                    session.step(text)
+                    elapsed = time.perf_counter() - t0
+                    stages = timer.take()
+                    for s in STAGES[:-2]:
+                        samples[s].append(stages.get(s, 0.0))
+                    samples["step"].append(elapsed)
+                t0 = time.perf_counter()
+                session.diagnose()
+                samples["diagnose"].append(time.perf_counter() - t0)
+                timer.take()
+            results[str(length)] = {s: percentiles(v) for s, v in samples.items()}
+    finally:
+        timer.uninstall()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "lengths": lengths,
+            "dialogs_per_length": dialogs_per_length,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def run_repeated(lengths: List[int], dialogs_per_length: int, seed: int, runs: int) -> dict:
+    """run()을 runs번 반복해 길이/단계/백분위별 중앙값으로 합친다"""
+    reports = [run(lengths, dialogs_per_length, seed) for _ in range(max(1, runs))]
+    merged = reports[0]
+    for length, stages in merged["results"].items():
+        for stage, stats in stages.items():
+            for key in ("p50_us", "p95_us", "p99_us"):
+                stats[key] = statistics.median(r["results"][length][stage][key] for r in reports)
+    merged["meta"]["runs"] = len(reports)
+    return merged
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_us: float, keys: tuple = ("p50_us",)) -> List[str]:
+    """기준 대비 keys(기본 p50)가 tolerance 비율 + min_us 이상 느려진 항목"""
+    regressions: List[str] = []
+    for length, stages in current["results"].items():
+        base_stages = baseline.get("results", {}).get(length)
+        if not base_stages:
+            continue
+        for stage, stats in stages.items():
+            base = base_stages.get(stage)
+            if not base:
+                continue
+            for key in keys:
+                cur, ref = stats[key], base[key]
+                if cur > ref * (1 + tolerance) and cur - ref > min_us:
+                    regressions.append(
+                        f"len={length:>4} {stage:<16} {key}: {ref:8.1f} -> {cur:8.1f} us (+{(cur / ref - 1) * 100 if ref else float('inf'):.0f}%)"
+                    )
+    return regressions
+
+
+def _print_table(report: dict) -> None:
+    print(f"{'len':>5} {'stage':<16} {'p50(us)':>9} {'p95(us)':>9} {'p99(us)':>9} {'n':>7}")
+    for length, stages in report["results"].items():
+        for stage, st in stages.items():
+            print(f"{length:>5} {stage:<16} {st['p50_us']:>9.1f} {st['p95_us']:>9.1f} {st['p99_us']:>9.1f} {st['n']:>7}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="턴 단위 단계별 지연 시간 벤치마크")
+    ap.add_argument("--lengths", default="4,16,64,256", help="대화 길이(턴) 목록")
+    ap.add_argument("--dialogs", type=int, default=40, help="길이별 합성 대화 수")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--runs", type=int, default=5, help="반복 횟수 (중앙값 사용)")
+    ap.add_argument("-o", "--output", default=None, help="결과 JSON 저장 경로")
+    ap.add_argument("--compare", default=None, help="기준 결과 JSON (느려진 항목이 있으면 exit 1)")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="허용 비율 (기본 30%%)")
+    ap.add_argument("--min-us", type=float, default=20.0, help="무시할 절대 차이(us) - 측정 잡음 하한")
+    ap.add_argument("--tail", action="store_true", help="p95도 비교 (꼬리 지연은 잡음이 커서 기본은 p50만)")
+    args = ap.parse_args(argv)
+
+    lengths = [int(x) for x in args.lengths.split(",") if x.strip()]
+    report = run_repeated(lengths, args.dialogs, args.seed, args.runs)
+    _print_table(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        keys = ("p50_us", "p95_us") if args.tail else ("p50_us",)
+        regressions = compare(report, baseline, args.tolerance, args.min_us, keys)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nno regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
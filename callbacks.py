@@ -1,4 +1,5 @@
 import streamlit as st
+from triage_session import TriageSession
 
 MAX_STEP = 4
 
@@ -9,14 +10,24 @@ def next_step() -> None:
 def go_to_step(step_number: int) -> None:
     st.session_state.step = max(1, min(step_number, MAX_STEP)) 
 
+def save_report_and_go_to_step(step_number: int) -> None:
+    # 저장 시점의 레포트를 고정해 두고 보관소 기록은 백그라운드에 맡긴다
+    # (utils는 여기서 불러온다: 1단계 화면이 utils의 LLM/병원 데이터 import를 기다리지 않도록)
+    from report_archive import build_report
+    from utils import report_archive
+
+    report = build_report(st.session_state.triage)
+    report_archive().submit(report)
+    st.session_state.report = report
+    go_to_step(step_number)
+
 def reset_and_go_to_step(step_number: int) -> None:
-    st.session_state.chat_messages = [
-        {"role": "assistant", "content": "안녕하세요. 다시 답변해주세요."} 
-    ]
-    st.session_state.diagnosis = {"triage_level": None, "summary": "", "hospitals": []} 
+    # 환자 기본정보/위치 동의는 유지하고 문진 상태만 새로 시작
+    prev: TriageSession = st.session_state.triage
+    st.session_state.triage = TriageSession(
+        patient_info=prev.patient_info,
+        location_consent=prev.location_consent,
+        greeting="안녕하세요. 다시 답변해주세요.",
+    )
     st.session_state.show_location_modal = False  
-    st.session_state.qa_pairs = 0  
-    st.session_state.last_assistant_question = None
-    st.session_state.yesno_options = None  
-    st.session_state.ready_to_diagnose = False 
     st.session_state.step = max(1, min(step_number, MAX_STEP))  
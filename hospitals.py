@@ -0,0 +1,166 @@
+import csv
+import math
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 병원/의료기관 목록 + 격자 공간 인덱스.
+# 파일(CSV/Parquet)에서 프로세스당 한 번 읽고, 유형(er/outpatient)별로 위경도 격자를 만든다.
+# 조회 결과는 step3_triage.display가 그리는 dict 형태(name/distance_km/address/phone/doctors/beds).
+
+EARTH_RADIUS_KM = 6371.0088
+KINDS = ("er", "outpatient")
+TRIAGE_TO_KIND = {"응급": "er", "외래": "outpatient"}
+
+# 필수 컬럼: name, kind(er|outpatient), lat, lon / 선택: address, phone, doctors, beds
+_TEXT_COLS = ("name", "address", "phone")
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """한 점에서 여러 점까지의 대원 거리(km), 벡터 연산"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat * 0.5) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon * 0.5) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _GridIndex:
+    """
+    위경도 격자(cell_deg 단위) 인덱스. 좌표를 셀 번호 순으로 정렬해 두고
+    셀 → [start, end) 구간만 저장하므로 조회 시 주변 셀의 연속 구간만 거리 계산한다.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float) -> None:
+        self.cell_deg = cell_deg
+        iy = np.floor(lats / cell_deg).astype(np.int64)
+        ix = np.floor(lons / cell_deg).astype(np.int64)
+        order = np.lexsort((ix, iy))
+        self.order = order
+        self.lats = lats[order]
+        self.lons = lons[order]
+        keys = list(zip(iy[order].tolist(), ix[order].tolist()))
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        start = 0
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                self.cells[keys[start]] = (start, i)
+                start = i
+
+    def candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """반경을 덮는 셀들의 (정렬된) 위치 인덱스"""
+        # 구면 캡의 정확한 위도/경도 폭
+        ang = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(ang) + 1e-9
+        ratio = math.sin(min(ang, math.pi / 2)) / max(math.cos(math.radians(lat)), 1e-12)
+        dlon = 180.0 if ratio >= 1.0 else math.degrees(math.asin(ratio)) + 1e-9
+        y0, y1 = math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg)
+        x0, x1 = math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self.cells):
+            return np.arange(len(self.lats))   # 반경이 너무 크면 전체
+        spans = [self.cells[(y, x)] for y in range(y0, y1 + 1) for x in range(x0, x1 + 1) if (y, x) in self.cells]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in spans])
+
+
+class HospitalDirectory:
+    """의료기관 목록. nearest()/within()은 거리순 dict 목록을 반환한다."""
+
+    def __init__(self, records: Iterable[dict], cell_deg: float = 0.05) -> None:
+        rows = [r for r in records if r.get("kind") in KINDS]
+        self.size = len(rows)
+        self._cols = {c: np.array([str(r.get(c) or "") for r in rows], dtype=object) for c in _TEXT_COLS}
+        self._doctors = np.array([_to_int(r.get("doctors")) for r in rows], dtype=np.int64)
+        self._beds = np.array([_to_int(r.get("beds")) for r in rows], dtype=np.int64)
+        lats = np.array([float(r["lat"]) for r in rows], dtype=np.float64)
+        lons = np.array([float(r["lon"]) for r in rows], dtype=np.float64)
+        kinds = np.array([r["kind"] for r in rows], dtype=object)
+        self._index: Dict[str, Tuple[np.ndarray, _GridIndex]] = {}
+        for kind in KINDS:
+            ids = np.flatnonzero(kinds == kind)
+            self._index[kind] = (ids, _GridIndex(lats[ids], lons[ids], cell_deg))
+
+    # ---------------- 로딩 ----------------
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> "HospitalDirectory":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            return cls(csv.DictReader(f), **kwargs)
+
+    @classmethod
+    def from_parquet(cls, path: str, **kwargs) -> "HospitalDirectory":
+        import pandas as pd   # Parquet일 때만 필요
+        return cls(pd.read_parquet(path).to_dict("records"), **kwargs)
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "HospitalDirectory":
+        if path.endswith(".parquet"):
+            return cls.from_parquet(path, **kwargs)
+        return cls.from_csv(path, **kwargs)
+
+    # ---------------- 조회 ----------------
+    def within(self, lat: float, lon: float, radius_km: float, kind: str = "er", limit: Optional[int] = None) -> List[dict]:
+        ids, dist = self._search(lat, lon, radius_km, kind)
+        keep = dist <= radius_km
+        ids, dist = ids[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return self._rows(ids[order], dist[order])
+
+    def nearest(self, lat: float, lon: float, k: int = 3, kind: str = "er", max_radius_km: float = 1000.0) -> List[dict]:
+        """반경을 두 배씩 넓혀 k개가 확실히 포함될 때까지 탐색"""
+        ids_all, grid = self._index[kind]
+        if k <= 0 or len(ids_all) == 0:
+            return []
+        radius = grid.cell_deg * 111.0
+        while True:
+            ids, dist = self._search(lat, lon, radius, kind)
+            # 반경 안의 후보가 k개 이상이면 반경 밖 기관은 더 가까울 수 없다
+            if (dist <= radius).sum() >= k or radius >= max_radius_km or len(ids) == len(ids_all):
+                break
+            radius *= 2
+        k = min(k, len(ids))
+        if k == 0:
+            return []
+        part = np.argpartition(dist, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        part = part[np.argsort(dist[part], kind="stable")]
+        return self._rows(ids[part], dist[part])
+
+    def _search(self, lat: float, lon: float, radius_km: float, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+        ids_all, grid = self._index[kind]
+        pos = grid.candidates(lat, lon, radius_km)
+        dist = haversine_km(lat, lon, grid.lats[pos], grid.lons[pos])
+        return ids_all[grid.order[pos]], dist
+
+    def _rows(self, ids: np.ndarray, dist: np.ndarray) -> List[dict]:
+        out: List[dict] = []
+        for i, d in zip(ids.tolist(), dist.tolist()):
+            h = {
+                "name": self._cols["name"][i],
+                "distance_km": round(d, 2),
+                "address": self._cols["address"][i] or "-",
+                "phone": self._cols["phone"][i] or "-",
+            }
+            # 값이 없는 기관은 키를 생략 (화면에서 '-'로 표시)
+            if self._doctors[i] >= 0:
+                h["doctors"] = int(self._doctors[i])
+            if self._beds[i] >= 0:
+                h["beds"] = int(self._beds[i])
+            out.append(h)
+        return out
+
+
+def _to_int(v) -> int:
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return -1
+
+
+@lru_cache(maxsize=4)
+def load_directory(path: str) -> HospitalDirectory:
+    """프로세스당 한 번만 읽는다 (경로별 캐시)"""
+    return HospitalDirectory.from_path(path)
@@ -0,0 +1,310 @@
+"""
+프로세스 내 경량 KTAS 분류기 (문자 n-gram 해싱 + 다항 로지스틱 회귀, NumPy만 사용).
+
+    python ktas_model.py train labelled.jsonl -o ktas_model.bin --dim 65536 --epochs 30
+    python ktas_model.py score ktas_model.bin transcripts.jsonl -o scores.jsonl
+
+학습 입력 한 줄: batch_triage.py 입력 형식 + "triage_level"("응급"/"외래"/"가정")
+    {"id": "...", "utterances": [...], "patient_info": {...}(선택), "triage_level": "응급"}
+
+특징: 환자 발화(공백 정규화)의 문자 1~3-gram과 환자 정보(나이대/성별/과거력) 토큰을
+crc32로 dim개 버킷에 해싱한다. 가중치는 (dim, 클래스) float32 하나뿐이라 파일을 memmap으로
+열면 로딩 비용이 거의 없고, 한 세션 채점은 수백 개 행을 모아 더하는 정도다.
+"""
+import argparse
+import json
+import re
+import sys
+import zlib
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from triage_session import TriageSession
+
+LABELS = ("응급", "외래", "가정")
+DEFAULT_DIM = 1 << 16
+NGRAM_RANGE = (1, 3)
+
+# 파일 형식: 매직(8) + 헤더 길이(uint32 LE) + JSON 헤더 + 0 패딩(64바이트 정렬) + float32 가중치/편향
+_MAGIC = b"KTASLR1\0"
+_ALIGN = 64
+
+_ws_pat = re.compile(r"\s+")
+
+Features = Tuple[np.ndarray, np.ndarray]   # (버킷 인덱스 int64, 값 float32)
+
+
+# ---------------- 특징 ----------------
+def _bucket(token: str, mask: int) -> int:
+    return zlib.crc32(token.encode("utf-8")) & mask
+
+
+def _patient_tokens(patient_info: Optional[dict]) -> List[str]:
+    info = patient_info or {}
+    tokens = []
+    try:
+        tokens.append(f"#age:{min(int(info.get('age')) // 10, 9)}")
+    except (TypeError, ValueError):
+        tokens.append("#age:?")
+    tokens.append(f"#sex:{info.get('gender') or '?'}")
+    history = info.get("history") or []
+    tokens.extend(f"#hx:{h}" for h in history)
+    if not history:
+        tokens.append("#hx:-")
+    return tokens
+
+
+def featurize(
+    text: str,
+    patient_info: Optional[dict] = None,
+    dim: int = DEFAULT_DIM,
+    ngram_range: Tuple[int, int] = NGRAM_RANGE,
+) -> Features:
+    """발화 n-gram(L2 정규화) + 환자 정보 토큰(각 1.0)의 희소 벡터"""
+    mask = dim - 1
+    t = " " + _ws_pat.sub(" ", (text or "").lower()).strip() + " "
+    counts: Dict[int, float] = {}
+    lo, hi = ngram_range
+    for n in range(lo, hi + 1):
+        for i in range(len(t) - n + 1):
+            b = _bucket(t[i:i + n], mask)
+            counts[b] = counts.get(b, 0.0) + 1.0
+    if counts:
+        norm = sum(v * v for v in counts.values()) ** -0.5
+        for b in counts:
+            counts[b] *= norm
+    for tok in _patient_tokens(patient_info):
+        b = _bucket(tok, mask)
+        counts[b] = counts.get(b, 0.0) + 1.0
+    idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    val = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return idx, val
+
+
+def session_text(session: "TriageSession") -> str:
+    """분류에 쓰는 텍스트: 환자 발화만 (질문 문구는 세션마다 같아 정보가 없다)"""
+    return " ".join(m.content for m in session.messages if m.role == "user")
+
+
+def _stack(feats: Sequence[Features]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """특징 목록 → CSR (indptr, indices, values)"""
+    indptr = np.zeros(len(feats) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(i) for i, _ in feats])
+    if not feats:
+        return indptr, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return indptr, np.concatenate([i for i, _ in feats]), np.concatenate([v for _, v in feats])
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+# ---------------- 모델 ----------------
+class KtasModel:
+    """가중치 (dim, 클래스) + 편향 (클래스,). load()는 파일을 memmap으로 연다."""
+
+    __slots__ = ("weights", "bias", "labels", "ngram_range", "_buf")
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        labels: Sequence[str] = LABELS,
+        ngram_range: Tuple[int, int] = NGRAM_RANGE,
+    ) -> None:
+        dim = weights.shape[0]
+        if dim & (dim - 1):
+            raise ValueError(f"dim must be a power of two: {dim}")
+        self.weights = weights
+        self.bias = bias
+        self.labels = tuple(labels)
+        self.ngram_range = tuple(ngram_range)
+        self._buf = None
+
+    @property
+    def dim(self) -> int:
+        return self.weights.shape[0]
+
+    # ---------------- 저장/로딩 ----------------
+    def save(self, path: str) -> None:
+        header = json.dumps(
+            {"labels": list(self.labels), "dim": self.dim, "ngram_range": list(self.ngram_range)},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        offset = len(_MAGIC) + 4 + len(header)
+        pad = -offset % _ALIGN
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            f.write(b"\0" * pad)
+            f.write(np.ascontiguousarray(self.weights, dtype="<f4").tobytes())
+            f.write(np.ascontiguousarray(self.bias, dtype="<f4").tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "KtasModel":
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"not a KTAS model file: {path}")
+            n = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(n).decode("utf-8"))
+        offset = len(_MAGIC) + 4 + n
+        offset += -offset % _ALIGN
+        n_cls, dim = len(header["labels"]), int(header["dim"])
+        buf = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(dim + 1, n_cls))
+        model = cls(buf[:dim], buf[dim], header["labels"], tuple(header["ngram_range"]))
+        model._buf = buf
+        return model
+
+    # ---------------- 채점 ----------------
+    def featurize(self, text: str, patient_info: Optional[dict] = None) -> Features:
+        return featurize(text, patient_info, self.dim, self.ngram_range)
+
+    def predict_proba(self, text: str, patient_info: Optional[dict] = None) -> np.ndarray:
+        idx, val = self.featurize(text, patient_info)
+        z = val @ self.weights[idx] + self.bias
+        return _softmax(z.astype(np.float64))
+
+    def predict(self, text: str, patient_info: Optional[dict] = None) -> Tuple[str, float]:
+        p = self.predict_proba(text, patient_info)
+        i = int(p.argmax())
+        return self.labels[i], float(p[i])
+
+    def predict_session(self, session: "TriageSession") -> Tuple[str, float]:
+        return self.predict(session_text(session), session.patient_info)
+
+    def predict_batch(self, items: Iterable[Tuple[str, Optional[dict]]]) -> Tuple[List[str], np.ndarray]:
+        """(텍스트, 환자 정보) 여러 건 → (분류 목록, 확률 (N, 클래스))"""
+        feats = [self.featurize(t, p) for t, p in items]
+        return self._predict_features(feats)
+
+    def _predict_features(self, feats: Sequence[Features]) -> Tuple[List[str], np.ndarray]:
+        probs = _softmax(self._logits(*_stack(feats)))
+        return [self.labels[i] for i in probs.argmax(axis=1).tolist()], probs
+
+    def _logits(self, indptr: np.ndarray, idx: np.ndarray, val: np.ndarray) -> np.ndarray:
+        n = len(indptr) - 1
+        z = np.zeros((n, len(self.labels)), dtype=np.float64)
+        starts = indptr[:-1]
+        nonempty = starts < indptr[1:]
+        if len(idx):
+            # 행별 구간합: 빈 행을 빼면 각 구간은 다음 비어있지 않은 행의 시작까지
+            z[nonempty] = np.add.reduceat(self.weights[idx] * val[:, None], starts[nonempty], axis=0)
+        return z + self.bias
+
+
+# ---------------- 학습 ----------------
+def train(
+    samples: Iterable[Tuple[str, Optional[dict], str]],
+    dim: int = DEFAULT_DIM,
+    epochs: int = 30,
+    lr: float = 2.0,
+    l2: float = 1e-5,
+    batch_size: int = 64,
+    labels: Sequence[str] = LABELS,
+    ngram_range: Tuple[int, int] = NGRAM_RANGE,
+    seed: int = 0,
+) -> KtasModel:
+    """(텍스트, 환자 정보, 분류) 목록으로 미니배치 SGD (소프트맥스 교차 엔트로피 + L2)"""
+    label_ix = {lab: i for i, lab in enumerate(labels)}
+    feats: List[Features] = []
+    y: List[int] = []
+    for text, info, label in samples:
+        if label not in label_ix:
+            raise ValueError(f"unknown label: {label!r}")
+        feats.append(featurize(text, info, dim, ngram_range))
+        y.append(label_ix[label])
+    model = KtasModel(
+        np.zeros((dim, len(labels)), dtype=np.float32), np.zeros(len(labels), dtype=np.float32),
+        labels, ngram_range,
+    )
+    if not feats:
+        return model
+    targets = np.eye(len(labels), dtype=np.float64)[y]
+    rng = np.random.default_rng(seed)
+    W, b = model.weights, model.bias
+    for _ in range(epochs):
+        order = rng.permutation(len(feats))
+        for s in range(0, len(order), batch_size):
+            batch = order[s:s + batch_size]
+            indptr, idx, val = _stack([feats[i] for i in batch])
+            err = (_softmax(model._logits(indptr, idx, val)) - targets[batch]) / len(batch)
+            rows = np.repeat(np.arange(len(batch)), np.diff(indptr))
+            if l2:
+                W *= np.float32(1.0 - lr * l2)
+            np.add.at(W, idx, (-lr * val[:, None] * err[rows]).astype(np.float32))
+            b -= np.float32(lr) * err.sum(axis=0).astype(np.float32)
+    return model
+
+
+# ---------------- CLI ----------------
+def _read_jsonl(path: str) -> Iterator[dict]:
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _text_of(rec: dict) -> str:
+    return " ".join(u.strip() for u in rec.get("utterances") or [] if u and u.strip())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="경량 KTAS 분류기 학습/채점")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    tr = sub.add_parser("train", help="분류가 달린 발화 기록으로 학습")
+    tr.add_argument("input", help="입력 JSONL ('-'는 stdin)")
+    tr.add_argument("-o", "--output", default="ktas_model.bin", help="가중치 파일 경로")
+    tr.add_argument("--dim", type=int, default=DEFAULT_DIM, help="해시 버킷 수 (2의 거듭제곱)")
+    tr.add_argument("--epochs", type=int, default=30)
+    tr.add_argument("--lr", type=float, default=2.0)
+    tr.add_argument("--l2", type=float, default=1e-5)
+    tr.add_argument("--holdout", type=float, default=0.2, help="정확도 확인용 검증 비율")
+    tr.add_argument("--seed", type=int, default=0)
+
+    sc = sub.add_parser("score", help="발화 기록 채점")
+    sc.add_argument("model", help="가중치 파일 경로")
+    sc.add_argument("input", help="입력 JSONL ('-'는 stdin)")
+    sc.add_argument("-o", "--output", default="-", help="출력 JSONL 경로 (기본: stdout)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "train":
+        recs = [(_text_of(r), r.get("patient_info"), r["triage_level"]) for r in _read_jsonl(args.input)]
+        order = np.random.default_rng(args.seed).permutation(len(recs))
+        n_val = int(len(recs) * args.holdout)
+        val = [recs[i] for i in order[:n_val]]
+        fit = [recs[i] for i in order[n_val:]]
+        model = train(fit, dim=args.dim, epochs=args.epochs, lr=args.lr, l2=args.l2, seed=args.seed)
+        model.save(args.output)
+        msg = f"trained on {len(fit)} sessions -> {args.output}"
+        if val:
+            pred, _ = model.predict_batch((t, p) for t, p, _ in val)
+            acc = sum(a == lab for a, (_, _, lab) in zip(pred, val)) / len(val)
+            msg += f" (holdout accuracy {acc:.3f} on {len(val)})"
+        print(msg, file=sys.stderr)
+        return
+
+    model = KtasModel.load(args.model)
+    recs = list(_read_jsonl(args.input))
+    pred, probs = model.predict_batch((_text_of(r), r.get("patient_info")) for r in recs)
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for r, label, p in zip(recs, pred, probs.tolist()):
+            out = {"id": r.get("id"), "triage_level": label, "probs": dict(zip(model.labels, (round(x, 4) for x in p)))}
+            dst.write(json.dumps(out, ensure_ascii=False) + "\n")
+    finally:
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
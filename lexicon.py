@@ -0,0 +1,239 @@
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# 한국어 엔티티/토픽/요약/위험도 판단에 쓰는 모든 사전을 한 곳에 모으고,
+# 프로세스당 한 번 단어 → 카테고리 표 하나로 합쳐 메시지를 한 번만 스캔한다.
+
+_severity_words = ["조금", "약간", "중간", "보통", "많이", "매우", "심하게", "너무"]
+_pain_words = ["아파", "아픔", "통증", "찌릿", "쑤심", "콕", "조이", "체한"]
+_resp_words = ["숨", "호흡", "호흡곤란", "숨차", "가쁨"]
+_sweat_words = ["식은땀", "땀"]
+_fever_words = ["열", "발열", "미열", "고열"]
+_gi_words = ["구토", "메스꺼", "구역", "설사", "변", "소변", "빈뇨", "배뇨통"]
+
+_region_map = {
+    "가슴": ["가슴", "흉통", "흉부", "흉골", "명치"],
+    "복부": ["복부", "배", "아랫배", "윗배"],
+    "우측": ["오른쪽", "우측", "우상", "우하"],
+    "좌측": ["왼쪽", "좌측", "좌상", "좌하"],
+}
+
+# 문맥 보강용 토픽 (순서 = 반환 순서)
+_topic_map = {
+    "통증": ["통증", "아픔", "쑤심", "찌름", "아려움"],
+    "가슴": ["가슴", "흉통", "심장", "흉부", "명치"],
+    "호흡": ["호흡", "숨", "호흡곤란"],
+    "기침": ["기침", "가래"],
+    "발열/식은땀": ["발열", "열", "식은땀"],
+    "어지럼증": ["어지럼", "실신", "쓰러짐"],
+    "복부": ["복부", "배", "아랫배", "윗배"],
+}
+
+# 요약/위험도/조기 종료 판단에서 단어 단위로 확인하는 키워드
+_flag_words = ["가슴", "통증", "흉통", "숨", "호흡", "호흡곤란", "식은땀", "실신", "의식", "복부", "발열", "열", "기침"]
+
+
+def _lexicons() -> Dict[str, List[str]]:
+    lex: Dict[str, List[str]] = {
+        "severity": _severity_words,
+        "pain": _pain_words,
+        "resp": _resp_words,
+        "sweat": _sweat_words,
+        "fever": _fever_words,
+        "gi": _gi_words,
+        "flag": _flag_words,
+    }
+    for key, kws in _region_map.items():
+        lex[f"region:{key}"] = kws
+    for key, kws in _topic_map.items():
+        lex[f"topic:{key}"] = kws
+    return lex
+
+
+class Hit(NamedTuple):
+    offset: int
+    word: str
+    category: str
+
+
+class Hits:
+    """
+    한 번의 스캔 결과. 분석기들은 집합(words/categories)만 읽으므로 이것만 즉시 만들고,
+    오프셋이 포함된 전체 매치 목록은 필요할 때 한 번만 계산한다.
+    """
+
+    __slots__ = ("words", "categories", "_text", "_matcher", "_matches")
+
+    def __init__(self, words: Set[str], categories: Set[str], text: str = "", matcher: "Optional[KeywordMatcher]" = None) -> None:
+        self.words = words
+        self.categories = categories
+        self._text = text
+        self._matcher = matcher
+        self._matches: Optional[List[Hit]] = None
+
+    @property
+    def matches(self) -> List[Hit]:
+        if self._matches is None:
+            self._matches = self._matcher.matches(self._text, self.words) if self._matcher else []
+        return self._matches
+
+    def has(self, category: str) -> bool:
+        return category in self.categories
+
+    def first_word(self, words: Iterable[str]) -> str:
+        """사전 순서상 처음으로 등장하는 단어 (기존 for-loop 의미 유지)"""
+        for w in words:
+            if w in self.words:
+                return w
+        return ""
+
+
+class KeywordMatcher:
+    """
+    여러 사전을 단어 → 카테고리 표 하나로 합친 다중 키워드 매처.
+    scan()은 사전 단어마다 `w in text`를 한 번씩만 확인해 (여러 사전에 있는 단어도 한 번)
+    모든 분석기가 읽는 결과를 만든다. 오프셋은 matches()가 찾은 단어에 대해서만 계산한다.
+    (CPython re의 트라이/대안 정규식은 현재 사전 크기에서 이 루프보다 느려 쓰지 않는다:
+    benchmarks/bench_lexicon.py 참고)
+    """
+
+    def __init__(self, lexicons: Dict[str, List[str]]) -> None:
+        cats: Dict[str, List[str]] = {}
+        for category, words in lexicons.items():
+            for w in words:
+                if w and category not in cats.setdefault(w, []):
+                    cats[w].append(category)
+        self._categories: Dict[str, Tuple[str, ...]] = {w: tuple(c) for w, c in cats.items()}
+        self._words: Tuple[str, ...] = tuple(cats)
+
+    @property
+    def words(self) -> FrozenSet[str]:
+        return frozenset(self._categories)
+
+    def scan(self, text: str) -> Hits:
+        if not text:
+            return Hits(set(), set())
+        words = {w for w in self._words if w in text}
+        cats = self._categories
+        categories = {c for w in words for c in cats[w]}
+        return Hits(words, categories, text, self)
+
+    def matches(self, text: str, words: Optional[Iterable[str]] = None) -> List[Hit]:
+        """텍스트 내 모든 사전 매치 (오프셋 순, 같은 위치는 짧은 단어 먼저). words: 이미 스캔한 단어"""
+        out: List[Hit] = []
+        if not text:
+            return out
+        for w in (self.scan(text).words if words is None else words):
+            pos = text.find(w)
+            while pos >= 0:
+                out.extend(Hit(pos, w, c) for c in self._categories[w])
+                pos = text.find(w, pos + 1)
+        out.sort(key=lambda h: (h.offset, len(h.word)))
+        return out
+
+
+_MATCHER = KeywordMatcher(_lexicons())
+
+
+def scan(text: str) -> Hits:
+    return _MATCHER.scan(text or "")
+
+
+# ---------------- 스캔 결과를 읽는 분석기 ----------------
+# 카테고리 이름은 미리 만들어 둔다 (턴마다 f-string을 만들지 않도록)
+_REGION_CATEGORIES = tuple((key, f"region:{key}") for key in _region_map)
+_TOPIC_CATEGORIES = tuple((key, f"topic:{key}") for key in _topic_map)
+
+
+def entities_from_hits(hits: Hits) -> Dict[str, str]:
+    region = next((key for key, cat in _REGION_CATEGORIES if cat in hits.categories), "")
+    severity = hits.first_word(_severity_words)
+
+    main_symptom = ""
+    if hits.has("pain"):
+        main_symptom = "통증"
+    elif hits.has("resp"):
+        main_symptom = "호흡곤란/호흡불편"
+    elif hits.has("gi"):
+        main_symptom = "위장관 증상"
+
+    assoc: List[str] = []
+    if hits.has("sweat"):
+        assoc.append("식은땀")
+    if hits.has("fever"):
+        assoc.append("발열")
+
+    return {
+        "region": region,
+        "severity": severity,
+        "main_symptom": main_symptom,
+        "assoc": ", ".join(assoc),
+    }
+
+
+def topics_from_hits(hits: Hits) -> List[str]:
+    cats = hits.categories
+    return [key for key, cat in _TOPIC_CATEGORIES if cat in cats]
+
+
+def summary_from_words(words: Set[str]) -> str:
+    resp = ("숨" in words) or ("호흡" in words) or ("호흡곤란" in words)
+    found: List[str] = []
+    if ("가슴" in words and "통증" in words) or "흉통" in words:
+        found.append("가슴 통증")
+    if resp:
+        found.append("호흡 곤란")
+    if "식은땀" in words:
+        found.append("식은땀")
+    if "실신" in words or "의식" in words:
+        found.append("실신/의식저하")
+    if "복부" in words and "통증" in words:
+        found.append("복부 통증")
+    if "발열" in words or "열" in words:
+        found.append("발열")
+    if "기침" in words:
+        found.append("기침")
+    if "가슴" in words and "통증" in words and "식은땀" in words and resp:
+        return "가슴 통증, 식은땀, 호흡 곤란 증상."
+    if not found:
+        return "특이 증상 없음."
+    return f"{', '.join(found)} 증상."
+
+
+# 위험도 규칙표: (조건, 가중치). 조건은 절(clause)들의 AND, 각 절은 단어들의 OR.
+# risk_batch.py가 같은 표로 N개 세션을 한 번에 채점한다.
+RISK_RULES: Tuple[Tuple[Tuple[Tuple[str, ...], ...], int], ...] = (
+    ((("가슴",), ("통증",)), 3),
+    ((("숨", "호흡"),), 2),
+    ((("식은땀",),), 2),
+    ((("실신",),), 2),
+    ((("복부",), ("통증",)), 1),
+    ((("발열", "열"),), 1),
+)
+# 분류 기준: 위에서부터 점수가 기준 이상이면 해당 분류, 모두 아니면 TRIAGE_DEFAULT
+TRIAGE_THRESHOLDS: Tuple[Tuple[str, int], ...] = (("응급", 6), ("외래", 3))
+TRIAGE_DEFAULT = "가정"
+
+_RISK_CLAUSE_SETS = tuple((tuple(frozenset(c) for c in clauses), weight) for clauses, weight in RISK_RULES)
+_STRONG_FLAGS = frozenset(["가슴", "통증", "숨", "식은땀"])
+
+
+def risk_score_from_words(words: Set[str]) -> int:
+    risk_score = 0
+    for clauses, weight in _RISK_CLAUSE_SETS:
+        for clause in clauses:
+            if clause.isdisjoint(words):
+                break
+        else:
+            risk_score += weight
+    return risk_score
+
+
+def triage_level_from_score(risk_score: int) -> str:
+    for level, threshold in TRIAGE_THRESHOLDS:
+        if risk_score >= threshold:
+            return level
+    return TRIAGE_DEFAULT
+
+
+def strong_flags_from_words(words: Set[str]) -> bool:
+    return _STRONG_FLAGS.issubset(words)
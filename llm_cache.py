@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# LLM 후속 질문 캐시 (프로세스 공용, 세션 간 공유)
+# 키는 사전 기반으로 정규화한 (엔티티, 문맥 토픽, 슬롯, 이미 물어본 질문 비트)만 사용하고 사용자 원문은 절대 넣지 않는다.
+
+Followup = Tuple[str, List[str], Optional[str]]     # (질문, 예/아니요 선택지, 그래프 질문 ID)
+
+# 키에 들어가는 엔티티 필드: 모두 사전(lexicon)에서 나온 고정 어휘
+_ENTITY_VOCAB_FIELDS = ("region", "severity", "main_symptom", "assoc")
+
+
+def followup_key(
+    ents: Dict[str, str],
+    context_topics: List[str],
+    slots: Dict[str, Optional[str]],
+    model: str = "",
+    asked: int = 0,
+) -> str:
+    """
+    캐시 키 정규화. 자유 입력에서 온 값(기간 문자열 등)은 유무만 남긴다.
+    토픽은 정렬해 순서 차이를 없애고, 슬롯은 True/False/None으로 통일한다.
+    asked: 세션에서 이미 물어본 그래프 질문 비트 (같은 슬롯이라도 이미 한 질문을 다시 내지 않도록)
+    """
+    ent_key = {f: ents.get(f, "") or "" for f in _ENTITY_VOCAB_FIELDS}
+    ent_key["duration"] = bool(ents.get("duration"))
+    slot_key = {
+        k: (v if isinstance(v, bool) or v is None else bool(v))
+        for k, v in sorted(slots.items())
+    }
+    return json.dumps(
+        [model, ent_key, sorted(set(context_topics)), slot_key, asked],
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+
+
+class FollowupCache:
+    """
+    LRU + TTL 캐시. 스레드 안전 (LLM 워커 스레드에서도 put 가능).
+    db_path를 주면 SQLite(WAL)에 write-through 하여 재시작 후에도 유효 항목을 재사용한다.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl_s: float = 3600.0, db_path: Optional[str] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: "OrderedDict[str, Tuple[float, Followup]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_path = db_path
+        self._readers = threading.local()     # 읽기는 스레드별 연결로 (WAL: 쓰기와 서로 막지 않음)
+        self._puts = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS followup_cache ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Followup]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+        if item is None and self._db is not None:
+            # 디스크 읽기는 프로세스 공용 lock 밖에서 (다른 세션의 get/put을 막지 않도록)
+            item = self._db_get(key)
+        with self._lock:
+            current = self._data.get(key)
+            if current is not None:
+                item = current      # 디스크를 읽는 사이 put된 값이 우선
+            elif item is not None:
+                self._insert(key, item)
+            if item is not None and item[0] <= now:
+                self._data.pop(key, None)
+                self.expirations += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            followup, options, qid = item[1]
+            return followup, list(options), qid
+
+    def put(self, key: str, value: Followup) -> None:
+        item = (time.time() + self.ttl_s, (value[0], list(value[1] or []), value[2]))
+        with self._lock:
+            self._insert(key, item)
+            if self._db is not None:
+                self._db_put(key, item)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM followup_cache")
+                self._db.commit()
+
+    # ---- 내부 (lock 보유 상태에서 호출) ----
+    def _insert(self, key: str, item: Tuple[float, Followup]) -> None:
+        self._data[key] = item
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Followup]]:
+        """lock 없이 호출 (스레드별 읽기 연결)"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self._db_path)
+        row = conn.execute(
+            "SELECT expires_at, value FROM followup_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        followup, options, *qid = json.loads(row[1])     # 이전 형식 행은 [질문, 선택지]
+        return row[0], (followup, options, qid[0] if qid else None)
+
+    def _db_put(self, key: str, item: Tuple[float, Followup]) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO followup_cache (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, item[0], json.dumps(item[1], ensure_ascii=False)),
+        )
+        self._puts += 1
+        if self._puts % 256 == 0:
+            # 주기적으로 만료 항목 정리 + maxsize 초과분(오래된 만료 시각 순) 제거
+            self._db.execute("DELETE FROM followup_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.execute(
+                "DELETE FROM followup_cache WHERE key NOT IN ("
+                " SELECT key FROM followup_cache ORDER BY expires_at DESC LIMIT ?)",
+                (self.maxsize,),
+            )
+        self._db.commit()
@@ -0,0 +1,97 @@
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+# 프로세스 공용 OpenAI 클라이언트.
+# 모든 LLM 호출(후속 질문, 스트리밍, 이후 요약 등)이 같은 keep-alive 연결 풀을 쓰도록
+# requests.Session을 하나 만들어 openai(0.x)의 requestssession으로 건다.
+# 연결/읽기 시한을 따로 두고, 재시도는 openai/urllib3 대신 여기서 지터를 섞어 횟수를 제한한다.
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 만한 오류 (openai.error 클래스 이름 기준 — 패키지 버전에 따라 없는 것도 있다)
+_RETRYABLE = frozenset({"RateLimitError", "APIConnectionError", "Timeout", "ServiceUnavailableError", "TryAgain"})
+
+
+def _retryable(exc: BaseException) -> bool:
+    names = {c.__name__ for c in type(exc).__mro__}
+    if names & _RETRYABLE:
+        return True
+    status = getattr(exc, "http_status", None)
+    return "APIError" in names and isinstance(status, int) and status >= 500
+
+
+class LlmClient:
+    """
+    chat(**kwargs)는 openai.ChatCompletion.create와 같은 인자를 받는다 (api_key/request_timeout은 채워 준다).
+    stream=True이면 응답 헤더까지만 재시도 대상이고, 받기 시작한 스트림은 재시도하지 않는다.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        pool_size: int = 16,
+        connect_timeout_s: float = 3.05,
+        read_timeout_s: float = 10.0,
+        max_retries: int = 1,
+        backoff_s: float = 0.2,
+    ) -> None:
+        import openai   # 선택 의존성
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._openai = openai
+        self.api_key = api_key
+        self.timeout: Tuple[float, float] = (connect_timeout_s, read_timeout_s)
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.session = session
+        openai.requestssession = session     # 모듈 전역 API도 이 풀을 쓰게 한다
+
+    def chat(self, **kwargs: Any) -> Any:
+        kwargs.setdefault("api_key", self.api_key)
+        kwargs.setdefault("request_timeout", self.timeout)
+        self.calls += 1
+        attempt = 0
+        while True:
+            try:
+                return self._openai.ChatCompletion.create(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not _retryable(e):
+                    self.failures += 1
+                    raise
+                attempt += 1
+                self.retries += 1
+                # 지수 백오프 + full jitter (동시에 실패한 세션들이 한꺼번에 다시 몰리지 않도록)
+                time.sleep(random.uniform(0, self.backoff_s * (2 ** (attempt - 1))))
+
+    def warm_up(self) -> bool:
+        """API 호스트로 가벼운 요청을 한 번 보내 TLS 연결을 풀에 미리 만들어 둔다 (실패해도 무시)"""
+        base = (getattr(self._openai, "api_base", None) or "https://api.openai.com/v1").rstrip("/")
+        try:
+            resp = self.session.get(
+                f"{base}/models",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+            )
+            resp.close()
+            return resp.ok
+        except Exception:
+            logger.warning("LLM client warm-up failed", exc_info=True)
+            return False
+
+    def warm_up_async(self) -> None:
+        threading.Thread(target=self.warm_up, name="llm-warmup", daemon=True).start()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "retries": self.retries, "failures": self.failures}
@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from llm_stream import percentile
+
+# 프로세스 공용 LLM 호출 관문.
+# - 토큰 버킷: 공급자 쿼터에 맞춘 초당 요청 수 (+버스트)
+# - 세마포어: 동시에 나가는 요청 수 상한
+# - 서킷 브레이커: 연속 오류/연속 지연이 쌓이면 열려서, 열려 있는 동안은 네트워크 대기 없이 바로 거절
+# 거절된 세션은 규칙 기반 질문을 쓴다.
+# HedgePolicy는 1차 모델이 늦을 때 다른 모델로 두 번째 요청을 보낼 시점과 그 효과를 기록한다.
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LlmRejected(Exception):
+    """관문에서 거절됨 (브레이커 열림 또는 요청 한도 초과) — 호출부는 규칙 기반 경로로"""
+
+
+class LlmGate:
+    """
+    admit()은 막히지 않는 입장 검사(브레이커 → 토큰 버킷), slot()은 실제 호출을 감싸
+    동시 요청 수를 제한하고 성공/실패/지연을 브레이커에 기록한다.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        rate_per_s: float = 8.0,
+        burst: float = 16.0,
+        failure_threshold: int = 5,
+        slow_call_s: float = 8.0,
+        slow_threshold: int = 5,
+        open_s: float = 30.0,
+    ) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.slow_call_s = slow_call_s
+        self.slow_threshold = slow_threshold
+        self.open_s = open_s
+        self._lock = threading.Lock()
+        self._sem = threading.BoundedSemaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._consecutive_slow = 0
+
+        self.queued = 0        # 입장했지만 아직 워커를 못 받은 작업
+        self.waiting = 0       # 동시 요청 슬롯을 기다리는 작업
+        self.in_flight = 0
+        self.counts: Dict[str, int] = {
+            "admitted": 0, "rejected_open": 0, "rejected_rate": 0,
+            "succeeded": 0, "failed": 0, "slow": 0, "opened": 0,
+        }
+
+    # ---------------- 입장 ----------------
+    def admit(self, reserve: float = 0.0) -> bool:
+        """
+        지금 요청을 보내도 되는지. 토큰을 하나 쓴다.
+        reserve: 버킷에 이만큼은 남겨 두어야 입장 (선계산 같은 부가 요청이 본 요청을 밀어내지 않도록)
+        """
+        now = time.monotonic()
+        with self._lock:
+            probe = False
+            if self.state != CLOSED:
+                if now - self._opened_at < self.open_s:
+                    self.counts["rejected_open"] += 1
+                    return False
+                probe = True     # 열린 지 open_s가 지남: 시험 요청 하나만 통과
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_s)
+            self._refilled_at = now
+            if self._tokens < 1.0 + reserve:
+                self.counts["rejected_rate"] += 1
+                return False
+            self._tokens -= 1.0
+            if probe:
+                self.state = HALF_OPEN
+                self._opened_at = now    # 시험 요청이 끝나지 않더라도 open_s 뒤에 다시 시험
+            self.counts["admitted"] += 1
+            return True
+
+    # ---------------- 대기열 ----------------
+    def enqueue(self) -> None:
+        """입장한 작업이 워커를 기다리기 시작함 (queued로 센다)"""
+        with self._lock:
+            self.queued += 1
+
+    def dequeue(self) -> None:
+        """대기열을 떠남: 워커를 받았거나 그 전에 취소됨"""
+        with self._lock:
+            self.queued -= 1
+
+    # ---------------- 호출 ----------------
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        실제 공급자 호출을 감싼다. 블록에서 예외가 나면 실패로, 오래 걸리면 지연으로 기록.
+        스트리밍 소비자가 중간에 그만두는 경우(GeneratorExit)는 어느 쪽으로도 세지 않는다.
+        """
+        with self._lock:
+            self.waiting += 1
+        self._sem.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+        started = time.monotonic()
+        ok: Optional[bool] = None
+        try:
+            yield
+            ok = True
+        except GeneratorExit:
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self._sem.release()
+            with self._lock:
+                self.in_flight -= 1
+                if ok is not None:
+                    self._record(ok, time.monotonic() - started)
+
+    def _record(self, ok: bool, elapsed_s: float) -> None:
+        """lock 보유 상태에서 호출"""
+        if ok:
+            self.counts["succeeded"] += 1
+            self._consecutive_failures = 0
+        else:
+            self.counts["failed"] += 1
+            self._consecutive_failures += 1
+        if elapsed_s >= self.slow_call_s:
+            self.counts["slow"] += 1
+            self._consecutive_slow += 1
+        else:
+            self._consecutive_slow = 0
+
+        tripped = (
+            self._consecutive_failures >= self.failure_threshold
+            or self._consecutive_slow >= self.slow_threshold
+        )
+        if self.state == HALF_OPEN:
+            if ok and elapsed_s < self.slow_call_s:
+                self.state = CLOSED
+                self._consecutive_failures = self._consecutive_slow = 0
+                logger.info("LLM circuit breaker closed")
+            else:
+                self._open()
+        elif self.state == CLOSED and tripped:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.counts["opened"] += 1
+        logger.warning(
+            "LLM circuit breaker opened (failures=%d slow=%d), rule-based questions for %.0fs",
+            self._consecutive_failures, self._consecutive_slow, self.open_s,
+        )
+
+    # ---------------- 지표 ----------------
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            out: Dict[str, object] = {
+                "state": self.state,
+                "queue_depth": self.queued + self.waiting,
+                "queued": self.queued,
+                "waiting": self.waiting,
+                "in_flight": self.in_flight,
+                "tokens": round(self._tokens, 2),
+            }
+            out.update(self.counts)
+        return out
+
+
+class GatedExecutor:
+    """
+    풀 앞에 관문을 둔 submit(). 입장하지 못하면 LlmRejected를 던지고 아무것도 제출하지 않는다.
+    제출된 작업이 워커를 받기 전까지는 gate.queued로 센다.
+    """
+
+    def __init__(self, gate: LlmGate, pool: Executor, reserve: float = 0.0) -> None:
+        self.gate = gate
+        self.pool = pool
+        self.reserve = reserve
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        gate = self.gate
+        if not gate.admit(self.reserve):
+            raise LlmRejected(gate.state)
+        gate.enqueue()
+
+        def run():
+            gate.dequeue()
+            return fn(*args, **kwargs)
+
+        try:
+            future = self.pool.submit(run)
+        except BaseException:
+            gate.dequeue()           # 풀이 닫혀 제출되지 않음
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        if future.cancelled():       # 워커를 받기 전에 취소됨
+            self.gate.dequeue()
+
+
+class HedgePolicy:
+    """
+    모델별 최근 응답 시간으로 헤지 지연(1차 모델의 percentile 지연)을 정하고,
+    턴마다 헤지 여부/이긴 모델/결과까지 걸린 시간을 모아 헤지율·승률·꼬리 지연을 보여준다.
+    """
+
+    def __init__(self, percentile: float = 0.9, default_delay_s: float = 0.4, min_samples: int = 20, window: int = 512) -> None:
+        self.percentile = percentile
+        self.default_delay_s = default_delay_s
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._window = window
+        self._latency: Dict[str, Deque[float]] = {}
+        self._turns: Deque[float] = deque(maxlen=window)
+        self.turns = 0
+        self.hedged = 0
+        self.requests: Dict[str, int] = {}
+        self.hedged_wins: Dict[str, int] = {}
+
+    def observe(self, model: str, elapsed_s: float) -> None:
+        """성공한 요청 하나의 응답 시간"""
+        with self._lock:
+            self._latency.setdefault(model, deque(maxlen=self._window)).append(elapsed_s)
+
+    def delay_s(self, model: str) -> float:
+        with self._lock:
+            samples = list(self._latency.get(model, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay_s
+        return percentile(samples, self.percentile)
+
+    def record(self, models: List[str], winner: Optional[str], elapsed_s: float) -> None:
+        """한 턴: 보낸 모델들(1차, [대체]), 이긴 모델(없으면 None), 결과/포기까지 걸린 시간"""
+        with self._lock:
+            self.turns += 1
+            hedged = len(models) > 1
+            self.hedged += hedged
+            for m in models:
+                self.requests[m] = self.requests.get(m, 0) + 1
+            if winner is not None and hedged:
+                self.hedged_wins[winner] = self.hedged_wins.get(winner, 0) + 1
+            self._turns.append(elapsed_s)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            turns = list(self._turns)
+            out: Dict[str, object] = {
+                "turns": self.turns,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.turns if self.turns else 0.0,
+                "extra_requests": sum(self.requests.values()) - self.turns,
+            }
+            for m, n in self.requests.items():
+                out[f"requests[{m}]"] = n
+            for m, n in self.hedged_wins.items():
+                out[f"win_rate[{m}]"] = n / self.hedged if self.hedged else 0.0
+            for m, samples in self._latency.items():
+                out[f"p95_ms[{m}]"] = percentile(samples, 0.95) * 1000
+        out["turn_p50_ms"] = percentile(turns, 0.5) * 1000
+        out["turn_p95_ms"] = percentile(turns, 0.95) * 1000
+        return out
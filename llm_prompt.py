@@ -0,0 +1,91 @@
+import json
+import threading
+from typing import Dict, List, Optional
+
+from question_graph import QUESTIONS
+
+# LLM 후속 질문 프롬프트 인코더와 토큰/바이트 사용량 집계.
+# 고정 지시문(SYSTEM_PROMPT)은 매 호출 바이트 단위로 같게 두어 공급자 쪽 접두부 캐시가 적용되게 하고,
+# 턴마다 바뀌는 값은 빈 항목/아직 모르는 슬롯을 빼고 공백 없는 JSON 한 줄에 담는다.
+# (짧은 키 + 범례는 범례가 시스템 프롬프트를 늘리는 만큼 이득이 없어, 원래 필드 이름을 그대로 쓴다)
+# 질문 그래프 목록도 고정 지시문에 넣어, 모델이 고른 질문의 ID(qid)로 슬롯을 채운다 (문구 추정 없이).
+
+_QUESTION_CATALOG = ", ".join(f"{q.qid}={q.brief}" for q in QUESTIONS)
+
+SYSTEM_PROMPT = (
+    "당신은 한국어 의학 챗봇입니다. 공감 문장은 쓰지 말고, 다음 단계에 꼭 필요한 "
+    "구체적인 질문을 단 한 문장으로 반환하세요. 이미 답한 항목은 반복하지 않습니다. "
+    "가능하면 예/아니오로 답할 수 있는 질문을 선호하세요. 한국어 존댓말. "
+    "맥락에 없는 항목은 아직 모르는 것입니다. "
+    f"질문 목록(ID=내용): {_QUESTION_CATALOG}. "
+    "목록의 질문과 같은 것을 묻는다면 qid에 그 ID를, 아니면 null을 넣으세요. "
+    "반드시 JSON만 출력하세요: "
+    "{\"followup\": \"질문?\", \"yesno_options\": [\"선택지1\",\"선택지2\"], \"qid\": \"ID 또는 null\"}"
+)
+
+
+
+def encode_context(ents: Dict[str, str], context_topics: List[str], slots: Dict[str, Optional[object]]) -> str:
+    """빈 값/모르는 슬롯을 뺀 JSON 한 줄"""
+    ctx: Dict[str, object] = {k: v for k, v in ents.items() if v}
+    if context_topics:
+        ctx["topics"] = list(context_topics)
+    filled = {k: v for k, v in slots.items() if v is not None}
+    if filled:
+        ctx["slots"] = filled
+    return json.dumps(ctx, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_messages(
+    ents: Dict[str, str],
+    context_topics: List[str],
+    slots: Dict[str, Optional[object]],
+    user_text: str,
+) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"입력: {user_text}\n맥락: {encode_context(ents, context_topics, slots)}"},
+    ]
+
+
+def prompt_bytes(messages: List[Dict[str, str]]) -> int:
+    return sum(len(m["content"].encode("utf-8")) for m in messages)
+
+
+class UsageMeter:
+    """
+    LLM 호출별 프롬프트/응답 토큰과 바이트 합계. 세션 미터는 parent(프로세스 미터)에도 같이 더한다.
+    토큰은 공급자가 usage를 돌려준 호출만 센다 (바이트는 항상).
+    """
+
+    FIELDS = ("calls", "prompt_tokens", "completion_tokens", "prompt_bytes", "completion_bytes")
+
+    def __init__(self, parent: Optional["UsageMeter"] = None) -> None:
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.totals: Dict[str, int] = dict.fromkeys(self.FIELDS, 0)
+        self.last: Dict[str, int] = {}
+
+    def add(self, prompt_bytes: int, completion_bytes: int, usage: Optional[dict] = None) -> None:
+        usage = usage or {}
+        rec = {
+            "calls": 1,
+            "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+            "completion_tokens": int(usage.get("completion_tokens") or 0),
+            "prompt_bytes": prompt_bytes,
+            "completion_bytes": completion_bytes,
+        }
+        with self._lock:
+            for k, v in rec.items():
+                self.totals[k] += v
+            self.last = rec
+        if self.parent is not None:
+            self.parent.add(prompt_bytes, completion_bytes, usage)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out: Dict[str, float] = dict(self.totals)
+        calls = out["calls"]
+        for k in self.FIELDS[1:]:
+            out[f"{k}_per_call"] = out[k] / calls if calls else 0.0
+        return out
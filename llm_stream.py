@@ -0,0 +1,165 @@
+import json
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Deque, Dict, Iterable, Optional
+
+# LLM 질문 스트리밍.
+# - FollowupFieldParser: 조각으로 도착하는 JSON 응답에서 "followup" 문자열 값만 앞에서부터 풀어낸다
+# - ChunkPump: 워커 스레드가 스트림을 소비해 큐로 넘기고, 스크립트 스레드는 시한을 두고 읽는다
+# - LatencyStats: 턴 전체 지연과 첫 토큰까지의 시간(TTFT) 집계 (프로세스 공용)
+
+_FIELD_PAT = re.compile(r'"followup"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class FollowupFieldParser:
+    """
+    feed(chunk)는 이번 조각으로 새로 풀린 followup 텍스트를 반환한다 (없으면 "").
+    이스케이프(\\uXXXX, 서로게이트 쌍 포함)가 조각 경계에서 잘려도 다음 조각을 기다렸다가 푼다.
+    """
+
+    def __init__(self) -> None:
+        self.raw = ""           # 지금까지 받은 원문 전체
+        self.text = ""          # 지금까지 풀린 followup 값
+        self.done = False       # followup 문자열이 닫혔는지
+        self._pos = -1          # 다음에 풀 원문 위치 (-1: 아직 필드를 못 찾음)
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self.done:
+            return ""
+        if self._pos < 0:
+            m = _FIELD_PAT.search(self.raw)
+            if m is None:
+                return ""
+            self._pos = m.end()
+        out = []
+        raw, i, n = self.raw, self._pos, len(self.raw)
+        while i < n:
+            c = raw[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= n:
+                break
+            e = raw[i + 1]
+            if e != "u":
+                out.append(_ESCAPES.get(e, e))
+                i += 2
+                continue
+            if i + 6 > n:
+                break
+            code = int(raw[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:      # 상위 서로게이트: 짝(\uDC00~)까지 받아야 한 글자
+                if i + 12 > n:
+                    break
+                low = int(raw[i + 8:i + 12], 16) if raw[i + 6:i + 8] == "\\u" else 0
+                if 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            out.append(chr(code))
+            i += 6
+        self._pos = i
+        delta = "".join(out)
+        self.text += delta
+        return delta
+
+    def result(self) -> Optional[dict]:
+        """스트림이 끝난 뒤 전체 JSON (깨졌으면 풀린 followup만, 그것도 없으면 None)"""
+        try:
+            data = json.loads(self.raw)
+        except ValueError:
+            return {"followup": self.text} if self.done else None
+        return data if isinstance(data, dict) else None
+
+
+_END = object()
+
+
+class ChunkPump:
+    """
+    open_stream()이 돌려주는 텍스트 조각 이터레이터를 워커에서 소비해 큐로 넘긴다.
+    get()이 시한을 넘기면 queue.Empty, 스트림이 끝나면 None, 실패하면 그 예외를 던진다.
+    """
+
+    def __init__(self, pool: Executor, open_stream: Callable[[], Iterable[str]]) -> None:
+        self._queue: "queue.Queue[object]" = queue.Queue()
+        self._stop = threading.Event()
+        self.future = pool.submit(self._run, open_stream)
+
+    def _run(self, open_stream: Callable[[], Iterable[str]]) -> None:
+        chunks = None
+        try:
+            chunks = iter(open_stream())
+            for chunk in chunks:
+                if self._stop.is_set():
+                    break
+                if chunk:
+                    self._queue.put(chunk)
+        except Exception as e:
+            self._queue.put(e)
+            return
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()     # 중간에 멈췄으면 스트림(과 그 안의 호출 슬롯)을 바로 정리
+        self._queue.put(_END)
+
+    def get(self, timeout: float) -> Optional[str]:
+        item = self._queue.get(timeout=max(0.0, timeout))
+        if item is _END:
+            return None
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def cancel(self) -> None:
+        """읽는 쪽이 포기함: 대기 중이면 취소, 실행 중이면 다음 조각에서 멈춘다"""
+        self._stop.set()
+        self.future.cancel()
+
+
+def percentile(values: Iterable[float], p: float) -> float:
+    """최근접 순위 백분위수 (p는 0~1, 표본이 없으면 0). 지연 지표는 모두 이것을 쓴다."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class LatencyStats:
+    """최근 window개 턴의 전체 지연과 TTFT (초). 규칙/캐시 질문은 한 번에 나오므로 TTFT = 전체 지연."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._total: Deque[float] = deque(maxlen=window)
+        self._ttft: Deque[float] = deque(maxlen=window)
+        self.turns = 0
+        self.sources: Dict[str, int] = {}
+
+    def record(self, total_s: float, ttft_s: Optional[float] = None, source: str = "rules") -> None:
+        with self._lock:
+            self._total.append(total_s)
+            self._ttft.append(total_s if ttft_s is None else ttft_s)
+            self.turns += 1
+            self.sources[source] = self.sources.get(source, 0) + 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total, ttft = list(self._total), list(self._ttft)
+            out: Dict[str, float] = {"turns": self.turns}
+            out.update({f"source_{k}": v for k, v in self.sources.items()})
+        for name, values in (("ttft", ttft), ("total", total)):
+            out[f"{name}_p50_ms"] = percentile(values, 0.5) * 1000
+            out[f"{name}_p95_ms"] = percentile(values, 0.95) * 1000
+        return out
+
@@ -1,6 +1,10 @@
+import importlib
+
 import streamlit as st
-from state import initialize_state
-import step1_info, step2_chatbot, step3_triage, step4_report
+from state import initialize_state, persist_state
+
+# 단계 모듈은 그 단계에 처음 들어갈 때 불러온다 (1단계 첫 화면이 LLM/병원 데이터 import를 기다리지 않도록)
+_STEP_MODULES = {1: "step1_info", 2: "step2_chatbot", 3: "step3_triage", 4: "step4_report"}
 
 st.set_page_config(page_title="AEGIS Talk", page_icon="🩺", layout="centered")
 
@@ -13,11 +17,8 @@ step_labels = {1: "기본정보", 2: "챗봇 대화", 3: "응급실 방문여부
 st.caption(f"진행 단계: {step} / 4 · {step_labels.get(step, '')}")
 
 # 단계별 화면
-if step == 1:
-    step1_info.display()
-elif step == 2:
-    step2_chatbot.display()
-elif step == 3:
-    step3_triage.display()
-elif step == 4:
-    step4_report.display()
+if step in _STEP_MODULES:
+    importlib.import_module(_STEP_MODULES[step]).display()
+
+# 세션 저장소(SESSION_STORE)가 설정된 경우 바뀐 상태를 저장
+persist_state()
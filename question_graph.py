@@ -0,0 +1,150 @@
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+# 문진 질문 그래프.
+# 질문마다 고정 ID와 비트, 채우는 슬롯, 예/아니요 선택지를 선언하고,
+# 출제 순서와 조건(문맥)은 FLOW 표에 둔다. import 시 한 번 컴파일해
+# 세션은 질문 문구 대신 ID(asked 비트마스크, last_question_id)만 기록한다.
+
+
+class Question(NamedTuple):
+    qid: str
+    bit: int
+    text: str
+    brief: str                      # LLM 프롬프트의 질문 목록에 쓰는 짧은 설명
+    slot: Optional[str]             # 이 질문이 채우는 슬롯
+    yesno: bool                     # True면 예/아니요 답으로 slot을 채운다 (False면 자유 응답에서 추출)
+    options: Tuple[str, ...]        # 예/아니요 버튼 문구
+    markers: Tuple[str, ...]        # 문구가 바뀐 질문(LLM)에서 이 질문을 알아보는 단서
+
+
+# 순서 = 문구 단서로 질문을 추정할 때의 우선순위
+QUESTIONS: Tuple[Question, ...] = (
+    Question(
+        "duration", 1 << 0,
+        "통증은 언제부터 시작되었나요? 대략 몇 분/시간 정도 지속되었는지 알려주세요.", "통증 시작·지속 시간",
+        "chest_pain_duration", False, (),
+        ("언제부터", "지속", "몇 분/시간"),
+    ),
+    Question(
+        "worse_move", 1 << 1,
+        "통증이 움직이거나 숨쉴 때 더 심해지나요?", "움직임/호흡 시 통증 악화",
+        "pain_worse_with_move", True, ("네. 더 심해집니다.", "아니요. 비슷합니다."),
+        ("움직이거나 숨쉴 때 더 심해지나요",),
+    ),
+    Question(
+        "sob_rest", 1 << 2,
+        "안정 시에도 숨이 차신가요?", "안정 시 숨참",
+        "sob_at_rest", True, ("네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."),
+        ("안정 시에도 숨이 차신가요",),
+    ),
+    Question(
+        "gi_combo", 1 << 3,
+        "구토나 설사가 동반되나요?", "구토·설사 동반",
+        "gi_combo", True, ("네. 있습니다.", "아니요. 없습니다."),
+        ("구토나 설사가 동반되나요",),
+    ),
+    Question(
+        "sweat", 1 << 4,
+        "식은땀이 지금도 계속 나시나요?", "식은땀 지속",
+        None, False, ("네. 계속 납니다.", "아니요. 지금은 없습니다."),
+        ("식은땀",),
+    ),
+    Question(
+        "clarify", 1 << 5,
+        "지금 불편하신 부위와 증상을 한 번 더 구체적으로 말씀해주시겠어요? (예: '가슴 중앙이 조이고 30분째 심함')",
+        "불편한 부위·증상 다시 설명",
+        None, False, (),
+        ("불편하신 부위와 증상",),
+    ),
+)
+
+# 문맥별 '충분 조건': 문맥이 켜져 있고 슬롯이 모두 채워지면 진단으로 넘어간다
+COMPLETE_WHEN: Dict[str, Tuple[str, ...]] = {
+    "chest": ("chest_pain_duration", "pain_worse_with_move", "sob_at_rest"),
+    "resp": ("sob_at_rest",),
+    "gi": ("gi_combo",),
+}
+CONTEXTS = ("chest", "resp", "gi", "sweat")
+
+DIAGNOSE = None       # FLOW에서 "진단으로 종료" 단계
+COMPLETE = "complete"
+
+# (질문 ID 또는 DIAGNOSE, 조건) — 위에서부터 처음 해당하는 단계를 고른다.
+# 조건: None(항상), 문맥 이름(CONTEXTS), COMPLETE(켜진 문맥 하나라도 충분 조건 만족)
+# 질문은 이미 물어봤거나 슬롯이 채워져 있으면 건너뛴다.
+FLOW: Tuple[Tuple[Optional[str], Optional[str]], ...] = (
+    ("duration", "chest"),
+    ("worse_move", "chest"),
+    ("sob_rest", "chest"),
+    ("sob_rest", "resp"),
+    ("gi_combo", "gi"),
+    ("sweat", "sweat"),
+    (DIAGNOSE, COMPLETE),
+    ("clarify", None),
+    ("worse_move", None),
+    ("sob_rest", None),
+    ("gi_combo", None),
+    (DIAGNOSE, None),
+)
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def _compile() -> Tuple[Dict[str, Question], Dict[str, Question], Tuple[Tuple[Optional[Question], Optional[str]], ...]]:
+    by_id: Dict[str, Question] = {}
+    bits = 0
+    for q in QUESTIONS:
+        if q.qid in by_id or q.bit & bits:
+            raise ValueError(f"duplicate question id/bit: {q.qid}")
+        if q.yesno and (q.slot is None or len(q.options) != 2):
+            raise ValueError(f"yes/no question needs a slot and two options: {q.qid}")
+        by_id[q.qid] = q
+        bits |= q.bit
+    by_text = {_normalize(q.text): q for q in QUESTIONS}
+    plan = []
+    for qid, when in FLOW:
+        if when is not None and when != COMPLETE and when not in CONTEXTS:
+            raise ValueError(f"unknown flow condition: {when}")
+        plan.append((by_id[qid] if qid is not DIAGNOSE else None, when))
+    return by_id, by_text, tuple(plan)
+
+
+BY_ID, _BY_TEXT, _PLAN = _compile()
+
+
+def match_question(text: str) -> Optional[Question]:
+    """질문 문구 → 그래프 질문. 그래프 문구 그대로면 사전 조회 한 번, 아니면(LLM 문구) 단서로 추정."""
+    t = _normalize(text)
+    q = _BY_TEXT.get(t)
+    if q is not None:
+        return q
+    for q in QUESTIONS:
+        if any(m in t for m in q.markers):
+            return q
+    return None
+
+
+def _complete(active: FrozenSet[str], slots: Dict[str, Optional[object]]) -> bool:
+    return any(
+        ctx in active and all(slots.get(s) is not None for s in need)
+        for ctx, need in COMPLETE_WHEN.items()
+    )
+
+
+def next_question(active: FrozenSet[str], slots: Dict[str, Optional[object]], asked: int) -> Optional[Question]:
+    """켜진 문맥/슬롯/asked 비트마스크로 다음 질문을 고른다. None이면 진단으로 넘어갈 차례."""
+    for q, when in _PLAN:
+        if when == COMPLETE:
+            if _complete(active, slots):
+                return None
+            continue
+        if when is not None and when not in active:
+            continue
+        if q is None:
+            return None
+        if asked & q.bit or (q.slot is not None and slots.get(q.slot) is not None):
+            continue
+        return q
+    return None
@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 병원 목록 정렬/상위 k 선택.
+# 목록을 열(column) 배열로 한 번 바꿔 두고, 정렬 기준별 결과를 메모이즈한다.
+# 상위 k만 필요할 때는 1차 키로 argpartition → 후보(동점 포함)만 안정 정렬.
+
+# 정렬 기준: (열, 방향) 순서대로 사전식. 방향 1=오름차순, -1=내림차순
+SORT_KEYS: Dict[str, Tuple[Tuple[str, int], ...]] = {
+    "거리순": (("distance_km", 1), ("doctors", -1), ("beds", -1)),
+    "의사수순": (("doctors", -1), ("distance_km", 1), ("beds", -1)),
+    "병상수순": (("beds", -1), ("distance_km", 1), ("doctors", -1)),
+}
+
+# 종합순: 열별 min-max 정규화 후 가중합 (낮을수록 상위). 대기시간은 값이 있는 목록에서만 반영
+COMPOSITE = "종합순"
+COMPOSITE_WEIGHTS: Dict[str, Tuple[float, int]] = {
+    "distance_km": (0.5, 1),
+    "doctors": (0.2, -1),
+    "beds": (0.2, -1),
+    "wait_min": (0.1, 1),
+}
+SORT_CHOICES = tuple(SORT_KEYS) + (COMPOSITE,)
+
+# 값이 없을 때의 기본값 (기존 sort_key와 동일: 의사/병상 없음=0).
+# 거리/대기시간은 NaN으로 두고 정렬 키에서는 맨 뒤, 종합순에서는 정규화 범위 밖(가장 나쁜 값)으로 다룬다
+_DEFAULTS = {"distance_km": np.nan, "doctors": 0.0, "beds": 0.0, "wait_min": np.nan}
+
+
+def _num(v, default: float) -> float:
+    if isinstance(v, bool):
+        return default
+    if isinstance(v, (int, float)):
+        return float(v)
+    return default
+
+
+class HospitalRanking:
+    """병원 dict 목록에 대한 정렬 엔진. rank()는 같은 (기준, k)에 대해 계산을 재사용한다."""
+
+    __slots__ = ("hospitals", "columns", "_memo")
+
+    def __init__(self, hospitals: Sequence[dict]) -> None:
+        self.hospitals = list(hospitals)
+        self.columns: Dict[str, np.ndarray] = {
+            col: np.array([_num(h.get(col), default) for h in self.hospitals], dtype=np.float64)
+            for col, default in _DEFAULTS.items()
+        }
+        self._memo: Dict[Tuple[str, Optional[int], Optional[Tuple[Tuple[str, float], ...]]], List[dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self.hospitals)
+
+    def rank(
+        self,
+        sort_choice: str,
+        k: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> List[dict]:
+        wkey = tuple(sorted(weights.items())) if weights else None
+        key = (sort_choice, k, wkey)
+        hit = self._memo.get(key)
+        if hit is None:
+            idx = self.order(sort_choice, k, weights)
+            hit = self._memo[key] = [self.hospitals[i] for i in idx.tolist()]
+        return hit
+
+    def order(
+        self,
+        sort_choice: str,
+        k: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> np.ndarray:
+        """정렬된 인덱스 (k가 있으면 상위 k개만)"""
+        if sort_choice == COMPOSITE:
+            keys = [self.composite_score(weights)]
+        else:
+            keys = [_sort_key(self.columns[col], direction) for col, direction in SORT_KEYS[sort_choice]]
+        return _top_k_lexicographic(keys, k)
+
+    def composite_score(self, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        n = len(self.hospitals)
+        score = np.zeros(n, dtype=np.float64)
+        for col, (default_w, direction) in COMPOSITE_WEIGHTS.items():
+            w = (weights or {}).get(col, default_w)
+            values = self.columns[col]
+            present = ~np.isnan(values)
+            if not w or not present.any():
+                continue
+            # 없는 값은 실제 값들의 가장 나쁜 쪽으로 채워 min/max 범위를 넓히지 않는다
+            v = np.where(present, values, np.nanmax(values) if direction == 1 else np.nanmin(values))
+            lo, hi = v.min(), v.max()
+            norm = (v - lo) / (hi - lo) if hi > lo else np.zeros(n)
+            score += w * (norm if direction == 1 else 1.0 - norm)
+        return score
+
+
+def _sort_key(values: np.ndarray, direction: int) -> np.ndarray:
+    """방향을 반영한 오름차순 키. 값이 없으면(NaN) 방향과 관계없이 맨 뒤."""
+    key = values * direction
+    return np.where(np.isnan(key), np.inf, key)
+
+
+def _top_k_lexicographic(keys: List[np.ndarray], k: Optional[int]) -> np.ndarray:
+    """keys[0]이 1차 키. 결과는 sorted(..., key=튜플)과 같은 (안정) 순서."""
+    n = len(keys[0]) if keys else 0
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k is not None and k < n:
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        primary = keys[0]
+        kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+        cand = np.flatnonzero(primary <= kth)     # 동점 후보까지 포함 (원래 순서 유지)
+    else:
+        cand = np.arange(n)
+    # np.lexsort는 마지막 키가 1차 키이고 안정 정렬
+    sub = np.lexsort([key[cand] for key in reversed(keys)])
+    out = cand[sub]
+    return out[:k] if k is not None else out
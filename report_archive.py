@@ -0,0 +1,244 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from triage_session import TriageSession
+
+# "자가진단 저장" 레포트 보관소 (추가 전용 SQLite WAL).
+# 화면 스레드는 submit()으로 큐에 넣기만 하고, 기록 스레드가 모아서 한 트랜잭션으로 커밋한다.
+# 레포트 ID는 세션/환자와 무관한 무작위 값이다.
+
+logger = logging.getLogger(__name__)
+
+Cursor = Tuple[float, int]    # (created_at, seq) — 페이지 넘김용 키
+
+
+def build_report(session: "TriageSession", now: Optional[float] = None) -> dict:
+    """현재 세션의 진단 결과로 저장용 레포트를 만든다 (시각은 저장 시점으로 고정)"""
+    info = session.patient_info or {}
+    return {
+        "report_id": uuid.uuid4().hex,
+        "created_at": time.time() if now is None else now,
+        "triage_level": session.diagnosis.get("triage_level"),
+        "triage_source": session.diagnosis.get("triage_source"),
+        "summary": session.diagnosis.get("summary", ""),
+        "patient": {
+            "gender": info.get("gender"),
+            "age": info.get("age"),
+            "history": list(info.get("history") or []),
+        },
+        "hospitals": [h.get("name") for h in session.diagnosis.get("hospitals") or [] if isinstance(h, dict)],
+    }
+
+
+class ReportArchive:
+    """
+    레포트 보관소. submit()은 블로킹 없이 바로 반환하고,
+    page()는 (created_at, seq) 키셋 페이지네이션이라 몇 페이지째든 인덱스 탐색 한 번이다.
+    """
+
+    def __init__(self, path: str, max_batch: int = 512, flush_interval_s: float = 0.25, max_attempts: int = 3) -> None:
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval_s = flush_interval_s
+        self.max_attempts = max_attempts
+        self.committed = 0
+        self.batches = 0
+        self.dropped = 0       # max_attempts번 모두 실패해 버린 레포트 수
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._pending: Dict[str, dict] = {}    # 큐에 있지만 아직 커밋 전 (get()이 바로 찾을 수 있도록)
+        self._pending_lock = threading.Lock()
+
+        self._db = self._connect()
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "  seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            "  report_id TEXT NOT NULL UNIQUE,"
+            "  created_at REAL NOT NULL,"
+            "  triage_level TEXT,"
+            "  body TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at, seq);"
+            "CREATE INDEX IF NOT EXISTS reports_level_created ON reports (triage_level, created_at, seq);"
+        )
+        self._read_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name="report-archive-writer", daemon=True)
+        self._writer.start()
+        self._closed = False
+        atexit.register(self.close)    # 종료 시 대기열에 남은 레포트까지 커밋
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA busy_timeout=5000")
+        return db
+
+    # ---------------- 쓰기 ----------------
+    def submit(self, report: dict) -> str:
+        """레포트를 기록 대기열에 넣고 report_id를 반환 (디스크를 기다리지 않음)"""
+        with self._pending_lock:
+            self._pending[report["report_id"]] = report
+        self._queue.put(report)
+        return report["report_id"]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        지금까지 넣은 레포트가 모두 처리될 때까지 대기 (종료/테스트용).
+        모두 커밋됐으면 True, 시한을 넘겼거나 기다리는 동안 버려진 레포트가 있으면 False.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        dropped = self.dropped
+        while True:
+            with self._pending_lock:
+                if not self._pending:
+                    return self.dropped == dropped
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+        with self._read_lock:
+            self._db.close()
+
+    def _run(self) -> None:
+        db = self._connect()
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(db, batch)
+        db.close()
+
+    def _commit(self, db: sqlite3.Connection, batch: List[dict]) -> None:
+        """max_attempts번까지 재시도하고, 그래도 실패하면 배치를 버리고 기록한다 (flush()가 영원히 기다리지 않도록)"""
+        ok = False
+        try:
+            rows = [
+                (r["report_id"], r["created_at"], r.get("triage_level"), json.dumps(r, ensure_ascii=False))
+                for r in batch
+            ]
+        except (KeyError, TypeError, ValueError):
+            logger.exception("report archive: batch of %d reports is not serializable", len(batch))
+            rows = None
+        for attempt in range(self.max_attempts if rows is not None else 0):
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany(
+                    "INSERT OR IGNORE INTO reports (report_id, created_at, triage_level, body) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                db.execute("COMMIT")
+                ok = True
+                break
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                logger.warning("report archive commit failed (attempt %d, %d reports)", attempt + 1, len(rows), exc_info=True)
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(0.1 * (attempt + 1))
+        with self._pending_lock:
+            for r in batch:
+                self._pending.pop(r.get("report_id"), None)
+        if not ok:
+            self.dropped += len(batch)
+            logger.error(
+                "report archive dropped %d reports after %d attempts: %s",
+                len(batch), self.max_attempts, ", ".join(str(r.get("report_id")) for r in batch),
+            )
+            return
+        self.committed += len(rows)
+        self.batches += 1
+
+    # ---------------- 조회 ----------------
+    def get(self, report_id: str) -> Optional[dict]:
+        with self._pending_lock:
+            report = self._pending.get(report_id)
+        if report is not None:
+            return report
+        with self._read_lock:
+            row = self._db.execute("SELECT body FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(
+        self,
+        triage_level: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        after: Optional[Cursor] = None,
+        limit: int = 50,
+        newest_first: bool = True,
+    ) -> Tuple[List[dict], Optional[Cursor]]:
+        """
+        조건에 맞는 레포트 한 페이지와 다음 페이지 커서 (없으면 None).
+        after에는 이전 호출이 돌려준 커서를 그대로 넘긴다. 커밋된 레포트만 대상이다.
+        """
+        where, args = [], []
+        if triage_level is not None:
+            where.append("triage_level = ?")
+            args.append(triage_level)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        if after is not None:
+            where.append("(created_at, seq) < (?, ?)" if newest_first else "(created_at, seq) > (?, ?)")
+            args.extend(after)
+        order = "DESC" if newest_first else "ASC"
+        sql = (
+            "SELECT created_at, seq, body FROM reports"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY created_at {order}, seq {order} LIMIT ?"
+        )
+        args.append(limit + 1)
+        with self._read_lock:
+            rows = self._db.execute(sql, args).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        cursor = (rows[-1][0], rows[-1][1]) if more and rows else None
+        return [json.loads(body) for _, _, body in rows], cursor
+
+    def count(self, triage_level: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        where, args = [], []
+        if triage_level is not None:
+            where.append("triage_level = ?")
+            args.append(triage_level)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        sql = "SELECT COUNT(*) FROM reports" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._read_lock:
+            return self._db.execute(sql, args).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"pending": pending, "committed": self.committed, "batches": self.batches, "dropped": self.dropped}
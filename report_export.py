@@ -0,0 +1,303 @@
+import hashlib
+import html
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 자가진단 레포트 내보내기 (독립 실행 HTML / PDF).
+# 결과는 레포트 내용 해시로 캐시해 같은 레포트를 다시 요청하면 같은 바이트를 돌려준다.
+# PDF는 외부 라이브러리 없이 직접 만든다: 한글은 뷰어 내장 CJK 글꼴(HYGoThic-Medium, Adobe-Korea1)을
+# UniKS-UCS2-H 인코딩으로 참조하므로 글꼴 파일을 포함하지 않아도 된다.
+
+logger = logging.getLogger(__name__)
+
+RENDER_VERSION = 1      # 출력 형식을 바꾸면 올린다 (캐시 키에 포함)
+FORMATS = {"html": "text/html", "pdf": "application/pdf"}
+
+_LEVEL_BADGES = {
+    "응급": ("응급실 방문 권장", "#f80501"),
+    "외래": ("외래 진료 권장", "#08ec10"),
+}
+_HOME_BADGE = ("집에서 상태 확인", "#255b98")
+
+
+def _fields(report: dict) -> dict:
+    """내보내기에 쓰는 값만 (화면과 같은 문구)"""
+    p = report.get("patient") or {}
+    history = ", ".join(p.get("history") or []) or "과거력 없음"
+    badge, color = _LEVEL_BADGES.get(report.get("triage_level"), _HOME_BADGE)
+    summary = [ln.strip() for ln in (report.get("summary") or "").splitlines() if ln.strip()] or ["요약 내용이 없습니다."]
+    return {
+        "report_id": report.get("report_id", ""),
+        "timestamp": datetime.fromtimestamp(report["created_at"]).strftime("%Y년 %m월 %d일 %H:%M"),
+        "badge": badge,
+        "color": color,
+        "gender": str(p.get("gender") or "-"),
+        "age": f"만 {p.get('age')}세" if p.get("age") is not None else "-",
+        "history": history,
+        "summary": summary,
+        "hospitals": [h for h in report.get("hospitals") or [] if h],
+    }
+
+
+def content_hash(report: dict, fmt: str) -> str:
+    payload = json.dumps([RENDER_VERSION, fmt, _fields(report)], ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def file_name(report: dict, fmt: str) -> str:
+    return f"aegis_report_{report.get('report_id', 'draft')[:12]}.{fmt}"
+
+
+# ---------------- HTML ----------------
+def render_html(report: dict) -> bytes:
+    f = _fields(report)
+    e = html.escape
+    lines = "".join(f'<div class="line">{e(ln)}</div>' for ln in f["summary"])
+    hospitals = ""
+    if f["hospitals"]:
+        hospitals = '<div class="sec">주변 병원</div>' + "".join(f'<div class="line">{e(h)}</div>' for h in f["hospitals"])
+    doc = f"""<!DOCTYPE html>
+<html lang="ko"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>응급실 자가진단 요약 레포트</title>
+<style>
+body {{ font-family: -apple-system, "Apple SD Gothic Neo", "Malgun Gothic", "Noto Sans KR", sans-serif; color:#111827; }}
+.wrap {{ max-width:420px; margin:24px auto; }}
+.title {{ text-align:center; font-weight:700; font-size:20px; margin:6px 0 4px; }}
+.ts {{ text-align:center; color:#6b7280; font-size:12px; margin-bottom:10px; }}
+.badge {{ text-align:center; color:#fff; font-weight:700; border-radius:10px; padding:10px 14px; margin:10px auto 16px; width:90%; background:{f["color"]}; }}
+.sec {{ font-weight:700; font-size:16px; margin:12px 0 8px; }}
+.cards {{ display:flex; gap:8px; }}
+.card {{ flex:1; background:#f8fafc; border:1px solid #e5e7eb; border-radius:10px; padding:10px; text-align:center; }}
+.key {{ color:#6b7280; font-size:12px; margin-bottom:6px; }}
+.val {{ font-weight:700; font-size:16px; }}
+.line {{ background:#f3f4f6; border:1px solid #e5e7eb; border-radius:10px; padding:10px 12px; margin:8px 0; }}
+</style></head><body><div class="wrap">
+<div class="title">응급실 자가진단 요약 레포트</div>
+<div class="ts">레포트 저장 시각: {e(f["timestamp"])}</div>
+<div class="ts">레포트 번호: {e(f["report_id"][:12])}</div>
+<div class="badge">{e(f["badge"])}</div>
+<div class="sec">환자 기본 정보</div>
+<div class="cards">
+<div class="card"><div class="key">성별</div><div class="val">{e(f["gender"])}</div></div>
+<div class="card"><div class="key">나이</div><div class="val">{e(f["age"])}</div></div>
+<div class="card"><div class="key">과거력</div><div class="val">{e(f["history"])}</div></div>
+</div>
+<div class="sec">환자 자가진단 요약</div>
+{lines}
+{hospitals}
+</div></body></html>
+"""
+    return doc.encode("utf-8")
+
+
+# ---------------- PDF ----------------
+_PAGE_W, _PAGE_H = 595, 842     # A4 (pt)
+_MARGIN = 56
+_FONT = "HYGoThic-Medium"
+
+
+def _text_width(s: str, size: float) -> float:
+    return sum((0.5 if ord(ch) < 0x2E80 else 1.0) for ch in s) * size
+
+
+def _wrap(s: str, size: float, width: float) -> List[str]:
+    out, cur = [], ""
+    for ch in s:
+        if _text_width(cur + ch, size) > width and cur:
+            out.append(cur)
+            cur = ch.lstrip()
+        else:
+            cur += ch
+    if cur:
+        out.append(cur)
+    return out or [""]
+
+
+def _hex(s: str) -> str:
+    # UniKS-UCS2-H: UCS-2 빅엔디언 (BMP 밖 문자는 대체)
+    return "".join(f"{ord(ch):04X}" if ord(ch) < 0x10000 else "FFFD" for ch in s)
+
+
+def _rgb(color: str) -> Tuple[float, float, float]:
+    c = color.lstrip("#")
+    return tuple(int(c[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def render_pdf(report: dict) -> bytes:
+    f = _fields(report)
+    ops: List[str] = []
+    y = _PAGE_H - _MARGIN
+    width = _PAGE_W - 2 * _MARGIN
+
+    def text(s: str, size: float, x: float, gray: float = 0.07) -> None:
+        ops.append(f"{gray:.2f} g BT /F1 {size} Tf {x:.1f} {y:.1f} Td <{_hex(s)}> Tj ET")
+
+    def centered(s: str, size: float, gray: float = 0.07) -> None:
+        text(s, size, (_PAGE_W - _text_width(s, size)) / 2, gray)
+
+    centered("응급실 자가진단 요약 레포트", 18)
+    y -= 22
+    centered(f"레포트 저장 시각: {f['timestamp']}", 10, 0.42)
+    y -= 14
+    centered(f"레포트 번호: {f['report_id'][:12]}", 10, 0.42)
+    y -= 34
+    r, g, b = _rgb(f["color"])
+    ops.append(f"{r:.3f} {g:.3f} {b:.3f} rg {_MARGIN} {y - 10:.1f} {width} 30 re f")
+    text(f["badge"], 13, (_PAGE_W - _text_width(f["badge"], 13)) / 2, 1.0)
+    y -= 44
+
+    def section(title: str, lines: List[str]) -> None:
+        nonlocal y
+        text(title, 13, _MARGIN)
+        y -= 20
+        for ln in lines:
+            for part in _wrap(ln, 11, width - 16):
+                text(part, 11, _MARGIN + 8)
+                y -= 16
+        y -= 10
+
+    section("환자 기본 정보", [f"성별: {f['gender']}", f"나이: {f['age']}", f"과거력: {f['history']}"])
+    section("환자 자가진단 요약", f["summary"])
+    if f["hospitals"]:
+        section("주변 병원", f["hospitals"])
+
+    content = zlib.compress("\n".join(ops).encode("ascii"))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_PAGE_W} {_PAGE_H}] "
+        f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>".encode("ascii"),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + content + b"\nendstream",
+        f"<< /Type /Font /Subtype /Type0 /BaseFont /{_FONT} /Encoding /UniKS-UCS2-H "
+        f"/DescendantFonts [6 0 R] >>".encode("ascii"),
+        f"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{_FONT} "
+        f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Korea1) /Supplement 1 >> "
+        f"/FontDescriptor 7 0 R /DW 1000 /W [1 95 500] >>".encode("ascii"),
+        f"<< /Type /FontDescriptor /FontName /{_FONT} /Flags 6 /FontBBox [-6 -145 1003 880] "
+        f"/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>".encode("ascii"),
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{off:010d} 00000 n \n".encode("ascii") for off in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
+
+
+_RENDERERS = {"html": render_html, "pdf": render_pdf}
+
+
+# ---------------- 백그라운드 렌더링 + 캐시 ----------------
+class ExportFailed(Exception):
+    """이 레포트/형식의 마지막 렌더링이 실패함 (retry()로 지운 뒤 다시 요청)"""
+
+
+class ReportExporter:
+    """
+    내용 해시 → 바이트 LRU 캐시 + 렌더링 스레드 풀.
+    request()는 기다리지 않는다: 캐시에 있으면 바이트, 아니면 작업을 걸어 두고 None.
+    같은 해시의 작업이 진행 중이면 새로 만들지 않고, 진행 중 작업이 max_pending개면 더 받지 않는다.
+    렌더링이 실패하면 그 해시에 실패를 기록해 두고, retry() 전까지 request()는 ExportFailed를 던진다
+    (호출부가 같은 작업을 끝없이 다시 걸지 않도록).
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, cache_size: int = 256) -> None:
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.hits = 0
+        self.renders = 0
+        self.rejected = 0
+        self.failures = 0
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._failed: "OrderedDict[str, str]" = OrderedDict()     # 해시 → 오류 메시지
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-export")
+
+    def request(self, report: dict, fmt: str) -> Optional[bytes]:
+        if fmt not in _RENDERERS:
+            raise ValueError(f"unsupported export format: {fmt}")
+        key = content_hash(report, fmt)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+            error = self._failed.get(key)
+            if error is not None:
+                raise ExportFailed(error)
+            if key in self._inflight:
+                return None
+            if len(self._inflight) >= self.max_pending:
+                self.rejected += 1
+                return None
+            fut = self._pool.submit(_RENDERERS[fmt], dict(report))
+            self._inflight[key] = fut
+        fut.add_done_callback(lambda f, key=key: self._store(key, f))
+        return None
+
+    def render(self, report: dict, fmt: str) -> bytes:
+        """동기 렌더링 (캐시 사용) — 배치/CLI용. 기록된 실패가 있으면 지우고 직접 다시 렌더링한다."""
+        try:
+            data = self.request(report, fmt)
+        except ExportFailed:
+            self.retry(report, fmt)
+            return _RENDERERS[fmt](report)
+        if data is not None:
+            return data
+        key = content_hash(report, fmt)
+        with self._lock:
+            fut = self._inflight.get(key)
+        if fut is not None:
+            return fut.result()
+        return _RENDERERS[fmt](report)
+
+    def retry(self, report: dict, fmt: str) -> None:
+        """기록된 실패를 지운다 (다음 request()가 다시 렌더링을 건다)"""
+        with self._lock:
+            self._failed.pop(content_hash(report, fmt), None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "renders": self.renders,
+                "rejected": self.rejected,
+                "failures": self.failures,
+            }
+
+    def _store(self, key: str, fut: Future) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if fut.cancelled():
+                return
+            if fut.exception() is not None:
+                logger.error("report export failed", exc_info=fut.exception())
+                self.failures += 1
+                self._failed[key] = str(fut.exception()) or type(fut.exception()).__name__
+                while len(self._failed) > self.cache_size:
+                    self._failed.popitem(last=False)
+                return
+            self._cache[key] = fut.result()
+            self._cache.move_to_end(key)
+            self.renders += 1
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,139 @@
+"""
+저장된 세션 대량 위험도 채점 (감사/대시보드용).
+
+    python risk_batch.py sessions.jsonl -o scores.jsonl
+
+입력 한 줄: {"id": "...", "messages": [{"role": "...", "content": "..."}, ...]}
+출력 한 줄: {"id", "risk_score", "triage_level"}
+
+화면 경로(TriageSession.diagnose)와 같은 결과를 내도록 메시지마다 따로 스캔해 단어 집합을 합친다
+(질문 문구도 인덱스에 들어가므로 assistant 메시지까지 포함한 전체 기록이 필요하다).
+채점은 lexicon.RISK_RULES 표를 행렬로 바꿔 N개 세션을 한 번에 계산한다:
+    단어 행렬 F (N, V) → 절 충족 F @ A > 0 (N, 절) → 규칙 충족 (N, 규칙) → 점수 R @ w → 분류
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from lexicon import RISK_RULES, TRIAGE_DEFAULT, TRIAGE_THRESHOLDS, scan
+
+
+class RiskTable:
+    """규칙표를 (단어→열), 절 행렬, 규칙 행렬, 가중치 벡터로 컴파일"""
+
+    def __init__(self, rules=RISK_RULES, thresholds=TRIAGE_THRESHOLDS, default: str = TRIAGE_DEFAULT) -> None:
+        vocab: Dict[str, int] = {}
+        clauses: List[Tuple[str, ...]] = []
+        rule_of_clause: List[int] = []
+        for r, (conds, _) in enumerate(rules):
+            for clause in conds:
+                for w in clause:
+                    vocab.setdefault(w, len(vocab))
+                clauses.append(clause)
+                rule_of_clause.append(r)
+        self.vocab = vocab
+        self.clause_matrix = np.zeros((len(vocab), len(clauses)), dtype=np.int32)
+        for c, clause in enumerate(clauses):
+            self.clause_matrix[[vocab[w] for w in clause], c] = 1
+        self.rule_matrix = np.zeros((len(clauses), len(rules)), dtype=np.int32)
+        self.rule_matrix[np.arange(len(clauses)), rule_of_clause] = 1
+        self.clauses_per_rule = self.rule_matrix.sum(axis=0)
+        self.weights = np.array([w for _, w in rules], dtype=np.int64)
+        self.levels = np.array([lv for lv, _ in thresholds] + [default], dtype=object)
+        self.thresholds = np.array([t for _, t in thresholds], dtype=np.int64)
+
+    def feature_matrix(self, word_sets: Sequence[Set[str]]) -> np.ndarray:
+        """세션별 단어 집합 → 규칙에 쓰이는 단어의 유무 (N, V) bool"""
+        F = np.zeros((len(word_sets), len(self.vocab)), dtype=bool)
+        vocab = self.vocab
+        for i, words in enumerate(word_sets):
+            cols = [vocab[w] for w in words if w in vocab]
+            if cols:
+                F[i, cols] = True
+        return F
+
+    def scores(self, F: np.ndarray) -> np.ndarray:
+        clause_ok = (F.astype(np.int32) @ self.clause_matrix) > 0
+        rule_ok = (clause_ok.astype(np.int32) @ self.rule_matrix) == self.clauses_per_rule
+        return rule_ok.astype(np.int64) @ self.weights
+
+    def levels_for(self, scores: np.ndarray) -> np.ndarray:
+        """기준을 위에서부터 처음 만족하는 분류 (없으면 기본값)"""
+        if not len(self.thresholds):
+            return np.full(len(scores), self.levels[-1], dtype=object)
+        meets = scores[:, None] >= self.thresholds[None, :]
+        first = np.where(meets.any(axis=1), meets.argmax(axis=1), len(self.thresholds))
+        return self.levels[first]
+
+    def score_word_sets(self, word_sets: Sequence[Set[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.scores(self.feature_matrix(word_sets))
+        return scores, self.levels_for(scores)
+
+
+_TABLE: Optional[RiskTable] = None
+
+
+def default_table() -> RiskTable:
+    global _TABLE
+    if _TABLE is None:
+        _TABLE = RiskTable()
+    return _TABLE
+
+
+def words_for_messages(messages: Iterable[dict]) -> Set[str]:
+    """SymptomIndex.hits().words와 같은 단어 집합 (메시지별 스캔의 합집합)"""
+    words: Set[str] = set()
+    for m in messages:
+        words |= scan(m.get("content") or "").words
+    return words
+
+
+def score_sessions(message_lists: Iterable[Iterable[dict]], table: Optional[RiskTable] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """메시지 기록 N개 → (점수 (N,), 분류 (N,))"""
+    table = table or default_table()
+    return table.score_word_sets([words_for_messages(msgs) for msgs in message_lists])
+
+
+def _records(lines: Iterable[str], size: int) -> Iterator[List[dict]]:
+    it = (json.loads(ln) for ln in lines if ln.strip())
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="저장된 세션의 위험도/분류를 일괄 계산합니다.")
+    ap.add_argument("input", help="입력 JSONL 경로 ('-'는 stdin)")
+    ap.add_argument("-o", "--output", default="-", help="출력 JSONL 경로 (기본: stdout)")
+    ap.add_argument("--chunk-size", type=int, default=8192, help="한 번에 행렬로 채점하는 세션 수")
+    args = ap.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    n = 0
+    try:
+        for chunk in _records(src, args.chunk_size):
+            scores, levels = score_sessions(rec.get("messages") or [] for rec in chunk)
+            for rec, s, lv in zip(chunk, scores.tolist(), levels.tolist()):
+                dst.write(json.dumps({"id": rec.get("id"), "risk_score": s, "triage_level": lv}, ensure_ascii=False) + "\n")
+            n += len(chunk)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    elapsed = time.perf_counter() - t0
+    rate = n / elapsed if elapsed > 0 else float("inf")
+    print(f"{n} sessions in {elapsed:.2f}s ({rate:,.0f} sessions/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import sys
+from collections import deque
+from typing import Deque, FrozenSet, Iterator, Optional, Union
+
+# 세션당 메모리를 작고 일정하게 유지하기 위한 표현.
+# - Message: __slots__ 레코드 (역할 문자열은 intern해 모든 세션이 같은 객체를 공유)
+# - MessageLog: 최근 max_messages개만 남기는 링 버퍼 (밀려난 턴은 TriageSession이 요약 단어로 접는다)
+# 어떤 그래프 질문을 했는지는 TriageSession이 question_graph ID(asked_flags, last_question_id)로 기록한다.
+
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+
+DEFAULT_MAX_MESSAGES = 64
+
+
+class Message:
+    __slots__ = ("role", "content", "words", "html")
+
+    def __init__(self, role: str, content: str, words: Optional[FrozenSet[str]] = None) -> None:
+        self.role = sys.intern(role)
+        self.content = content
+        self.words = words      # 추가될 때 스캔한 사전 단어 (밀려날 때 다시 스캔하지 않도록, None = 모름)
+        self.html = None        # 화면용 말풍선 캐시 (step2가 채움, "" = 표시 안 함)
+
+    def __repr__(self) -> str:
+        return f"Message({self.role!r}, {self.content!r})"
+
+
+class MessageLog:
+    """
+    최근 메시지 링 버퍼. total은 지금까지 추가된 전체 개수라서
+    (total - 이전 total)로 새로 추가된 메시지를 알 수 있다.
+    """
+
+    __slots__ = ("_buf", "total")
+
+    def __init__(self, maxlen: int = DEFAULT_MAX_MESSAGES) -> None:
+        self._buf: Deque[Message] = deque(maxlen=maxlen)
+        self.total = 0
+
+    @property
+    def maxlen(self) -> int:
+        return self._buf.maxlen
+
+    @property
+    def evicted(self) -> int:
+        return self.total - len(self._buf)
+
+    def append(self, msg: Message) -> Optional[Message]:
+        """추가하고, 가득 차서 밀려난 메시지가 있으면 반환"""
+        buf = self._buf
+        out = buf[0] if len(buf) == buf.maxlen else None
+        buf.append(msg)
+        self.total += 1
+        return out
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._buf)
+
+    def __reversed__(self) -> Iterator[Message]:
+        return reversed(self._buf)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return list(self._buf)[i]
+        return self._buf[i]
@@ -0,0 +1,404 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# 세션 상태 저장소. 여러 Streamlit 서버 프로세스가 같은 사용자를 이어서 처리할 수 있도록
+# 세션 ID별로 {"step", "triage"(TriageSession.to_state())}를 버전과 함께 저장한다.
+# 모든 쓰기는 낙관적 동시성: 기대 버전이 저장된 버전과 같을 때만 더 큰 새 버전으로 기록한다.
+
+logger = logging.getLogger(__name__)
+
+Record = Tuple[int, dict]     # (버전, 상태)
+
+
+class VersionConflict(Exception):
+    """다른 프로세스가 먼저 같은 세션을 갱신함 (다시 읽고 반영해야 함)"""
+
+    def __init__(self, sid: str, expected: int, actual: Optional[int]) -> None:
+        super().__init__(f"session {sid}: expected version {expected}, found {actual}")
+        self.sid = sid
+        self.expected = expected
+        self.actual = actual
+
+
+class SessionStore(ABC):
+    """저장소 인터페이스. 버전 0 = 아직 저장된 적 없음."""
+
+    @abstractmethod
+    def load(self, sid: str) -> Optional[Record]:
+        ...
+
+    def version(self, sid: str) -> int:
+        rec = self.load(sid)
+        return rec[0] if rec else 0
+
+    def save(self, sid: str, state: dict, expected_version: int) -> int:
+        """기대 버전이 맞으면 저장하고 새 버전을 반환, 아니면 VersionConflict"""
+        version = self.save_many([(sid, state, expected_version)])[0]
+        if version < 0:
+            raise VersionConflict(sid, expected_version, self.version(sid))
+        return version
+
+    def save_many(self, items: List[Tuple[str, dict, int]]) -> List[int]:
+        """여러 세션을 한 번에 (항목별로 새 버전, 충돌한 항목은 -1)"""
+        return self.write_many([(sid, state, expected, expected + 1) for sid, state, expected in items])
+
+    @abstractmethod
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        """(sid, 상태, 기대 버전, 새 버전) 목록을 기록. 새 버전 또는 충돌 시 -1."""
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        ...
+
+    def take_conflict(self, sid: str) -> bool:
+        """저장 후 늦게 알게 된 충돌이 있었는지 (확인하면 지운다). 바로 기록하는 저장소는 save()가 알려 주므로 항상 False."""
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """프로세스 내 저장소 (단일 프로세스 배포/테스트용)"""
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[int, str]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Record]:
+        with self._lock:
+            item = self._data.get(sid)
+        return (item[0], json.loads(item[1])) if item else None
+
+    def version(self, sid: str) -> int:
+        with self._lock:
+            item = self._data.get(sid)
+        return item[0] if item else 0
+
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        out = []
+        with self._lock:
+            for sid, state, expected, new in items:
+                if self._data.get(sid, (0, ""))[0] != expected:
+                    out.append(-1)
+                    continue
+                self._data[sid] = (new, json.dumps(state, ensure_ascii=False))
+                out.append(new)
+        return out
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    로컬 SQLite(WAL) 저장소. 같은 호스트의 여러 서버 프로세스가 파일 하나를 공유한다.
+    write_many는 한 트랜잭션으로 커밋한다 (write-behind 배치와 함께 쓰면 커밋 수가 줄어든다).
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY, version INTEGER NOT NULL, updated_at REAL NOT NULL, state TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Record]:
+        with self._lock:
+            row = self._db.execute("SELECT version, state FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def version(self, sid: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        return row[0] if row else 0
+
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        now = time.time()
+        out = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for sid, state, expected, new in items:
+                    data = json.dumps(state, ensure_ascii=False)
+                    if expected == 0:
+                        cur = self._db.execute(
+                            "INSERT OR IGNORE INTO sessions (sid, version, updated_at, state) VALUES (?, ?, ?, ?)",
+                            (sid, new, now, data),
+                        )
+                    else:
+                        cur = self._db.execute(
+                            "UPDATE sessions SET version = ?, updated_at = ?, state = ?"
+                            " WHERE sid = ? AND version = ?",
+                            (new, now, data, sid, expected),
+                        )
+                    out.append(new if cur.rowcount == 1 else -1)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return out
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_older_than(self, seconds: float) -> int:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - seconds,))
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis 호환 서버 저장소 (여러 호스트). 키 하나에 HASH {version, state}, WATCH/MULTI로 비교 후 갱신.
+    redis 패키지는 이 백엔드를 쓸 때만 필요하다.
+    """
+
+    def __init__(self, url: str, prefix: str = "aegis:session:", ttl_s: Optional[int] = 86400) -> None:
+        import redis   # 선택 의존성
+        self._redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self._prefix = prefix
+        self._ttl_s = ttl_s
+
+    def _key(self, sid: str) -> str:
+        return self._prefix + sid
+
+    def load(self, sid: str) -> Optional[Record]:
+        version, state = self._redis.hmget(self._key(sid), "version", "state")
+        if version is None:
+            return None
+        return int(version), json.loads(state)
+
+    def version(self, sid: str) -> int:
+        version = self._redis.hget(self._key(sid), "version")
+        return int(version) if version is not None else 0
+
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        out = []
+        for sid, state, expected, new in items:
+            key = self._key(sid)
+            with self._redis.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    current = pipe.hget(key, "version")
+                    if (int(current) if current is not None else 0) != expected:
+                        out.append(-1)
+                        continue
+                    pipe.multi()
+                    pipe.hset(key, mapping={"version": new, "state": json.dumps(state, ensure_ascii=False)})
+                    if self._ttl_s:
+                        pipe.expire(key, self._ttl_s)
+                    pipe.execute()
+                    out.append(new)
+                except self._watch_error:
+                    out.append(-1)
+        return out
+
+    def delete(self, sid: str) -> None:
+        self._redis.delete(self._key(sid))
+
+    def close(self) -> None:
+        self._redis.close()
+
+
+class WriteBehindStore(SessionStore):
+    """
+    쓰기 지연 래퍼. save()는 대기열에 넣고 바로 돌아오며, 백그라운드 스레드가
+    flush_interval_s마다(또는 max_batch개가 쌓이면) 세션별 최신 상태만 모아 write_many로 기록한다.
+    버전은 대기열에 넣을 때 미리 계산하므로 같은 프로세스의 연속 저장은 충돌하지 않는다.
+    기록 중인(in-flight) 세션의 save는 그 기록 결과 위에 쌓이도록 다음 배치로 미룬다.
+    기록 시점에 충돌하면 그 세션의 대기 중 저장을 모두 버리고 충돌로 표시하며 (on_conflict(sid)가 있으면 호출),
+    take_conflict(sid)로 확인해 저장소에서 다시 읽을 때까지 그 세션의 save는 충돌로 거절한다
+    (미리 계산한 버전이 다른 워커의 버전과 겹쳐 그 상태를 덮어쓰지 않도록).
+    """
+
+    def __init__(
+        self,
+        backend: SessionStore,
+        flush_interval_s: float = 0.2,
+        max_batch: int = 256,
+        on_conflict: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.backend = backend
+        self.flush_interval_s = flush_interval_s
+        self.max_batch = max_batch
+        self.on_conflict = on_conflict
+        self.flushes = 0
+        self.written = 0
+        self.coalesced = 0
+        self.conflicts = 0
+        # sid → (저장소 기준 기대 버전, 대기 중 저장 횟수, 최신 상태)
+        self._pending: Dict[str, Tuple[int, int, dict]] = {}
+        self._inflight: Dict[str, Tuple[int, int, dict]] = {}   # 지금 write_many 중인 배치 (같은 형식)
+        self._conflicted: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="session-store-flush", daemon=True)
+        self._thread.start()
+
+    def _local(self, sid: str) -> Optional[Tuple[int, int, dict]]:
+        """아직 저장소에 확정되지 않은 이 세션의 최신 저장 (대기 중 > 기록 중). 호출자가 _lock을 잡는다."""
+        return self._pending.get(sid) or self._inflight.get(sid)
+
+    def load(self, sid: str) -> Optional[Record]:
+        with self._lock:
+            item = self._local(sid)
+        if item is not None:
+            base, n, state = item
+            return base + n, state
+        return self.backend.load(sid)
+
+    def version(self, sid: str) -> int:
+        with self._lock:
+            item = self._local(sid)
+        if item is not None:
+            return item[0] + item[1]
+        return self.backend.version(sid)
+
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        """
+        대기열을 거치지 않고 저장소에 바로 기록 (버전 확인은 저장소가 한다).
+        대기/기록 중인 저장이 있는 세션은 그 결과와 겹치지 않도록 충돌(-1)로 돌려준다.
+        """
+        with self._lock:
+            busy = [self._local(sid) is not None for sid, _, _, _ in items]
+        direct = [item for item, b in zip(items, busy) if not b]
+        results = iter(self.backend.write_many(direct) if direct else [])
+        return [-1 if b else next(results) for b in busy]
+
+    def save_many(self, items: List[Tuple[str, dict, int]]) -> List[int]:
+        out = []
+        with self._lock:
+            for sid, state, expected in items:
+                if sid in self._conflicted:
+                    out.append(-1)
+                    continue
+                item = self._pending.get(sid)
+                if item is not None:
+                    base, n, _ = item
+                    if expected != base + n:
+                        out.append(-1)
+                        continue
+                    self._pending[sid] = (base, n + 1, state)
+                    self.coalesced += 1
+                else:
+                    flying = self._inflight.get(sid)
+                    if flying is not None and expected != flying[0] + flying[1]:
+                        out.append(-1)
+                        continue
+                    self._pending[sid] = (expected, 1, state)
+                out.append(expected + 1)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+        return out
+
+    def take_conflict(self, sid: str) -> bool:
+        with self._lock:
+            if sid not in self._conflicted:
+                return False
+            self._conflicted.discard(sid)
+            return True
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._pending.pop(sid, None)
+            self._conflicted.discard(sid)
+        self.backend.delete(sid)
+
+    def flush(self) -> None:
+        with self._lock:
+            # 다른 flush가 기록 중인 세션은 그 결과가 나올 때까지 대기열에 남긴다
+            pending = {sid: item for sid, item in self._pending.items() if sid not in self._inflight}
+            for sid in pending:
+                del self._pending[sid]
+            self._inflight.update(pending)
+        if not pending:
+            return
+        # 대기 중 n번 저장은 저장소에 한 번 기록 (버전 base → base+n)
+        batch = [(sid, state, base, base + n) for sid, (base, n, state) in pending.items()]
+        try:
+            results = self.backend.write_many(batch)
+        except Exception:
+            logger.exception("session store flush failed; requeueing %d sessions", len(batch))
+            with self._lock:
+                for sid, (base, n, state) in pending.items():
+                    del self._inflight[sid]
+                    newer = self._pending.get(sid)
+                    # 기록 중에 쌓인 저장은 실패한 배치 위에 계산됐으므로 하나로 합친다
+                    self._pending[sid] = (base, n + newer[1], newer[2]) if newer else (base, n, state)
+            return
+        lost = []
+        with self._lock:
+            for (sid, _, _, _), new_version in zip(batch, results):
+                del self._inflight[sid]
+                if new_version < 0:
+                    # 잃은 버전 위에 쌓인 저장도 버린다: load()가 저장소의 승자를 읽도록
+                    self._pending.pop(sid, None)
+                    self._conflicted.add(sid)
+                    self.conflicts += 1
+                    lost.append(sid)
+        for sid in lost:
+            logger.info("session %s: write-behind save lost to another worker; reloading on next run", sid)
+            if self.on_conflict is not None:
+                self.on_conflict(sid)
+        self.flushes += 1
+        self.written += len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        self.backend.close()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+
+
+def open_store(url: Optional[str], write_behind: bool = True, flush_interval_s: float = 0.2) -> Optional[SessionStore]:
+    """
+    "memory", "sqlite:///경로", "redis://..." → 저장소. url이 없으면 None (st.session_state만 사용).
+    """
+    if not url:
+        return None
+    if url == "memory":
+        backend: SessionStore = MemorySessionStore()
+    elif url.startswith("sqlite:///"):
+        backend = SQLiteSessionStore(url[len("sqlite:///"):])
+    elif url.startswith(("redis://", "rediss://", "unix://")):
+        backend = RedisSessionStore(url)
+    else:
+        raise ValueError(f"unsupported session store url: {url}")
+    return WriteBehindStore(backend, flush_interval_s=flush_interval_s) if write_behind else backend
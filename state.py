@@ -1,48 +1,99 @@
+import hashlib
+import json
+import uuid
+from typing import Optional
+
 import streamlit as st
+from session_store import SessionStore, VersionConflict, open_store
+from triage_session import TriageSession
 
-def initialize_state() -> None:
-    if "step" not in st.session_state:
-        st.session_state.step = 1
+# 세션 저장소에 함께 저장하는 화면 상태 (문진 상태는 triage)
+_PERSISTED_KEYS = ("step", "show_location_modal", "privacy_agree", "report")
 
-    if "patient_info" not in st.session_state:
-        st.session_state.patient_info = {"gender": "남자", "age": 50, "history": ["고혈압"]}
+@st.cache_resource
+def session_store() -> Optional[SessionStore]:
+    """SESSION_STORE: "memory" | "sqlite:///경로" | "redis://..." (없으면 프로세스 내 st.session_state만 사용)"""
+    try:
+        url = st.secrets.get("SESSION_STORE")
+        flush_s = float(st.secrets.get("SESSION_STORE_FLUSH_MS", 200)) / 1000
+    except Exception:
+        url, flush_s = None, 0.2
+    return open_store(url, flush_interval_s=flush_s)
 
-    if "location_consent" not in st.session_state:
-        st.session_state.location_consent = False
+def _session_id() -> str:
+    """재접속/다른 서버 프로세스에서도 같은 세션을 찾도록 URL(?sid=)에 둔다"""
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    return sid
 
-    if "show_location_modal" not in st.session_state:
-        st.session_state.show_location_modal = False
+def _snapshot() -> dict:
+    snap = {k: st.session_state.get(k) for k in _PERSISTED_KEYS}
+    snap["triage"] = st.session_state.triage.to_state()
+    return snap
 
-    if "privacy_agree" not in st.session_state:
-        st.session_state.privacy_agree = False
+def _digest(snap: dict) -> str:
+    data = json.dumps(snap, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
 
-    if "chat_messages" not in st.session_state:
-        st.session_state.chat_messages = [
-            {"role": "assistant", "content": "지금 어디가 가장 불편하신가요?"}
-        ]
+def _apply(version: int, snap: dict) -> None:
+    for k in _PERSISTED_KEYS:
+        if k in snap:
+            st.session_state[k] = snap[k]
+    st.session_state.triage = TriageSession.from_state(snap["triage"])
+    st.session_state._store_version = version
+    st.session_state._store_digest = _digest(snap)
 
-    if "diagnosis" not in st.session_state:
-        st.session_state.diagnosis = {"triage_level": None, "summary": "", "hospitals": []}
+def restore_state(store: SessionStore) -> None:
+    """
+    저장소의 버전이 이 프로세스가 아는 버전과 다르면(다른 워커가 갱신/재접속) 저장된 상태로 교체.
+    지연 저장이 충돌했던 세션은 버전이 같아 보여도 다시 읽는다.
+    """
+    sid = _session_id()
+    if store.take_conflict(sid):
+        st.session_state.pop("_store_version", None)
+    elif store.version(sid) == st.session_state.get("_store_version", 0):
+        return
+    rec = store.load(sid)
+    if rec is not None:
+        _apply(*rec)
 
-    if "qa_pairs" not in st.session_state:
-        st.session_state.qa_pairs = 0
+def persist_state() -> None:
+    """스크립트 끝에서 호출: 상태가 바뀌었으면 기대 버전과 함께 저장 (충돌하면 저장된 쪽을 따른다)"""
+    store = session_store()
+    if store is None or "triage" not in st.session_state:
+        return
+    snap = _snapshot()
+    digest = _digest(snap)
+    if digest == st.session_state.get("_store_digest"):
+        return
+    sid = _session_id()
+    try:
+        version = store.save(sid, snap, st.session_state.get("_store_version", 0))
+    except VersionConflict:
+        store.take_conflict(sid)
+        rec = store.load(sid)
+        if rec is not None:
+            _apply(*rec)
+        return
+    st.session_state._store_version = version
+    st.session_state._store_digest = digest
 
-    if "last_assistant_question" not in st.session_state:
-        st.session_state.last_assistant_question = None
+def initialize_state() -> None:
+    if "step" not in st.session_state:
+        st.session_state.step = 1
 
-    if "yesno_options" not in st.session_state:
-        st.session_state.yesno_options = None
+    # 환자 정보/대화/슬롯/진단 결과는 모두 TriageSession 하나에 담는다
+    if "triage" not in st.session_state:
+        st.session_state.triage = TriageSession()
 
-    if "ready_to_diagnose" not in st.session_state:
-        st.session_state.ready_to_diagnose = False
+    if "show_location_modal" not in st.session_state:
+        st.session_state.show_location_modal = False
 
-    if "slots" not in st.session_state:
-        st.session_state.slots = {                      
-            "sob_at_rest": None,            
-            "gi_combo": None,            
-            "pain_worse_with_move": None,   
-            "chest_pain_duration": None,   
-        }
+    if "privacy_agree" not in st.session_state:
+        st.session_state.privacy_agree = False
 
-    if "asked_questions" not in st.session_state:
-        st.session_state.asked_questions = []               
+    store = session_store()
+    if store is not None:
+        restore_state(store)
@@ -19,21 +19,21 @@ def display() -> None:
     OTHER_LABEL = "기타"
 
     # 기존 기록(있다면)을 보여주되, 새 UI에서는 제출 시 덮어씌워진다.
-    prev_history = st.session_state.patient_info.get("history", [])
+    prev_history = st.session_state.triage.patient_info.get("history", [])
 
     with st.form("patient_info_form", clear_on_submit=False):
         st.markdown("**성별**")
-        st.session_state.patient_info["gender"] = st.radio(
+        st.session_state.triage.patient_info["gender"] = st.radio(
             "성별", ["남자", "여자"], horizontal=True, label_visibility= "collapsed"
         )
         
         st.markdown("**나이(만)**")
-        st.session_state.patient_info["age"] = int(
+        st.session_state.triage.patient_info["age"] = int(
             st.number_input(
                 "나이(만)",
                 min_value=1,
                 max_value=120,
-                value=int(st.session_state.patient_info["age"]),
+                value=int(st.session_state.triage.patient_info["age"]),
                 step=1,
                 label_visibility= "collapsed",
             )
@@ -84,7 +84,7 @@ def display() -> None:
             if not st.session_state.get("privacy_agree", False):
                 st.error("개인정보 수집 및 이용에 **동의**해 주세요.")
             else:
-                st.session_state.patient_info["history"] = selected
+                st.session_state.triage.patient_info["history"] = selected
                 st.session_state.show_location_modal = True
 
     if st.session_state.get("show_location_modal", False):
@@ -99,13 +99,13 @@ def display() -> None:
             no  = c3.button("허용 안 함", use_container_width=True, key="loc_no")
 
             if (app_yes or once_yes):
-                st.session_state.location_consent = True
+                st.session_state.triage.location_consent = True
                 st.session_state.show_location_modal = False
                 next_step()
                 st.rerun()
 
             if no:
-                st.session_state.location_consent = False
+                st.session_state.triage.location_consent = False
                 st.session_state.show_location_modal = False
                 next_step()
                 st.rerun()
@@ -1,7 +1,8 @@
 import streamlit as st
 import html, re   
+from typing import Callable
 from callbacks import next_step
-from utils import simulate_model_response, run_diagnosis
+from utils import llm_client, metrics_caption, show_metrics, simulate_model_response, stream_model_response, run_diagnosis
 from state import initialize_state
 
 CHAT_CSS = """
@@ -22,6 +23,9 @@ CHAT_CSS = """
 </style>
 """
 
+# 한 번에 그리는 최근 말풍선 수 ("이전 대화 보기"를 누를 때마다 이만큼 더)
+CHAT_WINDOW = 30
+
 def _esc(t: str) -> str:
     return html.escape(t).replace("\n", "<br>")
 
@@ -35,55 +39,84 @@ def _is_meaningful(text: str) -> bool:
     only_punc = re.sub(r"[.,;:·•–—\-_|*~'\"()\[\]{}!?]+", "", t)
     return bool(only_punc.strip())
 
+def _bubble_html(role: str, content: str) -> str:
+    side = "right" if role == "user" else "left"
+    bcls = "user" if role == "user" else "assistant"
+    avatar = "🧑" if role == "user" else "🤖"
+    return (
+        f"<div class='chat-row {side}'>"
+        f"<div class='avatar {bcls}'>{avatar}</div>"
+        f"<div class='bubble {bcls}'>{_esc(content)}</div>"
+        f"</div>"
+    )
+
 def _prune_empty_messages() -> None:
-    msgs = []
-    for m in st.session_state.chat_messages:
-        role = m.get("role", "assistant")
-        content = (m.get("content") or "")
-        if not _is_meaningful(content):
+    """
+    새로 추가된 메시지만 검사: 빈/의미없는 말풍선은 html=""로 숨기고, 나머지는 정리한 내용과
+    말풍선 HTML을 레코드(html)에 저장해 둔다. 뒤에서부터 보다가 이미 검사한 메시지에서 멈춘다.
+    """
+    for m in reversed(st.session_state.triage.messages):
+        if m.html is not None:
+            break
+        if not _is_meaningful(m.content or ""):
+            m.html = ""
             continue
-        msgs.append({"role": role, "content": content.strip()})
-    st.session_state.chat_messages = msgs
-
-def _render_chat() -> None:
-    st.markdown(CHAT_CSS, unsafe_allow_html=True)
-    st.markdown("<div class='chat-wrap'>", unsafe_allow_html=True)
-    for msg in st.session_state.chat_messages:
-        content = (msg.get("content") or "")
-        if not _is_meaningful(content):   
-            continue
-        role = msg.get("role", "assistant")
-        side = "right" if role == "user" else "left"
-        bcls = "user" if role == "user" else "assistant"
-        avatar = "🧑" if role == "user" else "🤖"
-        st.markdown(
-            f"<div class='chat-row {side}'>"
-            f"<div class='avatar {bcls}'>{avatar}</div>"
-            f"<div class='bubble {bcls}'>{_esc(content)}</div>"
-            f"</div>",
-            unsafe_allow_html=True,
-        )
-    st.markdown("</div>", unsafe_allow_html=True)
+        m.content = m.content.strip()
+        m.html = _bubble_html(m.role, m.content)
+
+def _show_earlier() -> None:
+    st.session_state.chat_window = st.session_state.get("chat_window", CHAT_WINDOW) + CHAT_WINDOW
+
+def _chat_markdown(bubbles: str) -> str:
+    return f"{CHAT_CSS}<div class='chat-wrap'>{bubbles}</div>"
+
+def _render_chat() -> Callable[[str], None]:
+    """
+    최근 chat_window개 말풍선을 스타일과 함께 한 번의 st.markdown으로.
+    스트리밍 중인 질문을 마지막 말풍선으로 덧붙여 다시 그리는 함수를 반환한다.
+    """
+    session = st.session_state.triage
+    msgs = session.messages
+    visible = [m.html for m in msgs if m.html]   # 링 버퍼 크기로 제한됨
+    window = st.session_state.get("chat_window", CHAT_WINDOW)
+    if len(visible) > window:
+        st.button(f"이전 대화 보기 ({len(visible) - window})", key="chat_show_earlier", on_click=_show_earlier)
+    bubbles = "".join(visible[-window:])
+    if msgs.evicted and window >= len(visible):
+        # 링 버퍼에서 밀려난 앞부분은 증상 요약 한 줄로
+        bubbles = _bubble_html("assistant", f"(이전 대화 요약) {session.history_summary()}") + bubbles
+    box = st.empty()
+    box.markdown(_chat_markdown(bubbles), unsafe_allow_html=True)
+
+    def _render_streaming(partial: str) -> None:
+        box.markdown(_chat_markdown(bubbles + _bubble_html("assistant", partial)), unsafe_allow_html=True)
+    return _render_streaming
 
 def display() -> None:
     initialize_state()
+    llm_client()   # 첫 입력 전에 공용 LLM 클라이언트를 만들어 연결을 미리 열어 둔다 (프로세스당 1회)
 
     # 상단 환자 정보
-    info = st.session_state.patient_info
+    session = st.session_state.triage
+    info = session.patient_info
     history_str = ", ".join(info.get("history", [])) if info.get("history") else "과거력 없음"
     st.subheader(f"{info['gender']} / {info['age']}세 / {history_str}")
 
     # 빈/의미없는 말풍선 정리 후 렌더
     _prune_empty_messages()   
-    _render_chat()
+    render_streaming = _render_chat()
+
+    # 스트리밍 모드: 이번 입력에 대한 질문을 토큰 단위로 그리고, 끝나면 아래 예/아니오 버튼이 붙는다
+    followup = stream_model_response(render_streaming)
+    if followup:
+        render_streaming(followup)
 
     # --- 예/아니오 빠른 응답 ---
-    last_q = st.session_state.get("last_assistant_question")
-    yesno_opts = st.session_state.get("yesno_options")
+    last_q = session.last_assistant_question
+    yesno_opts = session.yesno_options
     if last_q and yesno_opts:
         cols = st.columns(len(yesno_opts))
         def _on_yesno(opt: str):
-            st.session_state.chat_messages.append({"role": "user", "content": opt})
             simulate_model_response(opt)
             # 콜백에서 rerun 호출하지 않음(경고 방지)   
         for i, opt in enumerate(yesno_opts):
@@ -94,7 +127,6 @@ def display() -> None:
         text = (st.session_state.get("free_input") or "").strip()
         if not text:
             return
-        st.session_state.chat_messages.append({"role": "user", "content": text})
         st.session_state.free_input = ""  # 안전: 콜백 내부
         simulate_model_response(text)
         # 콜백에서는 rerun 호출 안 함   
@@ -105,14 +137,16 @@ def display() -> None:
         st.text_input("증상을 입력하세요", key="free_input", label_visibility="collapsed")
     with c2:
         st.button("전송", use_container_width=True, on_click=_on_send)
+    if show_metrics:
+        st.caption(metrics_caption())
 
     # --- 자동/수동 진단 ---
-    pair_count = st.session_state.get("qa_pairs", 0)
-    should_autorun = st.session_state.get("ready_to_diagnose", False) or pair_count >= 9
+    pair_count = session.qa_pairs
+    should_autorun = session.should_autodiagnose()
 
     if should_autorun:
         if not st.session_state.get("_diag_banner", False):
-            st.session_state.chat_messages.append({"role": "assistant", "content": "진단을 진행하겠습니다."})
+            session.add_message("assistant", "진단을 진행하겠습니다.")
             st.session_state._diag_banner = True
         run_diagnosis()
         next_step()
@@ -1,5 +1,10 @@
+import hashlib
+import html
+import json
+
 import streamlit as st
-from callbacks import go_to_step, reset_and_go_to_step
+from callbacks import reset_and_go_to_step, save_report_and_go_to_step
+from ranking import SORT_CHOICES, HospitalRanking
 
 def center_text(
     text: str,
@@ -27,18 +32,79 @@ def center_text(
 def vspace(px: int = 12):
     st.markdown(f"<div style='height:{px}px'></div>", unsafe_allow_html=True)
 
+CARD_PAGE_SIZE = 20
+
+_CARD_CSS = """
+<style>
+.h-card{
+    background:#ffffff;
+    border:1px solid #e5e7eb;
+    border-radius:16px;
+    padding:14px 14px 10px;
+    margin:10px 0;
+    box-shadow: 0 1px 2px rgba(0,0,0,0.04);
+}
+.h-title{font-weight:800; font-size:16px; text-align:left;}
+.h-meta{color:#6b7280; font-size:12px; margin-top:2px; text-align:left;}
+.h-row{display:flex; align-items:center; gap:8px; color:#374151; font-size:14px; margin-top:8px;}
+.h-ico{width:18px; text-align:center;}
+</style>
+"""
+
+# (목록 해시, 정렬 기준, 표시 개수) → 카드 목록 HTML. 같은 조회 결과면 세션 간에도 공유
+_FRAGMENT_CACHE_SIZE = 128
+
+def _ranking_for(hospitals: list) -> tuple:
+    """같은 병원 목록(같은 조회 결과)이면 정렬 엔진과 목록 해시를 재사용 → (ranking, digest)"""
+    cached = st.session_state.get("_hospital_ranking")
+    if cached is None or cached[0] is not hospitals:
+        digest = hashlib.blake2b(
+            json.dumps(hospitals, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        cached = (hospitals, HospitalRanking(hospitals), digest)
+        st.session_state._hospital_ranking = cached
+    return cached[1], cached[2]
+
+def _card_html(h: dict) -> str:
+    name = html.escape(str(h.get("name", "병원")))
+    dist = h.get("distance_km", None)
+    dist_txt = f"{dist:.1f}km" if isinstance(dist, (int, float)) else "-"
+    addr = html.escape(str(h.get("address", "-")))
+    phone = html.escape(str(h.get("phone", "-")))
+    doctors = html.escape(str(h.get("doctors", "-")))
+    beds = html.escape(str(h.get("beds", "-")))
+    return (
+        f'<div class="h-card">'
+        f'<div class="h-title">{name}</div>'
+        f'<div class="h-meta">🧑‍⚕️ 의사 {doctors} · 🛏 병상 {beds}</div>'
+        f'<div class="h-row"><div class="h-ico">📍</div> <div>{dist_txt}</div></div>'
+        f'<div class="h-row"><div class="h-ico">🗺️</div> <div>{addr}</div></div>'
+        f'<div class="h-row"><div class="h-ico">☎</div> <div>{phone}</div></div>'
+        f'</div>'
+    )
+
+@st.cache_data(max_entries=_FRAGMENT_CACHE_SIZE, show_spinner=False)
+def _cards_fragment(_ranking: HospitalRanking, digest: str, sort_choice: str, shown: int) -> str:
+    """상위 shown개 카드를 스타일과 함께 한 덩어리 HTML로 (캐시 키는 digest/정렬/개수, _ranking은 해시하지 않음)"""
+    cards = "".join(_card_html(h) for h in _ranking.rank(sort_choice, k=shown))
+    return _CARD_CSS + f"<div>{cards}</div>"
+
+def _show_more_cards() -> None:
+    st.session_state.hospital_cards_shown += CARD_PAGE_SIZE
+
 def display() -> None:
-    triage_level = st.session_state.diagnosis.get("triage_level")
+    triage_level = st.session_state.triage.diagnosis.get("triage_level")
     show_hospital_list = False
 
-    if triage_level == "emergency":
+    if triage_level == "응급":
         center_text("🚨 응급실 방문을 권장합니다 🚨", size="large", bold=True, margin_px=10, color="#f80501")
         center_text(
             "빠른 응급실 방문을 위해, 응급실 안내를 도와드릴게요. 방문 전 전화확인 후 내원하시길 안내드립니다.",
             size="small",
         )
         show_hospital_list = True
-    elif triage_level == "outpatient":
+    elif triage_level == "외래":
         center_text("👨‍⚕️ 외래 진료를 권장합니다 👨‍⚕️", size="large", bold=True, margin_px=10, color="#08ec10")
         center_text("외래 진료받을 수 있는 병원 안내를 도와드릴게요.", size="small")
         show_hospital_list = True
@@ -53,7 +119,7 @@ def display() -> None:
         st.write("---")
         center_text("주변 병원 정보", size="large", bold=True, margin_px=6)
 
-        hospitals = st.session_state.diagnosis.get("hospitals", [])
+        hospitals = st.session_state.triage.diagnosis.get("hospitals", [])
 
         if hospitals and isinstance(hospitals[0], str):
             tmp = []
@@ -67,68 +133,31 @@ def display() -> None:
                     "beds": 20 + i * 5,
                 })
             hospitals = tmp
+            st.session_state.triage.diagnosis["hospitals"] = hospitals
 
         # 정렬 토글
         sort_choice = st.selectbox(
             "정렬",                     
-            ["거리순", "의사수순", "병상수순"],
+            list(SORT_CHOICES),
             index=0,
             key="hospital_sort_choice",  
             label_visibility="collapsed" 
         )
 
-        def sort_key(h):
-            if sort_choice == "거리순":
-                return (h.get("distance_km", 1e9), -(h.get("doctors", 0)), -(h.get("beds", 0)))
-            elif sort_choice == "의사수순":
-                return (-(h.get("doctors", 0)), h.get("distance_km", 1e9), -(h.get("beds", 0)))
-            else:  # 병상수순
-                return (-(h.get("beds", 0)), h.get("distance_km", 1e9), -(h.get("doctors", 0)))
-
-        hospitals_sorted = sorted(hospitals, key=sort_key)
-
-        st.markdown(
-            """
-            <style>
-            .h-card{
-                background:#ffffff;
-                border:1px solid #e5e7eb;
-                border-radius:16px;
-                padding:14px 14px 10px;
-                margin:10px 0;
-                box-shadow: 0 1px 2px rgba(0,0,0,0.04);
-            }
-            .h-title{font-weight:800; font-size:16px; text-align:left;}
-            .h-meta{color:#6b7280; font-size:12px; margin-top:2px; text-align:left;}
-            .h-row{display:flex; align-items:center; gap:8px; color:#374151; font-size:14px; margin-top:8px;}
-            .h-ico{width:18px; text-align:center;}
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
+        ranking, digest = _ranking_for(hospitals)
+
+        # 목록이나 정렬이 바뀌면 첫 페이지부터
+        view = (digest, sort_choice)
+        if st.session_state.get("_hospital_cards_view") != view:
+            st.session_state._hospital_cards_view = view
+            st.session_state.hospital_cards_shown = CARD_PAGE_SIZE
+        shown = min(st.session_state.hospital_cards_shown, len(ranking))
 
-        if hospitals_sorted:
-            for h in hospitals_sorted:
-                name = h.get("name", "병원")
-                dist = h.get("distance_km", None)
-                dist_txt = f"{dist:.1f}km" if isinstance(dist, (int, float)) else "-"
-                addr = h.get("address", "-")
-                phone = h.get("phone", "-")
-                doctors = h.get("doctors", "-")
-                beds = h.get("beds", "-")
-
-                st.markdown(
-                    f"""
-                    <div class="h-card">
-                        <div class="h-title">{name}</div>
-                        <div class="h-meta">🧑‍⚕️ 의사 {doctors} · 🛏 병상 {beds}</div>
-                        <div class="h-row"><div class="h-ico">📍</div> <div>{dist_txt}</div></div>
-                        <div class="h-row"><div class="h-ico">🗺️</div> <div>{addr}</div></div>
-                        <div class="h-row"><div class="h-ico">☎</div> <div>{phone}</div></div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
+        if shown:
+            st.markdown(_cards_fragment(ranking, digest, sort_choice, shown), unsafe_allow_html=True)
+            if shown < len(ranking):
+                st.caption(f"{shown} / {len(ranking)}곳 표시 중")
+                st.button("병원 더 보기", on_click=_show_more_cards, key="hospital_cards_more")
         else:
             center_text("주변 병원 정보를 불러올 수 없습니다. (위치 정보 미동의)", size="small", margin_px=4)
 
@@ -145,13 +174,13 @@ def display() -> None:
     col1, col2, col3 = st.columns([1, 3, 1])
     with col2:
         b1, b2 = st.columns(2)
-        if triage_level == "emergency":
+        if triage_level == "응급":
             with b1:
-                st.button("자가진단 저장", on_click=go_to_step, args=[4])
+                st.button("자가진단 저장", on_click=save_report_and_go_to_step, args=[4])
             with b2:
                 st.button("119 호출하기", type="primary")
         else:
             with b1:
-                st.button("자가진단 저장", on_click=go_to_step, args=[4])
+                st.button("자가진단 저장", on_click=save_report_and_go_to_step, args=[4])
             with b2:
                 st.button("자가진단 다시하기", on_click=reset_and_go_to_step, args=[2])
@@ -1,6 +1,53 @@
 import streamlit as st
 from datetime import datetime
 from callbacks import go_to_step
+from report_archive import build_report
+from report_export import FORMATS, ExportFailed, file_name
+from utils import report_exporter
+
+def _export_files(report: dict) -> dict:
+    """형식별 바이트 (준비 중이면 None, 렌더링이 실패했으면 ExportFailed)"""
+    exporter = report_exporter()
+    files = {}
+    for fmt in FORMATS:
+        try:
+            files[fmt] = exporter.request(report, fmt)
+        except ExportFailed as e:
+            files[fmt] = e
+    return files
+
+def _export_buttons(report: dict) -> None:
+    """HTML/PDF 저장 버튼 (파일이 준비될 때까지는 비활성 버튼, 실패하면 다시 시도 버튼)"""
+    # 전체 실행에서는 _export_section이 방금 조회한 결과를 쓰고, 주기적 재실행에서만 다시 조회한다
+    files = st.session_state.pop("_export_files", None) or _export_files(report)
+    cols = st.columns(len(files))
+    for col, (fmt, data) in zip(cols, files.items()):
+        with col:
+            if isinstance(data, ExportFailed):
+                st.error(f"{fmt.upper()} 파일을 만들지 못했습니다.")
+                if st.button("다시 시도", key=f"export_retry_{fmt}", use_container_width=True):
+                    report_exporter().retry(report, fmt)
+                    st.rerun()      # 전체를 다시 그려 주기적 갱신을 다시 켠다
+            elif data is None:
+                st.button(f"{fmt.upper()} 준비 중…", disabled=True, key=f"export_wait_{fmt}", use_container_width=True)
+            else:
+                st.download_button(
+                    f"{fmt.upper()}로 저장", data,
+                    file_name=file_name(report, fmt), mime=FORMATS[fmt],
+                    key=f"export_{fmt}", use_container_width=True,
+                )
+    if st.session_state.get("_export_waiting") and all(data is not None for data in files.values()):
+        # 다 준비됐거나 실패했으면 전체를 한 번 다시 그려 주기적 갱신을 끈다
+        st.session_state._export_waiting = False
+        st.rerun()
+
+def _export_section(report: dict) -> None:
+    """렌더링은 백그라운드에서 하고, 기다리는 동안에는 버튼 부분(fragment)만 주기적으로 다시 그린다"""
+    files = _export_files(report)
+    waiting = any(data is None for data in files.values())
+    st.session_state._export_waiting = waiting
+    st.session_state._export_files = files
+    st.fragment(_export_buttons, run_every=0.25 if waiting else None)(report)
 
 def display() -> None:
     st.markdown(
@@ -38,20 +85,25 @@ def display() -> None:
         unsafe_allow_html=True,
     )
 
-    now = datetime.now().strftime("%Y년 %m월 %d일 %H:%M")
-    p_info = st.session_state.patient_info
-    diagnosis_summary = st.session_state.diagnosis.get("summary", "")
-    triage_level = st.session_state.diagnosis.get("triage_level")
+    # "자가진단 저장" 시점에 만든 레포트를 그대로 보여준다 (없으면 현재 세션으로 생성)
+    if not st.session_state.get("report"):
+        st.session_state.report = build_report(st.session_state.triage)
+    report = st.session_state.report
+    now = datetime.fromtimestamp(report["created_at"]).strftime("%Y년 %m월 %d일 %H:%M")
+    p_info = report["patient"]
+    diagnosis_summary = report.get("summary", "")
+    triage_level = report.get("triage_level")
 
     with st.container():
         st.markdown('<div class="report-wrap">', unsafe_allow_html=True)
 
         st.markdown('<div class="report-title">응급실 자가진단 요약 레포트</div>', unsafe_allow_html=True)
         st.markdown(f'<div class="report-ts">레포트 저장 시각: {now}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="report-ts">레포트 번호: {report["report_id"][:12]}</div>', unsafe_allow_html=True)
 
-        if triage_level == "emergency":
+        if triage_level == "응급":
             st.markdown('<div class="badge badge-emg">응급실 방문 권장</div>', unsafe_allow_html=True)
-        elif triage_level == "outpatient":
+        elif triage_level == "외래":
             st.markdown('<div class="badge badge-out">외래 진료 권장</div>', unsafe_allow_html=True)
         else:
             st.markdown('<div class="badge badge-home">집에서 상태 확인</div>', unsafe_allow_html=True)
@@ -98,6 +150,8 @@ def display() -> None:
         else:
             st.markdown('<div class="line-card">요약 내용이 없습니다.</div>', unsafe_allow_html=True)
 
+        _export_section(report)
+
         st.markdown('<div class="btn-wrap">', unsafe_allow_html=True)
         col1, col2, col3 = st.columns([1, 1, 1]) 
         with col2:
@@ -0,0 +1,119 @@
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from lexicon import Hits, scan
+
+# 세션별 증상 인덱스: 메시지가 추가될 때 한 번만 스캔해 누적/구간 집계를 갱신한다.
+# 매 턴 대화 전체를 다시 이어붙여 스캔하던 비용을 메시지 1개 분량으로 고정한다.
+
+DEFAULT_WINDOWS = (3, 8)    # simulate_model_response: 토픽(최근 3개), 조기 종료(최근 8개)
+
+
+class _Window:
+    """최근 N개 메시지의 단어/카테고리 카운트 (밀려난 메시지는 차감)"""
+
+    __slots__ = ("size", "items", "words", "categories")
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.items: Deque[Tuple[FrozenSet[str], FrozenSet[str]]] = deque()
+        self.words: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+
+    def push(self, words: FrozenSet[str], categories: FrozenSet[str]) -> None:
+        self.items.append((words, categories))
+        _increment(self.words, words)
+        _increment(self.categories, categories)
+        if len(self.items) > self.size:
+            old_words, old_cats = self.items.popleft()
+            _decrement(self.words, old_words)
+            _decrement(self.categories, old_cats)
+
+
+# Counter.update는 매 호출 isinstance 검사 비용이 커서 단순 dict 카운트를 쓴다
+def _increment(counter: Dict[str, int], keys: Iterable[str]) -> None:
+    get = counter.get
+    for k in keys:
+        counter[k] = get(k, 0) + 1
+
+
+def _decrement(counter: Dict[str, int], keys: Iterable[str]) -> None:
+    for k in keys:
+        n = counter[k] - 1
+        if n > 0:
+            counter[k] = n
+        else:
+            del counter[k]
+
+
+class SymptomIndex:
+    """
+    누적: 단어별 등장 메시지 수(counts)와 처음 등장한 턴(first_seen).
+    구간: DEFAULT_WINDOWS 크기별 최근 메시지 집계.
+    """
+
+    __slots__ = ("turn", "counts", "first_seen", "category_counts", "_windows")
+
+    def __init__(self, windows: Iterable[int] = DEFAULT_WINDOWS) -> None:
+        self.turn = 0
+        self.counts: Dict[str, int] = {}
+        self.first_seen: Dict[str, int] = {}
+        self.category_counts: Dict[str, int] = {}
+        self._windows: Dict[int, _Window] = {n: _Window(n) for n in windows}
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[dict], windows: Iterable[int] = DEFAULT_WINDOWS) -> "SymptomIndex":
+        index = cls(windows)
+        for m in messages:
+            index.add(m.get("content", ""))
+        return index
+
+    # ---------------- 저장/복원 (session_store) ----------------
+    def to_state(self) -> dict:
+        """JSON으로 직렬화 가능한 상태. 구간 집계는 가장 큰 구간의 최근 메시지들로 재구성한다."""
+        widest = max(self._windows.values(), key=lambda w: w.size, default=None)
+        recent = [[sorted(w), sorted(c)] for w, c in widest.items] if widest else []
+        return {
+            "turn": self.turn,
+            "counts": self.counts,
+            "first_seen": self.first_seen,
+            "category_counts": self.category_counts,
+            "windows": sorted(self._windows),
+            "recent": recent,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SymptomIndex":
+        index = cls(state.get("windows", DEFAULT_WINDOWS))
+        index.turn = state["turn"]
+        index.counts = dict(state["counts"])
+        index.first_seen = dict(state["first_seen"])
+        index.category_counts = dict(state["category_counts"])
+        for words, cats in state["recent"]:
+            item = (frozenset(words), frozenset(cats))
+            for window in index._windows.values():
+                window.push(*item)
+        return index
+
+    def add(self, text: str) -> Hits:
+        """메시지 1개 반영 (메시지당 정확히 한 번 호출)"""
+        hits = scan(text)
+        self.turn += 1
+        words = frozenset(hits.words)
+        cats = frozenset(hits.categories)
+        _increment(self.counts, words)
+        _increment(self.category_counts, cats)
+        for w in words:
+            self.first_seen.setdefault(w, self.turn)
+        for window in self._windows.values():
+            window.push(words, cats)
+        return hits
+
+    def hits(self, last: Optional[int] = None) -> Hits:
+        """전체(last=None) 또는 최근 last개 메시지의 집계를 Hits 형태로 반환"""
+        if last is None:
+            return Hits(set(self.counts), set(self.category_counts))
+        window = self._windows.get(last)
+        if window is None:
+            raise KeyError(f"window {last} is not tracked (tracked: {sorted(self._windows)})")
+        return Hits(set(window.words), set(window.categories))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 앱 모듈은 저장소 최상위에 평평하게 있다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import threading
+from typing import List, Optional, Tuple
+
+from session_store import MemorySessionStore, Record, SessionStore, WriteBehindStore
+
+
+class _PausedBackend(SessionStore):
+    """write_many 진입 시 멈춰서 테스트가 기록 도중에 끼어들 수 있게 하는 저장소"""
+
+    def __init__(self, inner: SessionStore) -> None:
+        self.inner = inner
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def load(self, sid: str) -> Optional[Record]:
+        return self.inner.load(sid)
+
+    def write_many(self, items: List[Tuple[str, dict, int, int]]) -> List[int]:
+        self.entered.set()
+        self.release.wait(5)
+        return self.inner.write_many(items)
+
+    def delete(self, sid: str) -> None:
+        self.inner.delete(sid)
+
+
+def _write_behind(backend: SessionStore) -> WriteBehindStore:
+    # 백그라운드 flush가 끼어들지 않도록 간격을 길게 두고 flush()를 직접 부른다
+    return WriteBehindStore(backend, flush_interval_s=3600)
+
+
+def test_save_during_inflight_flush_does_not_overwrite_other_worker():
+    shared = MemorySessionStore()
+    shared.save("s", {"who": "init"}, 0)
+    paused = _PausedBackend(shared)
+    a = _write_behind(paused)
+
+    assert a.save("s", {"who": "A1"}, 1) == 2
+    flusher = threading.Thread(target=a.flush)
+    flusher.start()
+    assert paused.entered.wait(5)
+
+    shared.save("s", {"who": "B"}, 1)              # 다른 워커가 먼저 v2를 기록
+    assert a.save("s", {"who": "A2"}, 2) == 3      # 기록 중인 세션: 다음 배치로 미뤄진다
+    paused.release.set()
+    flusher.join(5)
+
+    assert a.take_conflict("s")
+    assert a.load("s") == (2, {"who": "B"})        # 대기 중이던 A2가 아니라 저장소의 승자
+    a.flush()
+    assert shared.load("s") == (2, {"who": "B"})
+    assert a.save("s", {"who": "A3"}, 2) == 3      # 다시 읽은 버전 위에서는 정상 저장
+    a.flush()
+    assert shared.load("s") == (3, {"who": "A3"})
+
+
+def test_save_during_inflight_flush_lands_after_success():
+    shared = MemorySessionStore()
+    paused = _PausedBackend(shared)
+    a = _write_behind(paused)
+
+    assert a.save("s", {"n": 1}, 0) == 1
+    flusher = threading.Thread(target=a.flush)
+    flusher.start()
+    assert paused.entered.wait(5)
+    assert a.load("s") == (1, {"n": 1})            # 기록 중에도 로컬 최신 상태를 읽는다
+    assert a.save_many([("s", {"n": 2}, 0)]) == [-1]   # 기록 중 버전과 맞지 않는 저장은 거절
+    assert a.save("s", {"n": 2}, 1) == 2
+    paused.release.set()
+    flusher.join(5)
+
+    assert not a.take_conflict("s")
+    a.flush()
+    assert shared.load("s") == (2, {"n": 2})
+
+
+def test_write_many_goes_to_backend_and_rejects_busy_sessions():
+    shared = MemorySessionStore()
+    a = _write_behind(shared)
+
+    assert a.write_many([("x", {"v": 1}, 0, 1)]) == [1]
+    assert shared.load("x") == (1, {"v": 1})
+    assert a.write_many([("x", {"v": 2}, 0, 1)]) == [-1]    # 저장소의 버전 확인
+
+    a.save("y", {"v": 1}, 0)
+    assert a.write_many([("y", {"v": 9}, 0, 1), ("x", {"v": 2}, 1, 2)]) == [-1, 2]
+    a.flush()
+    assert shared.load("y") == (1, {"v": 1})
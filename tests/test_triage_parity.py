@@ -0,0 +1,81 @@
+"""
+같은 대화가 어느 경로로 처리되든 결과가 같은지 확인한다.
+
+- 화면 경로(utils.simulate_model_response / run_diagnosis, LLM 없음) vs 배치 경로(batch_triage)
+- 배치 위험도 채점(risk_batch) vs 화면 경로의 룰 분류
+- 질문 흐름: data/question_flow.json은 리팩터링 전 코드(st.session_state에 대화를 직접 두던
+  utils.py)로 같은 대화를 재생해 기록한 턴별 [질문, 예/아니오 선택지, 진단 준비, 질답 수]와 분류/요약
+"""
+import json
+import os
+
+import pytest
+import streamlit as st
+
+import batch_triage
+import state
+import utils
+from lexicon import risk_score_from_words
+from risk_batch import score_sessions
+from triage_session import DIAGNOSIS_PHRASE
+
+with open(os.path.join(os.path.dirname(__file__), "data", "question_flow.json"), encoding="utf-8") as f:
+    CASES = json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_session(monkeypatch):
+    monkeypatch.setattr(utils.time, "sleep", lambda s: None)   # 화면용 대기 연출 생략
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    state.initialize_state()
+
+
+def _app_session(case: dict, stop_at_autodiagnose: bool):
+    session = st.session_state.triage
+    session.location_consent = case["location_consent"]
+    turns = []
+    for text in case["utterances"]:
+        utils.simulate_model_response(text)
+        turns.append([session.last_assistant_question, session.yesno_options, session.ready_to_diagnose, session.qa_pairs])
+        if stop_at_autodiagnose and session.should_autodiagnose():
+            break
+    if stop_at_autodiagnose:
+        session.add_message("assistant", DIAGNOSIS_PHRASE)   # step2가 자동 진단 전에 붙이는 안내
+    utils.run_diagnosis()
+    return session, turns
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: " / ".join(c["utterances"]))
+def test_question_flow_matches_pre_refactor_code(case):
+    session, turns = _app_session(case, stop_at_autodiagnose=False)
+    assert turns == case["turns"]
+    assert session.diagnosis["triage_level"] == case["triage_level"]
+    assert session.diagnosis["summary"] == case["summary"]
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: " / ".join(c["utterances"]))
+def test_batch_path_matches_app_path(case):
+    session, _ = _app_session(case, stop_at_autodiagnose=True)
+    line = json.dumps({"id": 1, "utterances": case["utterances"], "location_consent": case["location_consent"]})
+    batch = batch_triage._result_for(line)
+
+    assert batch["triage_level"] == session.diagnosis["triage_level"]
+    assert batch["summary"] == session.diagnosis["summary"]
+    assert batch["questions_asked"] == [
+        m.content for m in session.messages[1:] if m.role == "assistant" and m.content != DIAGNOSIS_PHRASE
+    ]
+    assert batch["turns"] == sum(1 for m in session.messages if m.role == "user")
+
+
+def test_risk_batch_matches_app_rules():
+    sessions = []
+    for case in CASES:
+        for key in list(st.session_state.keys()):
+            del st.session_state[key]
+        state.initialize_state()
+        sessions.append(_app_session(case, stop_at_autodiagnose=True)[0])
+
+    scores, levels = score_sessions([{"role": m.role, "content": m.content} for m in s.messages] for s in sessions)
+    assert scores.tolist() == [risk_score_from_words(s.index.hits().words) for s in sessions]
+    assert levels.tolist() == [s.diagnosis["triage_level"] for s in sessions]
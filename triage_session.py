@@ -0,0 +1,378 @@
+import re
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from lexicon import (
+    Hits, scan, entities_from_hits, topics_from_hits, summary_from_words,
+    risk_score_from_words, strong_flags_from_words, triage_level_from_score,
+)
+from question_graph import BY_ID, Question, match_question, next_question
+from session_memory import DEFAULT_MAX_MESSAGES, Message, MessageLog
+from symptom_index import SymptomIndex
+
+if TYPE_CHECKING:   # numpy 의존성은 병원 조회/로컬 분류기를 쓸 때만
+    from hospitals import HospitalDirectory
+    from ktas_model import KtasModel
+
+# Streamlit 없이 동작하는 문진/분류 엔진.
+# 화면(step2/step3)은 st.session_state.triage에 담긴 TriageSession을 읽고 쓰는 어댑터일 뿐이다.
+
+# (질문, 예/아니요 선택지, 그래프 질문 ID — 그래프 밖 질문이면 None)
+Followup = Tuple[str, List[str], Optional[str]]
+# (엔티티, 문맥 토픽, 슬롯, 사용자 입력, 규칙 기반 질문) -> 최종 질문
+FollowupFn = Callable[[Dict[str, str], List[str], Dict[str, Optional[bool]], str, Followup], Followup]
+
+DEFAULT_GREETING = "지금 어디가 가장 불편하신가요?"
+DIAGNOSIS_PHRASE = "진단을 진행하겠습니다."
+AUTO_DIAGNOSE_QA_PAIRS = 9     # 질문이 이만큼 쌓이면 자동 진단
+
+# 한국어 기간 표현
+_duration_pat = re.compile(r"(\d+)\s*(분|시간|일|주|개월)")
+_ko_num_pat   = re.compile(r"(한|두|세|네)\s*(분|시간|일|주|개월)")
+
+# 데모용 주변 병원 목록 (위치 동의 시, 병원 목록 파일이 없을 때)
+_DEMO_HOSPITALS: Dict[str, List[dict]] = {
+    "응급": [
+        {"name": "A 병원 응급실", "distance_km": 0.8, "address": "서울특별시 동대문구 무학로 124", "phone": "02-123-4567", "doctors": 18, "beds": 42},
+        {"name": "B 병원 응급실", "distance_km": 1.2, "address": "서울특별시 성북구 고려대로 73", "phone": "02-678-9012"},
+        {"name": "C 병원 응급실", "distance_km": 2.0, "address": "서울특별시 중랑구 상봉로 31", "phone": "02-345-6789", "doctors": 14, "beds": 55},
+    ],
+    "외래": [
+        {"name": "C 의원", "distance_km": 0.5, "address": "서울특별시 강북구 도봉로 10", "phone": "02-222-1111", "doctors": 4, "beds": 6},
+        {"name": "D 내과", "distance_km": 0.9, "address": "서울특별시 강북구 삼양로 220", "phone": "02-333-2222", "doctors": 6, "beds": 8},
+        {"name": "E 가정의학과", "distance_km": 1.4, "address": "서울특별시 강북구 수유로 88", "phone": "02-444-3333", "doctors": 5, "beds": 10},
+    ],
+}
+
+
+# ---------------- 순수 함수 (세션 상태 없음) ----------------
+def is_yes(text: str) -> bool:
+    t = text.strip()
+    return t.startswith("네") or "예" in t or "있습니다" in t or "맞아요" in t
+
+def is_no(text: str) -> bool:
+    t = text.strip()
+    return t.startswith("아니") or "없습니다" in t or "괜찮습니다" in t or "아닙니다" in t
+
+def extract_duration_str(t: str) -> str:
+    m = _duration_pat.search(t)
+    if m:
+        return f"{m.group(1)}{m.group(2)}"
+    m2 = _ko_num_pat.search(t)
+    if m2:
+        return f"{m2.group(1)}{m2.group(2)}"  # 예: '두 시간'
+    if "어제" in t:
+        return "어제부터"
+    if "오늘" in t:
+        return "오늘부터"
+    return ""
+
+def extract_entities(text: str) -> Dict[str, str]:
+    """부위/강도/주요증상/동반증상 + 기간 (슬롯 반영은 호출부 몫)"""
+    t = text.strip()
+    ents = entities_from_hits(scan(t))
+    ents["duration"] = extract_duration_str(t)
+    return ents
+
+def detect_topics(text: str) -> List[str]:
+    return topics_from_hits(scan(text.lower()))
+
+def yesno_options_for(question: str) -> List[str]:
+    """질문 그래프에 있는 질문이면 그 선택지, 아니면 키워드로 추정 (LLM이 선택지를 안 줬을 때)"""
+    node = match_question(question)
+    if node is not None:
+        return list(node.options)
+    q = question
+    if "숨" in q or "호흡" in q:
+        return ["네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."]
+    if "쓰러" in q or "의식" in q:
+        return ["네. 쓰러졌습니다.", "아니요. 쓰러지지 않았습니다."]
+    if "땀" in q:
+        return ["네. 식은땀이 있습니다.", "아니요. 식은땀은 없습니다."]
+    if "통증이 움직이거나 숨쉴 때 더 심해지나요" in q:
+        return ["네. 더 심해집니다.", "아니요. 비슷합니다."]
+    if "구토" in q or "설사" in q:
+        return ["네. 있습니다.", "아니요. 없습니다."]
+    return []
+
+def is_closed_question(q: str) -> bool:
+    return any(tok in q for tok in ["인가요", "있나요", "하셨나요", "합니까", "되나요", "않나요"])
+
+def triage_level_for(risk_score: int) -> str:
+    return triage_level_from_score(risk_score)
+
+
+def _new_slots() -> Dict[str, Optional[bool]]:
+    return {
+        "sob_at_rest": None,
+        "gi_combo": None,
+        "pain_worse_with_move": None,
+        "chest_pain_duration": None,
+    }
+
+def _new_diagnosis() -> dict:
+    return {"triage_level": None, "triage_source": None, "summary": "", "hospitals": []}
+
+
+class TriageSession:
+    """
+    환자 1명의 문진 상태와 진행 로직.
+    step(user_text)로 한 턴을 진행하고, diagnose()로 분류 결과를 만든다.
+    """
+
+    __slots__ = (
+        "patient_info", "location_consent", "location", "messages", "index", "slots", "asked_flags",
+        "qa_pairs", "last_assistant_question", "last_question_id", "yesno_options",
+        "ready_to_diagnose", "diagnosis", "evicted_words",
+    )
+
+    def __init__(
+        self,
+        patient_info: Optional[dict] = None,
+        location_consent: bool = False,
+        greeting: str = DEFAULT_GREETING,
+        location: Optional[Tuple[float, float]] = None,
+        max_messages: int = DEFAULT_MAX_MESSAGES,
+    ) -> None:
+        self.patient_info = patient_info if patient_info is not None else {"gender": "남자", "age": 50, "history": ["고혈압"]}
+        self.location_consent = location_consent
+        self.location = location    # (위도, 경도)
+        self.messages = MessageLog(max_messages)   # 최근 메시지만 (밀려난 턴은 evicted_words로 요약)
+        self.evicted_words: Set[str] = set()
+        self.index = SymptomIndex()                # 증상 집계는 전체 대화 기준 유지
+        self.slots = _new_slots()
+        self.asked_flags = 0                       # 물어본 그래프 질문 (Question.bit)
+        self.qa_pairs = 0
+        self.last_assistant_question: Optional[str] = None
+        self.last_question_id: Optional[str] = None     # 마지막 질문의 그래프 ID (그래프 밖 질문이면 None)
+        self.yesno_options: Optional[List[str]] = None
+        self.ready_to_diagnose = False
+        self.diagnosis = _new_diagnosis()
+        if greeting:
+            self.add_message("assistant", greeting)
+
+    # ---------------- 메시지 ----------------
+    def add_message(self, role: str, content: str) -> Hits:
+        """메시지 추가 + 증상 인덱스 갱신 (메시지당 1회 스캔, 스캔 결과 반환)"""
+        hits = self.index.add(content)
+        evicted = self.messages.append(Message(role, content, frozenset(hits.words)))
+        if evicted is not None:
+            # 이전 형식 상태에서 복원된 메시지만 단어를 모른다
+            self.evicted_words |= evicted.words if evicted.words is not None else scan(evicted.content).words
+        return hits
+
+    # ---------------- 저장/복원 (session_store) ----------------
+    def to_state(self) -> dict:
+        """JSON으로 직렬화 가능한 전체 상태"""
+        return {
+            "patient_info": self.patient_info,
+            "location_consent": self.location_consent,
+            "location": list(self.location) if self.location is not None else None,
+            "messages": [
+                [m.role, m.content] + ([sorted(m.words)] if m.words is not None else []) for m in self.messages
+            ],
+            "messages_total": self.messages.total,
+            "max_messages": self.messages.maxlen,
+            "evicted_words": sorted(self.evicted_words),
+            "index": self.index.to_state(),
+            "slots": self.slots,
+            "asked_flags": self.asked_flags,
+            "qa_pairs": self.qa_pairs,
+            "last_assistant_question": self.last_assistant_question,
+            "last_question_id": self.last_question_id,
+            "yesno_options": self.yesno_options,
+            "ready_to_diagnose": self.ready_to_diagnose,
+            "diagnosis": self.diagnosis,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TriageSession":
+        location = state.get("location")
+        session = cls(
+            patient_info=state["patient_info"],
+            location_consent=state["location_consent"],
+            greeting="",
+            location=tuple(location) if location is not None else None,
+            max_messages=state.get("max_messages", DEFAULT_MAX_MESSAGES),
+        )
+        for role, content, *words in state["messages"]:     # 이전 형식은 [role, content]
+            session.messages.append(Message(role, content, frozenset(words[0]) if words else None))
+        session.messages.total = state.get("messages_total", len(session.messages))
+        session.evicted_words = set(state.get("evicted_words", ()))
+        session.index = SymptomIndex.from_state(state["index"])
+        session.slots = dict(state["slots"])
+        session.asked_flags = state["asked_flags"]
+        session.qa_pairs = state["qa_pairs"]
+        session.last_assistant_question = state["last_assistant_question"]
+        if "last_question_id" in state:
+            session.last_question_id = state["last_question_id"]
+        elif session.last_assistant_question:     # 이전 형식 상태: 문구로 추정
+            node = match_question(session.last_assistant_question)
+            session.last_question_id = node.qid if node is not None else None
+        session.yesno_options = state["yesno_options"]
+        session.ready_to_diagnose = state["ready_to_diagnose"]
+        session.diagnosis = dict(state["diagnosis"])
+        return session
+
+    def history_summary(self) -> str:
+        """링 버퍼에서 밀려난 이전 턴들의 증상 요약 (없으면 "")"""
+        if not self.messages.evicted:
+            return ""
+        return summary_from_words(self.evicted_words)
+
+    # ---------------- 질문 기록/슬롯 ----------------
+    def _apply_yesno_to_slots(self, user_text: str) -> None:
+        """직전 질문(last_question_id)에 대한 예/아니요 답을 그 질문의 슬롯에 반영"""
+        yes = is_yes(user_text)
+        no = is_no(user_text)
+        if not (yes or no):
+            return
+
+        node = BY_ID.get(self.last_question_id) if self.last_question_id else None
+        if node is not None:
+            if node.yesno:
+                self.slots[node.slot] = yes
+            self.asked_flags |= node.bit
+
+        self.yesno_options = None
+
+    # ---------------- 규칙 기반 후속 질문 ----------------
+    def next_question(self, ents: Dict[str, str], context_topics: List[str]) -> Optional[Question]:
+        """문맥을 계산해 질문 그래프에서 다음 질문을 고른다 (None = 진단할 차례, 상태 변경 없음)"""
+        region, ms, assoc = ents["region"], ents["main_symptom"], ents["assoc"]
+
+        chest_ctx = (ms == "통증" and (region == "가슴" or "가슴" in context_topics)) or \
+                    (("가슴" in context_topics) and ("통증" in context_topics))
+        resp_ctx  = (ms == "호흡곤란/호흡불편") or ("호흡" in context_topics)
+        gi_ctx    = (ms == "위장관 증상") or ("복부" in context_topics)
+
+        active = frozenset(
+            name for name, on in (
+                ("chest", chest_ctx), ("resp", resp_ctx), ("gi", gi_ctx), ("sweat", "식은땀" in assoc),
+            ) if on
+        )
+        return next_question(active, self.slots, self.asked_flags)
+
+    def choose_followup(self, ents: Dict[str, str], context_topics: List[str]) -> Followup:
+        """규칙 기반 다음 질문과 예/아니요 선택지 (진단할 차례면 DIAGNOSIS_PHRASE)"""
+        node = self.next_question(ents, context_topics)
+        if node is None:
+            # ready_to_diagnose는 step()이 문구를 보고 설정한다
+            return DIAGNOSIS_PHRASE, [], None
+        return node.text, list(node.options), node.qid
+
+    # ---------------- 한 턴 진행 ----------------
+    def step(self, user_text: str, followup_fn: Optional[FollowupFn] = None) -> str:
+        """
+        사용자 입력 추가 → 슬롯 반영 → 질문 1개 생성(followup_fn 없으면 규칙) → 상태 반영.
+        추가된 질문 문자열을 반환 (없으면 "").
+        """
+        ents, context_topics, fallback = self.begin_turn(user_text)
+        followup, yn_opts, qid = fallback
+        if followup_fn is not None:
+            followup, yn_opts, qid = followup_fn(ents, context_topics, self.slots, user_text, fallback)
+        return self.finish_turn(followup, yn_opts, qid)
+
+    def begin_turn(self, user_text: str) -> Tuple[Dict[str, str], List[str], Followup]:
+        """
+        턴 전반부: 사용자 입력 추가 → 슬롯 반영 → 규칙 기반 질문.
+        (엔티티, 문맥 토픽, 규칙 기반 질문)을 반환하고, 최종 질문은 finish_turn()으로 넘긴다.
+        질문을 스트리밍으로 받는 화면은 두 단계 사이에서 LLM 응답을 그린다.
+        """
+        hits = self.add_message("user", user_text)
+
+        if self.last_assistant_question:
+            self._apply_yesno_to_slots(user_text)
+
+        ents = entities_from_hits(hits)
+        ents["duration"] = extract_duration_str(user_text.strip())
+        if ents["duration"]:
+            self.slots["chest_pain_duration"] = ents["duration"]
+        context_topics = topics_from_hits(self.index.hits(last=3))
+        return ents, context_topics, self.choose_followup(ents, context_topics)
+
+    def finish_turn(self, followup: str, yn_opts: Optional[List[str]], qid: Optional[str]) -> str:
+        """
+        턴 후반부: 최종 질문을 기록하고 상태 반영. 추가된 질문 문자열을 반환 (없으면 "").
+        qid: 질문을 만든 쪽(규칙/LLM)이 알려 준 그래프 질문 ID — 문구로 추정하지 않는다.
+        """
+        # 기록/상태 업데이트: 질문만 저장
+        if followup and followup.strip():
+            node = BY_ID.get(qid) if qid else None
+            if node is not None:
+                self.asked_flags |= node.bit
+            self.add_message("assistant", followup)
+
+            if "?" in followup:
+                self.qa_pairs += 1
+
+            # 질문일 때만 last_assistant_question 유지
+            if followup.strip().endswith("?"):
+                self.last_assistant_question = followup
+                self.last_question_id = node.qid if node is not None else None
+                self.yesno_options = yn_opts if yn_opts else None
+            else:
+                self.last_assistant_question = None
+                self.last_question_id = None
+                self.yesno_options = None
+
+            if "진단을 진행하겠습니다" in followup:
+                self.ready_to_diagnose = True
+        else:
+            followup = ""
+
+        # 조기 종료 플래그(가슴+통증+숨+식은땀)
+        if strong_flags_from_words(self.index.hits(last=8).words):
+            self.ready_to_diagnose = True
+        return followup
+
+    # ---------------- 진단 ----------------
+    def should_autodiagnose(self) -> bool:
+        return self.ready_to_diagnose or self.qa_pairs >= AUTO_DIAGNOSE_QA_PAIRS
+
+    def summary(self) -> str:
+        return summary_from_words(self.index.hits().words)
+
+    def nearby_hospitals(
+        self,
+        triage_level: str,
+        directory: "Optional[HospitalDirectory]" = None,
+        k: int = 3,
+    ) -> List[dict]:
+        """위치 동의 시 분류에 맞는 기관(응급→응급실, 외래→외래) k곳. 목록/위치가 없으면 데모 목록."""
+        if not self.location_consent:
+            return []
+        if directory is not None and self.location is not None:
+            from hospitals import TRIAGE_TO_KIND
+            kind = TRIAGE_TO_KIND.get(triage_level)
+            if kind is None:
+                return []
+            lat, lon = self.location
+            return directory.nearest(lat, lon, k=k, kind=kind)
+        return [dict(h) for h in _DEMO_HOSPITALS.get(triage_level, [])]
+
+    def classify(self, classifier: "Optional[KtasModel]" = None, min_confidence: float = 0.0) -> Tuple[str, str]:
+        """(분류, 출처). 로컬 분류기가 있고 확신도가 충분하면 그 결과, 아니면 룰 기반 위험도."""
+        if classifier is not None:
+            try:
+                label, prob = classifier.predict_session(self)
+            except Exception:   # 모델 파일 손상 등 → 룰로 폴백
+                label, prob = None, 0.0
+            if label is not None and prob >= min_confidence:
+                return label, "local"
+        risk_score = risk_score_from_words(self.index.hits().words)
+        return triage_level_for(risk_score), "rules"
+
+    def diagnose(
+        self,
+        directory: "Optional[HospitalDirectory]" = None,
+        k: int = 3,
+        classifier: "Optional[KtasModel]" = None,
+        min_confidence: float = 0.0,
+    ) -> dict:
+        """분류(로컬 분류기 또는 룰)/요약/병원 목록을 diagnosis에 기록하고 반환"""
+        triage_result, source = self.classify(classifier, min_confidence)
+        self.diagnosis["triage_level"] = triage_result
+        self.diagnosis["triage_source"] = source
+        self.diagnosis["summary"] = self.summary()
+        self.diagnosis["hospitals"] = self.nearby_hospitals(triage_result, directory, k)
+        return self.diagnosis
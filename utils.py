@@ -1,280 +1,264 @@
 import streamlit as st
+import os
 import time
-import re
 import json  # (유지)
-from typing import List, Optional, Dict, Tuple
-
-
-client = None
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Dict, Tuple
+
+from report_archive import ReportArchive
+from report_export import ReportExporter
+from llm_cache import FollowupCache, followup_key
+from llm_client import LlmClient
+from llm_guard import GatedExecutor, HedgePolicy, LlmGate, LlmRejected
+from llm_prompt import UsageMeter, build_messages, prompt_bytes
+from llm_stream import ChunkPump, FollowupFieldParser, LatencyStats
+from question_graph import BY_ID
+from triage_session import Followup, TriageSession, yesno_options_for
+
+if TYPE_CHECKING:
+    # numpy를 끌어오는 모듈은 진단 시점(hospital_directory/ktas_model 첫 호출)에 불러온다
+    from hospitals import HospitalDirectory
+    from ktas_model import KtasModel
+
+# openai 패키지는 LlmClient를 처음 만들 때(첫 LLM 호출) 불러온다
+_openai_api_key: Optional[str] = None
 ft_model_id: Optional[str] = None
+llm_deadline_s: float = 0.8          # 턴당 LLM 대기 상한 (초과 시 규칙 기반 질문)
+llm_request_timeout_s: float = 10.0  # 백그라운드 요청 자체의 상한 = 읽기 시한 (워커 고갈 방지)
+llm_connect_timeout_s: float = 3.05  # 연결(TCP/TLS) 시한
+llm_max_retries: int = 1             # 일시 오류 재시도 횟수 (지터 백오프)
+llm_pool_size: int = 16              # keep-alive 연결 풀 크기
+llm_warmup: bool = True              # 클라이언트 생성 시 API 호스트로 연결을 미리 열어 둔다
+llm_stream: bool = False             # 질문을 토큰 단위로 말풍선에 흘려 보여주기 (LLM_STREAM)
+llm_speculative_max: int = 10        # 세션당 예/아니오 선택지 선계산 LLM 호출 상한 (0이면 끔)
+# 프로세스 공용 LLM 관문 설정 (LLM_MAX_CONCURRENT, LLM_RATE_PER_S, LLM_BURST,
+# LLM_BREAKER_FAILURES, LLM_BREAKER_SLOW_S, LLM_BREAKER_SLOW_CALLS, LLM_BREAKER_OPEN_S)
+llm_gate_settings: Dict[str, float] = {}
+# 헤지: 1차 모델(파인튜닝)이 percentile 지연 안에 답하지 않으면 대체 모델로 한 번 더 (LLM_HEDGE)
+llm_hedge: bool = False
+llm_hedge_model: str = "gpt-4o-mini"
+llm_hedge_percentile: float = 0.9
+llm_hedge_delay_s: float = 0.4       # 응답 시간 표본이 쌓이기 전 기본 헤지 지연
+metrics_log_interval_s: float = 60.0 # 운영 지표 로그 간격 (METRICS_LOG_INTERVAL_S, 0이면 끔)
+show_metrics: bool = False           # 채팅 화면 아래에 운영 지표 캡션 (SHOW_METRICS, 관리자용)
 try:
-    import openai
-    openai.api_key = st.secrets["OPENAI_API_KEY"]
+    _openai_api_key = st.secrets["OPENAI_API_KEY"]
     ft_model_id = st.secrets.get("FT_KTAS_MODEL_ID")
+    llm_deadline_s = float(st.secrets.get("LLM_DEADLINE_MS", 800)) / 1000
+    llm_request_timeout_s = float(st.secrets.get("LLM_REQUEST_TIMEOUT_S", 10))
+    llm_connect_timeout_s = float(st.secrets.get("LLM_CONNECT_TIMEOUT_S", 3.05))
+    llm_max_retries = int(st.secrets.get("LLM_MAX_RETRIES", 1))
+    llm_pool_size = int(st.secrets.get("LLM_POOL_SIZE", 16))
+    llm_warmup = str(st.secrets.get("LLM_WARMUP", "true")).lower() in ("1", "true", "yes")
+    llm_stream = str(st.secrets.get("LLM_STREAM", "false")).lower() in ("1", "true", "yes")
+    llm_speculative_max = int(st.secrets.get("LLM_SPECULATIVE_MAX", 10))
+    for _name, _secret, _cast in (
+        ("max_concurrent", "LLM_MAX_CONCURRENT", int),
+        ("rate_per_s", "LLM_RATE_PER_S", float),
+        ("burst", "LLM_BURST", float),
+        ("failure_threshold", "LLM_BREAKER_FAILURES", int),
+        ("slow_call_s", "LLM_BREAKER_SLOW_S", float),
+        ("slow_threshold", "LLM_BREAKER_SLOW_CALLS", int),
+        ("open_s", "LLM_BREAKER_OPEN_S", float),
+    ):
+        if _secret in st.secrets:
+            llm_gate_settings[_name] = _cast(st.secrets[_secret])
+    llm_hedge = str(st.secrets.get("LLM_HEDGE", "false")).lower() in ("1", "true", "yes")
+    llm_hedge_model = st.secrets.get("LLM_HEDGE_MODEL", "gpt-4o-mini")
+    llm_hedge_percentile = float(st.secrets.get("LLM_HEDGE_PERCENTILE", 0.9))
+    llm_hedge_delay_s = float(st.secrets.get("LLM_HEDGE_DELAY_MS", 400)) / 1000
 except Exception:
-    openai = None
+    _openai_api_key = None
     ft_model_id = None
-
-# 한국어 엔티티/슬롯 추출용 사전
-_duration_pat = re.compile(r"(\d+)\s*(분|시간|일|주|개월)")
-_ko_num_pat   = re.compile(r"(한|두|세|네)\s*(분|시간|일|주|개월)")   
-
-_severity_words = ["조금", "약간", "중간", "보통", "많이", "매우", "심하게", "너무"]
-_pain_words = ["아파", "아픔", "통증", "찌릿", "쑤심", "콕", "조이", "체한"]
-_resp_words = ["숨", "호흡", "호흡곤란", "숨차", "가쁨"]
-_sweat_words = ["식은땀", "땀"]
-_fever_words = ["열", "발열", "미열", "고열"]
-_gi_words = ["구토", "메스꺼", "구역", "설사", "변", "소변", "빈뇨", "배뇨통"]
-
-_region_map = {
-    "가슴": ["가슴", "흉통", "흉부", "흉골", "명치"],
-    "복부": ["복부", "배", "아랫배", "윗배"],
-    "우측": ["오른쪽", "우측", "우상", "우하"],
-    "좌측": ["왼쪽", "좌측", "좌상", "좌하"],
+try:
+    metrics_log_interval_s = float(st.secrets.get("METRICS_LOG_INTERVAL_S", 60))
+    show_metrics = str(st.secrets.get("SHOW_METRICS", "false")).lower() in ("1", "true", "yes")
+except Exception:
+    pass
+
+# 프로세스 공용 LLM 워커 (스크립트 스레드가 공급자 지연에 묶이지 않도록)
+_llm_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-followup")
+
+# 모든 LLM 요청은 관문(토큰 버킷/동시 요청 상한/서킷 브레이커)을 거친다. 지표: llm_gate.stats()
+llm_gate = LlmGate(**llm_gate_settings)
+_llm_exec = GatedExecutor(llm_gate, _llm_pool)
+_llm_spec_exec = GatedExecutor(llm_gate, _llm_pool, reserve=2.0)   # 선계산은 본 요청 몫을 남겨 둘 때만
+hedge_policy = HedgePolicy(percentile=llm_hedge_percentile, default_delay_s=llm_hedge_delay_s)
+
+# LLM 프롬프트/응답 토큰·바이트 (프로세스 합계, 세션별 미터는 이것을 parent로 둔다)
+llm_usage = UsageMeter()
+
+def session_usage() -> UsageMeter:
+    """현재 세션의 LLM 사용량 미터 (스크립트 스레드에서 꺼내 워커에 넘긴다)"""
+    meter = st.session_state.get("_llm_usage")
+    if meter is None:
+        meter = st.session_state._llm_usage = UsageMeter(parent=llm_usage)
+    return meter
+
+# 턴 지연 지표 (전체 지연 + 첫 토큰까지의 시간, 프로세스 공용)
+logger = logging.getLogger(__name__)
+turn_latency = LatencyStats()
+_STREAM_RENDER_INTERVAL_S = 0.05     # 스트리밍 중 말풍선 갱신 간격
+
+# 예/아니오 선택지별 다음 질문 선계산: (캐시 키, LLM 요청 future)
+Branch = Tuple[str, "Future[Optional[Followup]]"]
+speculation_stats: Counter = Counter()   # submitted / committed / missed / discarded
+
+# 운영 지표: 이름 → stats(). metrics_log_interval_s마다 JSON 한 줄로 로그하고, SHOW_METRICS면 화면 캡션
+METRICS: Dict[str, Callable[[], Dict[str, object]]] = {
+    "llm_gate": llm_gate.stats,
+    "turn_latency": turn_latency.stats,
+    "hedge": hedge_policy.stats,
+    "llm_usage": llm_usage.stats,
 }
+_metrics_lock = threading.Lock()
+_metrics_logged_at = 0.0
+
+def metrics_snapshot() -> Dict[str, Dict[str, object]]:
+    return {name: stats() for name, stats in METRICS.items()}
 
-# 1회 질문 보장용 
-def _ensure_flags() -> None:   
-    if "asked_flags" not in st.session_state:
-        st.session_state.asked_flags = {
-            "duration": False,
-            "worse_move": False,
-            "sob_rest": False,
-            "gi_combo": False,
-            "sweat": False,
-            "clarify": False,
-        }
-
-def _mark_question_asked_by_text(q: str) -> None:   
-    _ensure_flags()
-    af = st.session_state.asked_flags
-    t = (q or "").strip()
-    if ("언제부터" in t) or ("지속" in t) or ("몇 분/시간" in t):
-        af["duration"] = True
-    elif "움직이거나 숨쉴 때 더 심해지나요" in t:
-        af["worse_move"] = True
-    elif "안정 시에도 숨이 차신가요" in t:
-        af["sob_rest"] = True
-    elif "구토나 설사가 동반되나요" in t:
-        af["gi_combo"] = True
-    elif "식은땀" in t:
-        af["sweat"] = True
-    elif "불편하신 부위와 증상" in t:
-        af["clarify"] = True
-
-# 예/아니오 판별 & 슬롯 반영
-def _is_yes(text: str) -> bool:
-    t = text.strip()
-    return t.startswith("네") or "예" in t or "있습니다" in t or "맞아요" in t
-
-def _is_no(text: str) -> bool:
-    t = text.strip()
-    return t.startswith("아니") or "없습니다" in t or "괜찮습니다" in t or "아닙니다" in t
-
-def _apply_yesno_to_slots(last_q: str, user_text: str) -> None:
-    yes = _is_yes(user_text)
-    no = _is_no(user_text)
-    if not (yes or no):
+def log_metrics() -> None:
+    """턴이 끝날 때 호출: 프로세스 전체에서 metrics_log_interval_s에 한 번만 지표를 로그한다"""
+    global _metrics_logged_at
+    if metrics_log_interval_s <= 0:
         return
+    now = time.monotonic()
+    with _metrics_lock:
+        if now - _metrics_logged_at < metrics_log_interval_s:
+            return
+        _metrics_logged_at = now
+    logger.info("metrics %s", json.dumps(metrics_snapshot(), ensure_ascii=False, default=str))
+
+def metrics_caption() -> str:
+    """관리자용 한 줄 요약 (SHOW_METRICS)"""
+    gate = llm_gate.stats()
+    parts = [
+        f"LLM 관문 {gate['state']} · 진행 {gate['in_flight']} · 대기 {gate['queue_depth']}"
+        f" · 거절 {gate['rejected_open'] + gate['rejected_rate']}",
+    ]
+    latency = turn_latency.stats()
+    if latency["turns"]:
+        parts.append(
+            f"턴 {latency['turns']:.0f}회 · 첫 토큰 p50 {latency['ttft_p50_ms']:.0f}ms / 전체 p50 {latency['total_p50_ms']:.0f}ms"
+            f" · p95 {latency['ttft_p95_ms']:.0f} / {latency['total_p95_ms']:.0f}ms"
+        )
+    if llm_hedge:
+        hedge = hedge_policy.stats()
+        parts.append(
+            f"헤지 {hedge['hedged']}/{hedge['turns']}턴 ({hedge['hedge_rate']:.0%}) · 추가 요청 {hedge['extra_requests']}"
+        )
+    meter: Optional[UsageMeter] = st.session_state.get("_llm_usage")   # 이 세션 (LLM 호출이 있었을 때만)
+    if meter is not None:
+        usage = meter.stats()
+        parts.append(
+            f"이 세션 LLM {usage['calls']}회 · 토큰 {usage['prompt_tokens']}+{usage['completion_tokens']}"
+            f" · 호출당 프롬프트 {usage['prompt_bytes_per_call']:.0f}B"
+        )
+    return " | ".join(parts)
 
-    slots = st.session_state.slots
-    if "안정 시에도 숨이 차신가요" in last_q:
-        slots["sob_at_rest"] = True if yes else False
-    elif "구토나 설사가 동반되나요" in last_q:
-        slots["gi_combo"] = True if yes else False
-    elif "통증이 움직이거나 숨쉴 때 더 심해지나요" in last_q:
-        slots["pain_worse_with_move"] = True if yes else False
-
-    asked = st.session_state.asked_questions
-    if last_q not in asked:
-        asked.append(last_q)
-    _mark_question_asked_by_text(last_q)   
-    st.session_state.yesno_options = None
-
-# 기간 문자열 보강 추출
-def _extract_duration_str(t: str) -> str:   
-    m = _duration_pat.search(t)
-    if m:
-        return f"{m.group(1)}{m.group(2)}"
-    m2 = _ko_num_pat.search(t)
-    if m2:
-        return f"{m2.group(1)}{m2.group(2)}"  # 예: '두 시간'
-    if "어제" in t:
-        return "어제부터"
-    if "오늘" in t:
-        return "오늘부터"
-    return ""
-
-# 엔티티/토픽 추출
-def _extract_entities(text: str) -> Dict[str, str]:
-    t = text.strip()
-
-    region = None
-    for key, kws in _region_map.items():
-        if any(kw in t for kw in kws):
-            region = key
-            break
+@st.cache_resource
+def llm_client() -> Optional[LlmClient]:
+    """모든 LLM 호출이 공유하는 클라이언트 (keep-alive 연결 풀, 연결/읽기 시한, 지터 재시도). 키나 openai 패키지가 없으면 None."""
+    if not _openai_api_key:
+        return None
+    try:
+        client = LlmClient(
+            api_key=_openai_api_key,
+            pool_size=llm_pool_size,
+            connect_timeout_s=llm_connect_timeout_s,
+            read_timeout_s=llm_request_timeout_s,
+            max_retries=llm_max_retries,
+        )
+    except ImportError:
+        logger.warning("openai package not installed, rule-based questions only")
+        return None
+    if llm_warmup:
+        client.warm_up_async()
+    return client
+
+@st.cache_resource
+def followup_cache() -> FollowupCache:
+    """세션 간 공유되는 LLM 후속 질문 캐시 (LLM_CACHE_DB 지정 시 SQLite 백업)"""
+    try:
+        size = int(st.secrets.get("LLM_CACHE_SIZE", 2048))
+        ttl_s = float(st.secrets.get("LLM_CACHE_TTL_S", 3600))
+        db_path = st.secrets.get("LLM_CACHE_DB")
+    except Exception:
+        size, ttl_s, db_path = 2048, 3600.0, None
+    return FollowupCache(maxsize=size, ttl_s=ttl_s, db_path=db_path)
 
-    duration = _extract_duration_str(t)   
-    if duration:
-        st.session_state.slots["chest_pain_duration"] = duration   
+# 병원 목록 파일 (HOSPITAL_DATA_PATH: CSV/Parquet) — 없으면 번들된 샘플
+_DEFAULT_HOSPITAL_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hospitals_sample.csv")
+# 단말 위치를 받을 수 없을 때 쓰는 기준 좌표 (DEFAULT_LAT/DEFAULT_LON)
+_DEFAULT_LOCATION = (37.5800, 127.0300)
 
-    severity = None
-    for w in _severity_words:
-        if w in t:
-            severity = w
-            break
+@st.cache_resource
+def hospital_directory() -> Optional["HospitalDirectory"]:
+    from hospitals import load_directory
 
-    main_symptom = None
-    if any(w in t for w in _pain_words):
-        main_symptom = "통증"
-    elif any(w in t for w in _resp_words):
-        main_symptom = "호흡곤란/호흡불편"
-    elif any(w in t for w in _gi_words):
-        main_symptom = "위장관 증상"
-
-    assoc: List[str] = []
-    if any(w in t for w in _sweat_words):
-        assoc.append("식은땀")
-    if any(w in t for w in _fever_words):
-        assoc.append("발열")
-
-    return {
-        "region": region or "",
-        "duration": duration or "",
-        "severity": severity or "",
-        "main_symptom": main_symptom or "",
-        "assoc": ", ".join(assoc) if assoc else "",
-    }
-
-def _detect_topics(text: str) -> List[str]:
-    t = text.lower()
-    topics: List[str] = []
-    if any(k in t for k in ["통증", "아픔", "쑤심", "찌름", "아려움"]):
-        topics.append("통증")
-    if any(k in t for k in ["가슴", "흉통", "심장", "흉부", "명치"]):
-        topics.append("가슴")
-    if any(k in t for k in ["호흡", "숨", "호흡곤란"]):
-        topics.append("호흡")
-    if any(k in t for k in ["기침", "가래"]):
-        topics.append("기침")
-    if any(k in t for k in ["발열", "열", "식은땀"]):
-        topics.append("발열/식은땀")
-    if any(k in t for k in ["어지럼", "실신", "쓰러짐"]):
-        topics.append("어지럼증")
-    if any(k in t for k in ["복부", "배", "아랫배", "윗배"]):
-        topics.append("복부")
-    return topics
-
-# 후속 질문 & 빠른 응답
-def _yesno_options_for(question: str) -> List[str]:
-    q = question
-    if "숨" in q or "호흡" in q:
-        return ["네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."]
-    if "쓰러" in q or "의식" in q:
-        return ["네. 쓰러졌습니다.", "아니요. 쓰러지지 않았습니다."]
-    if "땀" in q:
-        return ["네. 식은땀이 있습니다.", "아니요. 식은땀은 없습니다."]
-    if "통증이 움직이거나 숨쉴 때 더 심해지나요" in q:
-        return ["네. 더 심해집니다.", "아니요. 비슷합니다."]
-    if "구토" in q or "설사" in q:
-        return ["네. 있습니다.", "아니요. 없습니다."]
-    return []
-
-def _is_closed_question(q: str) -> bool:
-    return any(tok in q for tok in ["인가요", "있나요", "하셨나요", "합니까", "되나요", "않나요"])
-
-def _choose_followup(ents: Dict[str, str], context_topics: List[str]) -> Tuple[str, List[str]]:
-    _ensure_flags()
-    slots = st.session_state.slots
-    af = st.session_state.asked_flags
-
-    region, duration, severity, ms, assoc = (
-        ents["region"], ents["duration"], ents["severity"], ents["main_symptom"], ents["assoc"]
-    )
+    try:
+        path = st.secrets.get("HOSPITAL_DATA_PATH", _DEFAULT_HOSPITAL_DATA)
+    except Exception:
+        path = _DEFAULT_HOSPITAL_DATA
+    try:
+        return load_directory(path)
+    except (OSError, KeyError, ValueError):
+        return None
+
+# 분류 방식 (TRIAGE_MODEL): "rules"(기본) 또는 "local"(KTAS_MODEL_PATH의 로컬 분류기, 실패/저확신 시 룰)
+@st.cache_resource
+def ktas_model() -> Optional["KtasModel"]:
+    from ktas_model import KtasModel
+
+    try:
+        if st.secrets.get("TRIAGE_MODEL", "rules") != "local":
+            return None
+        path = st.secrets["KTAS_MODEL_PATH"]
+    except Exception:
+        return None
+    try:
+        return KtasModel.load(path)
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _ktas_min_confidence() -> float:
+    try:
+        return float(st.secrets.get("KTAS_MIN_CONFIDENCE", 0.0))
+    except Exception:
+        return 0.0
+
+# 자가진단 레포트 보관소 (REPORT_ARCHIVE_PATH) — 없으면 data/reports.db
+_DEFAULT_REPORT_ARCHIVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "reports.db")
+
+@st.cache_resource
+def report_archive() -> ReportArchive:
+    try:
+        path = st.secrets.get("REPORT_ARCHIVE_PATH", _DEFAULT_REPORT_ARCHIVE)
+    except Exception:
+        path = _DEFAULT_REPORT_ARCHIVE
+    return ReportArchive(path)
+
+# 레포트 HTML/PDF 내보내기 (동시 렌더링 작업 수 제한)
+@st.cache_resource
+def report_exporter() -> ReportExporter:
+    try:
+        workers = int(st.secrets.get("REPORT_EXPORT_WORKERS", 2))
+        max_pending = int(st.secrets.get("REPORT_EXPORT_MAX_PENDING", 8))
+    except Exception:
+        workers, max_pending = 2, 8
+    return ReportExporter(max_workers=workers, max_pending=max_pending)
 
-    chest_ctx = (ms == "통증" and (region == "가슴" or "가슴" in context_topics)) or \
-                (("가슴" in context_topics) and ("통증" in context_topics))
-    resp_ctx  = (ms == "호흡곤란/호흡불편") or ("호흡" in context_topics)              
-    gi_ctx    = (ms == "위장관 증상") or ("복부" in context_topics)                   
-
-    if chest_ctx:
-        if not slots.get("chest_pain_duration") and not af["duration"]:
-            q = "통증은 언제부터 시작되었나요? 대략 몇 분/시간 정도 지속되었는지 알려주세요."
-            return q, []
-        if slots.get("pain_worse_with_move") is None and not af["worse_move"]:
-            q = "통증이 움직이거나 숨쉴 때 더 심해지나요?"
-            return q, ["네. 더 심해집니다.", "아니요. 비슷합니다."]
-        if slots.get("sob_at_rest") is None and not af["sob_rest"]:
-            q = "안정 시에도 숨이 차신가요?"
-            return q, ["네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."]
-
-    if resp_ctx:
-        if slots.get("sob_at_rest") is None and not af["sob_rest"]:
-            q = "안정 시에도 숨이 차신가요?"
-            return q, ["네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."]
-
-    if gi_ctx:
-        if slots.get("gi_combo") is None and not af["gi_combo"]:
-            q = "구토나 설사가 동반되나요?"
-            return q, ["네. 있습니다.", "아니요. 없습니다."]
-
-    if "식은땀" in assoc and not af["sweat"]:
-        q = "식은땀이 지금도 계속 나시나요?"
-        return q, ["네. 계속 납니다.", "아니요. 지금은 없습니다."]
-
-    # ----- 컨텍스트별 '충분 조건'을 만족하면 종료 -----       
-    chest_done = chest_ctx and bool(slots.get("chest_pain_duration")) \
-                 and (slots.get("pain_worse_with_move") is not None) \
-                 and (slots.get("sob_at_rest") is not None)
-    resp_done  = resp_ctx and (slots.get("sob_at_rest") is not None)
-    gi_done    = gi_ctx and (slots.get("gi_combo") is not None)
-
-    if chest_done or resp_done or gi_done:                               
-        st.session_state.ready_to_diagnose = True
-        return "진단을 진행하겠습니다.", []
-
-    if not af["clarify"]:
-        q = "지금 불편하신 부위와 증상을 한 번 더 구체적으로 말씀해주시겠어요? (예: '가슴 중앙이 조이고 30분째 심함')"
-        return q, []
-
-    if slots.get("pain_worse_with_move") is None and not af["worse_move"]:
-        q = "통증이 움직이거나 숨쉴 때 더 심해지나요?"
-        return q, ["네. 더 심해집니다.", "아니요. 비슷합니다."]
-    if slots.get("sob_at_rest") is None and not af["sob_rest"]:
-        q = "안정 시에도 숨이 차신가요?"
-        return q, ["네. 안정 시에도 숨이 찹니다.", "아니요. 활동 시에만 숨이 찹니다."]
-    if slots.get("gi_combo") is None and not af["gi_combo"]:
-        q = "구토나 설사가 동반되나요?"
-        return q, ["네. 있습니다.", "아니요. 없습니다."]
-
-    st.session_state.ready_to_diagnose = True                             # modification
-    return "진단을 진행하겠습니다.", []
-
-
-# 대화 요약(진단용)
-def _generate_summary_from_conversation(messages: List[dict]) -> str:
-    text = " ".join(m.get("content", "") for m in messages)
-    found: List[str] = []
-    if ("가슴" in text and "통증" in text) or "흉통" in text:
-        found.append("가슴 통증")
-    if ("숨" in text or "호흡" in text or "호흡곤란" in text):
-        found.append("호흡 곤란")
-    if "식은땀" in text:
-        found.append("식은땀")
-    if "실신" in text or "의식" in text:
-        found.append("실신/의식저하")
-    if "복부" in text and "통증" in text:
-        found.append("복부 통증")
-    if "발열" in text or "열" in text:
-        found.append("발열")
-    if "기침" in text:
-        found.append("기침")
-    if all(kw in text for kw in ["가슴", "통증", "식은땀"]) and ("숨" in text or "호흡" in text or "호흡곤란" in text):
-        return "가슴 통증, 식은땀, 호흡 곤란 증상."
-    if not found:
-        return "특이 증상 없음."
-    return f"{', '.join(found)} 증상."
+def _patient_location(session: TriageSession) -> Tuple[float, float]:
+    if session.location is not None:
+        return session.location
+    try:
+        return float(st.secrets["DEFAULT_LAT"]), float(st.secrets["DEFAULT_LON"])
+    except Exception:
+        return _DEFAULT_LOCATION
 
 def _safe_followup(text: Optional[str]) -> str:
     t = (text or "").strip()
@@ -283,130 +267,375 @@ def _safe_followup(text: Optional[str]) -> str:
 # ==============================
 # OpenAI ChatCompletion (질문만 생성)
 # ==============================
+def _parse_followup(data: Optional[dict]) -> Optional[Followup]:
+    if not data:
+        return None
+    followup = _safe_followup(data.get("followup"))
+    if not followup:
+        return None
+    qid = data.get("qid")
+    node = BY_ID.get(qid) if isinstance(qid, str) else None     # 모델이 고른 그래프 질문 (목록에 없으면 None)
+    yesno = data.get("yesno_options") or (list(node.options) if node is not None else yesno_options_for(followup))
+    return followup, yesno, node.qid if node is not None else None
+
+def _usage_of(obj) -> Optional[dict]:
+    return obj.get("usage") if isinstance(obj, dict) else getattr(obj, "usage", None)
+
+def _llm_request(
+    client: LlmClient,
+    usage: UsageMeter,
+    ents: Dict[str, str],
+    context_topics: List[str],
+    slots: Dict[str, Optional[str]],
+    user_text: str,
+    model: Optional[str] = None,
+) -> Optional[Followup]:
+    """워커 스레드에서 실행되므로 st.session_state를 건드리지 않는다. 실패 시 None."""
+    model = model or ft_model_id or "gpt-4o-mini"
+    messages = build_messages(ents, context_topics, slots, user_text)
+    try:
+        started = time.monotonic()
+        with llm_gate.slot():
+            resp = client.chat(model=model, messages=messages, temperature=0.2)
+        content = resp.choices[0].message["content"]
+        usage.add(prompt_bytes(messages), len(content.encode("utf-8")), _usage_of(resp))
+        result = _parse_followup(json.loads(content))
+    except Exception:
+        return None
+    if result is not None:
+        hedge_policy.observe(model, time.monotonic() - started)
+    return result
+
+def _llm_chunks(
+    client: LlmClient,
+    usage: UsageMeter,
+    ents: Dict[str, str],
+    context_topics: List[str],
+    slots: Dict[str, Optional[str]],
+    user_text: str,
+) -> Iterator[str]:
+    """스트리밍 응답의 텍스트 조각 (워커 스레드에서 ChunkPump가 소비)"""
+    messages = build_messages(ents, context_topics, slots, user_text)
+    resp, received, reported = None, 0, None
+    try:
+        with llm_gate.slot():
+            resp = client.chat(
+                model=ft_model_id or "gpt-4o-mini",
+                messages=messages,
+                temperature=0.2,
+                stream=True,
+                stream_options={"include_usage": True},   # 마지막 조각에 usage
+            )
+            for chunk in resp:
+                reported = chunk.get("usage") or reported
+                choices = chunk.get("choices") or []
+                if choices:
+                    text = choices[0].get("delta", {}).get("content") or ""
+                    received += len(text.encode("utf-8"))
+                    yield text
+    finally:
+        if resp is not None:    # 응답을 받기 시작한 호출만 (중간에 끊겨도 받은 만큼)
+            usage.add(prompt_bytes(messages), received, reported)
+
+def _store_followup(cache: FollowupCache, key: str, future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if result is not None:
+        cache.put(key, result)
+
 def _llm_question_only(
     ents: Dict[str, str],
     context_topics: List[str],
     slots: Dict[str, Optional[str]],
     user_text: str,
-) -> Tuple[str, List[str]]:
+    fallback: Followup,
+    branch: Optional[Branch] = None,
+) -> Followup:
     """
     OpenAI로 '질문 1개 + (선택)예/아니오 옵션'만 생성. 공감문 금지.
-    실패 시 규칙 기반 폴백.
+    규칙 기반 질문(fallback)을 먼저 만들어 두고, llm_deadline_s 안에 응답이 없거나 실패하면 그것을 반환.
+    늦게 도착한 LLM 결과는 이번 턴에는 버리고 공유 캐시에만 저장한다.
+    branch: 이 입력(예/아니오 선택지)에 대해 미리 띄워 둔 요청이 있으면 새로 요청하지 않고 그 결과를 쓴다.
+    """
+    client = llm_client()
+    if client is None:
+        return fallback
+
+    cache = followup_cache()
+    key = followup_key(
+        ents, context_topics, slots, model=ft_model_id or "gpt-4o-mini", asked=st.session_state.triage.asked_flags,
+    )
+    if branch is not None:
+        if branch[0] == key:
+            return _commit_branch(cache, key, branch[1]) or fallback
+        _discard_branch(branch)   # 입력은 같아도 맥락이 달라진 가지
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # 워커가 보는 값은 제출 시점의 복사본 (이후 세션 상태 변경과 무관)
+    args = (client, session_usage(), dict(ents), list(context_topics), dict(slots), user_text)
+    primary = ft_model_id or "gpt-4o-mini"
+    if llm_hedge and llm_hedge_model != primary:
+        return _hedged_request(cache, key, args, primary) or fallback
+    try:
+        future = _llm_exec.submit(_llm_request, *args)
+    except LlmRejected:
+        return fallback     # 브레이커 열림/한도 초과: 네트워크 대기 없이 규칙 기반
+    future.add_done_callback(lambda f: _store_followup(cache, key, f))
+    try:
+        result = future.result(timeout=llm_deadline_s)
+    except FuturesTimeout:
+        future.cancel()   # 아직 대기 중이면 취소, 실행 중이면 결과만 폐기
+        return fallback
+    except Exception:
+        return fallback
+    return result or fallback
+
+def _hedged_request(
+    cache: FollowupCache,
+    key: str,
+    args: tuple,
+    primary: str,
+) -> Optional[Followup]:
+    """
+    1차 모델에 요청하고, hedge_policy의 지연(1차 모델 응답 시간의 percentile) 안에 답이 없으면
+    대체 모델(llm_hedge_model)에도 요청한다. 먼저 도착한 유효한 질문을 쓰고 나머지는 취소.
+    전체 대기는 llm_deadline_s까지이며, 늦은 결과는 공유 캐시에만 저장한다.
+    """
+    started = time.monotonic()
+    deadline = started + llm_deadline_s
+    futures: Dict[Future, str] = {}
+    try:
+        futures[_llm_exec.submit(_llm_request, *args, model=primary)] = primary
+    except LlmRejected:
+        return None
+    result, winner = None, None
+    pending = set(futures)
+    hedge_at = started + hedge_policy.delay_s(primary)
+    can_hedge = True
+    while time.monotonic() < deadline:
+        # 1차가 지연 안에 답이 없거나 유효한 답 없이 끝났으면 대체 모델로 한 번 더
+        if can_hedge and (not pending or time.monotonic() >= hedge_at):
+            can_hedge = False
+            try:
+                alt = _llm_exec.submit(_llm_request, *args, model=llm_hedge_model)
+            except LlmRejected:
+                pass      # 관문에서 막히면 1차 모델만 기다린다
+            else:
+                futures[alt] = llm_hedge_model
+                pending.add(alt)
+        if not pending:
+            break
+        until = min(hedge_at, deadline) if can_hedge else deadline
+        done, pending = wait(pending, timeout=max(0.0, until - time.monotonic()), return_when=FIRST_COMPLETED)
+        for f in done:
+            r = f.result()     # _llm_request는 실패를 None으로 돌려준다
+            if r is not None and result is None:
+                result, winner = r, futures[f]
+        if result is not None:
+            break
+    for f in futures:
+        if f in pending:
+            f.cancel()    # 진 쪽: 대기 중이면 취소, 실행 중이면 결과만 캐시로
+        f.add_done_callback(lambda f: _store_followup(cache, key, f))
+    hedge_policy.record(list(futures.values()), winner, time.monotonic() - started)
+    return result
+
+def _stream_followup(
+    ents: Dict[str, str],
+    context_topics: List[str],
+    slots: Dict[str, Optional[str]],
+    user_text: str,
+    fallback: Followup,
+    started: float,
+    render: Callable[[str], None],
+    branch: Optional[Branch] = None,
+) -> Followup:
+    """
+    LLM 응답을 스트리밍으로 받으며 followup 값이 풀리는 대로 render(지금까지의 질문)를 호출한다.
+    첫 토큰이 llm_deadline_s 안에 오지 않거나 스트림이 실패/시한 초과하면 규칙 기반 질문(fallback).
+    선계산된 branch가 있으면 스트리밍 없이 그 결과를 바로 쓴다.
     """
-    if openai is None:
-        return _choose_followup(ents, context_topics)  # 폴백
-
-    system_prompt = (
-        "당신은 한국어 의학 챗봇입니다. 공감 문장은 쓰지 말고, 다음 단계에 꼭 필요한 "
-        "구체적인 질문을 단 한 문장으로 반환하세요. 이미 답한 항목은 반복하지 않습니다. "
-        "가능하면 예/아니오로 답할 수 있는 질문을 선호하세요. "
-        "반드시 JSON만 출력하세요: "
-        "{\"followup\": \"질문?\", \"yesno_options\": [\"선택지1\",\"선택지2\"]}"
+    cache = followup_cache()
+    key = followup_key(
+        ents, context_topics, slots, model=ft_model_id or "gpt-4o-mini", asked=st.session_state.triage.asked_flags,
     )
+    if branch is not None:
+        if branch[0] == key:
+            result = _commit_branch(cache, key, branch[1])
+            turn_latency.record(time.monotonic() - started, source="speculative" if result else "fallback")
+            return result or fallback
+        _discard_branch(branch)   # 입력은 같아도 맥락이 달라진 가지
+    cached = cache.get(key)
+    if cached is not None:
+        turn_latency.record(time.monotonic() - started, source="cache")
+        return cached
 
-    tool_context = {
-        "entities": ents,
-        "context_topics": context_topics,
-        "slots": slots,
-        "rule": "질문은 1개, 공감문 금지, 한국어 존댓말",
-    }
+    try:
+        client, usage = llm_client(), session_usage()
+        pump = ChunkPump(_llm_exec, lambda: _llm_chunks(client, usage, ents, context_topics, slots, user_text))
+    except LlmRejected:
+        turn_latency.record(time.monotonic() - started, source="rejected")
+        return fallback
+    parser = FollowupFieldParser()
+    first: Optional[float] = None
+    rendered = 0.0
+    try:
+        while True:
+            limit = llm_deadline_s if first is None else llm_request_timeout_s
+            chunk = pump.get(timeout=started + limit - time.monotonic())
+            if chunk is None:
+                break
+            if parser.feed(chunk):
+                now = time.monotonic()
+                if first is None:
+                    first = now
+                if now - rendered >= _STREAM_RENDER_INTERVAL_S:
+                    render(parser.text)
+                    rendered = now
+    except Exception:       # 시한 초과(queue.Empty), 스트림 오류, render 실패
+        result = None
+    else:
+        result = _parse_followup(parser.result())
+    finally:
+        pump.cancel()       # 어느 경로로 끝나든 생산 스레드와 HTTP 스트림을 멈춘다 (끝났으면 무동작)
+
+    total = time.monotonic() - started
+    ttft = first - started if first is not None else None
+    if result is None:
+        turn_latency.record(total, source="fallback")
+        return fallback
+    cache.put(key, result)
+    turn_latency.record(total, ttft, source="stream")
+    logger.info("followup streamed: ttft=%.0fms total=%.0fms", (ttft or total) * 1000, total * 1000)
+    return result
 
+# ==============================
+# 예/아니오 선택지 선계산 (speculative)
+# ==============================
+def _commit_branch(cache: FollowupCache, key: str, future: Future) -> Optional[Followup]:
+    """선택된 가지의 결과 (아직 진행 중이면 llm_deadline_s까지 대기). 쓰인 결과만 공유 캐시에 넣는다."""
     try:
-        resp = openai.ChatCompletion.create(
-            model=ft_model_id or "gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"사용자 입력: {user_text}"},
-                {"role": "user", "content": f"컨텍스트: {json.dumps(tool_context, ensure_ascii=False)}"},
-            ],
-            temperature=0.2,
-        )
-        content = resp.choices[0].message["content"]
-        data = json.loads(content)
-        followup = _safe_followup(data.get("followup"))
-        if not followup:
-            return _choose_followup(ents, context_topics)  # 폴백
-        yesno = data.get("yesno_options") or _yesno_options_for(followup)
-        return followup, yesno
+        result = future.result(timeout=llm_deadline_s)
+    except FuturesTimeout:
+        future.cancel()
+        result = None
     except Exception:
-        return _choose_followup(ents, context_topics)  # 폴백
+        result = None
+    speculation_stats["committed" if result else "missed"] += 1
+    if result:
+        cache.put(key, result)
+    return result
+
+def _take_branch(user_text: str) -> Optional[Branch]:
+    """이번 입력에 해당하는 선계산 가지를 꺼내고, 나머지 가지는 버린다 (대기 중이면 취소)"""
+    branches: Dict[str, Branch] = st.session_state.pop("_speculation", None) or {}
+    branch = branches.pop(user_text, None)
+    for other in branches.values():
+        _discard_branch(other)
+    return branch
+
+def _discard_branch(branch: Branch) -> None:
+    """쓰이지 않을 가지: 대기 중이면 취소, 실행 중이면 결과만 버린다"""
+    branch[1].cancel()
+    speculation_stats["discarded"] += 1
+
+def _speculate(session: TriageSession) -> None:
+    """
+    예/아니오 질문이 화면에 나가면 선택지마다 세션 복사본으로 턴 전반부를 돌려 캐시 키를 만들고,
+    캐시에 없는 것만 워커에서 LLM 요청을 미리 띄운다. 세션당 llm_speculative_max 호출까지.
+    """
+    options = session.yesno_options or []
+    client = llm_client()
+    if client is None or not options:
+        return
+    spent = st.session_state.get("_speculative_calls", 0)
+    cache = followup_cache()
+    state = session.to_state()
+    branches: Dict[str, Branch] = {}
+    for opt in options:
+        if spent >= llm_speculative_max:
+            break
+        fork = TriageSession.from_state(state)
+        ents, context_topics, _ = fork.begin_turn(opt)
+        key = followup_key(ents, context_topics, fork.slots, model=ft_model_id or "gpt-4o-mini", asked=fork.asked_flags)
+        if cache.get(key) is not None:
+            continue    # 클릭 시 캐시에서 바로 나온다
+        try:
+            future = _llm_spec_exec.submit(_llm_request, client, session_usage(), ents, context_topics, dict(fork.slots), opt)
+        except LlmRejected:
+            break
+        branches[opt] = (key, future)
+        spent += 1
+        speculation_stats["submitted"] += 1
+    st.session_state._speculative_calls = spent
+    if branches:
+        st.session_state._speculation = branches
+
+def _finish_pending_turn(render: Optional[Callable[[str], None]] = None) -> Optional[str]:
+    """대기 중인 스트리밍 턴을 마무리 (render가 없으면 스트리밍 없이 규칙 기반 질문으로)"""
+    pending = st.session_state.get("_pending_turn")
+    if pending is None:
+        return None
+    session: TriageSession = st.session_state.triage
+    user_text, ents, context_topics, slots, fallback, started, branch = pending
+    if render is None:
+        if branch is not None:
+            _discard_branch(branch)
+        followup, yn_opts, qid = fallback
+        turn_latency.record(time.monotonic() - started, source="fallback")
+    else:
+        followup, yn_opts, qid = _stream_followup(
+            ents, context_topics, slots, user_text, fallback, started, render, branch=branch,
+        )
+    del st.session_state["_pending_turn"]
+    followup = session.finish_turn(followup, yn_opts, qid)
+    if render is not None:
+        _speculate(session)
+    log_metrics()
+    return followup
 
 # 챗봇 대화 응답 생성 (질문만)
 def simulate_model_response(prompt: str) -> None:
-    """사용자 입력 → 슬롯 반영 → (LLM/규칙) 질문 1개 생성 → 상태 반영"""
-    last_q = st.session_state.get("last_assistant_question")
-    if last_q:
-        _apply_yesno_to_slots(last_q, prompt)
-
-    time.sleep(0.2)
-
-    ents = _extract_entities(prompt)
-    recent = " ".join([m["content"] for m in st.session_state.chat_messages[-3:]])
-    context_topics = _detect_topics(recent + " " + prompt)
-
-    # LLM으로 '질문만' 생성 (폴백은 규칙)
-    followup, yn_opts = _llm_question_only(
-        ents=ents,
-        context_topics=context_topics,
-        slots=st.session_state.slots,
-        user_text=prompt,
-    )
-
-    # 기록/상태 업데이트: 질문만 저장
-    if followup and followup.strip():
-        _mark_question_asked_by_text(followup)   
-        st.session_state.chat_messages.append({"role": "assistant", "content": followup})
-
-        if "?" in followup:
-            st.session_state.qa_pairs = st.session_state.get("qa_pairs", 0) + 1
-
-        # 질문일 때만 last_assistant_question 유지
-        if followup.strip().endswith("?"):
-            st.session_state.last_assistant_question = followup
-            st.session_state.yesno_options = yn_opts if yn_opts else None
-        else:
-            st.session_state.last_assistant_question = None
-            st.session_state.yesno_options = None
-            
-        if "진단을 진행하겠습니다" in followup:                       
-            st.session_state.ready_to_diagnose = True
-
-    # 조기 종료 플래그(가슴+통증+숨+식은땀)
-    convo_text = " ".join([m["content"] for m in st.session_state.chat_messages[-8:]])
-    strong_flags = all(flag in convo_text for flag in ["가슴", "통증", "숨"]) and "식은땀" in convo_text
-    if strong_flags:
-        st.session_state.ready_to_diagnose = True
+    """
+    사용자 입력 추가 → 슬롯 반영 → (LLM/규칙) 질문 1개 생성 → 상태 반영.
+    스트리밍 모드에서는 턴 전반부만 하고, 질문은 화면이 stream_model_response()로 받아 그린다.
+    """
+    session: TriageSession = st.session_state.triage
+    if llm_stream and llm_client() is not None:
+        _finish_pending_turn()   # 이전 턴 스트리밍이 중단됐으면 규칙 기반 질문으로 마무리
+        branch = _take_branch(prompt)
+        started = time.monotonic()
+        ents, context_topics, fallback = session.begin_turn(prompt)
+        st.session_state._pending_turn = (prompt, ents, context_topics, dict(session.slots), fallback, started, branch)
+        return
+    branch = _take_branch(prompt)
+    started = time.monotonic()
+    if branch is None:
+        time.sleep(0.2)
+    session.step(prompt, followup_fn=partial(_llm_question_only, branch=branch))
+    turn_latency.record(time.monotonic() - started, source="sync" if branch is None else "speculative")
+    _speculate(session)
+    log_metrics()
+
+def stream_model_response(render: Callable[[str], None]) -> Optional[str]:
+    """
+    스크립트 실행 중에 호출: 대기 중인 턴의 질문을 스트리밍하며 render(부분 질문)로 말풍선을 갱신하고,
+    끝나면 세션에 반영해 추가된 질문을 반환한다 (대기 중인 턴이 없으면 None).
+    """
+    return _finish_pending_turn(render)
 
 # 진단 실행 (룰 기반 폴백)
 def run_diagnosis() -> None:
+    session: TriageSession = st.session_state.triage
     with st.spinner("진단 결과를 분석 중입니다…"):
         time.sleep(1.0)
-
-        convo = " ".join([m["content"] for m in st.session_state.chat_messages])
-        risk_score = 0
-        if "가슴" in convo and "통증" in convo: risk_score += 3
-        if "숨" in convo or "호흡" in convo: risk_score += 2
-        if "식은땀" in convo: risk_score += 2
-        if "실신" in convo: risk_score += 2
-        if "복부" in convo and "통증" in convo: risk_score += 1
-        if "발열" in convo or "열" in convo: risk_score += 1
-
-        triage_result = "응급" if risk_score >= 6 else ("외래" if risk_score >= 3 else "가정")
-        st.session_state.diagnosis["triage_level"] = triage_result
-        st.session_state.diagnosis["summary"] = _generate_summary_from_conversation(st.session_state.chat_messages)
-
-        hospitals = []
-        if st.session_state.location_consent:
-            if triage_result == "응급":
-                hospitals = [
-                    {"name": "A 병원 응급실", "distance_km": 0.8, "address": "서울특별시 동대문구 무학로 124", "phone": "02-123-4567", "doctors": 18, "beds": 42},
-                    {"name": "B 병원 응급실", "distance_km": 1.2, "address": "서울특별시 성북구 고려대로 73", "phone": "02-678-9012"},
-                    {"name": "C 병원 응급실", "distance_km": 2.0, "address": "서울특별시 중랑구 상봉로 31", "phone": "02-345-6789", "doctors": 14, "beds": 55},
-                ]
-            elif triage_result == "외래":
-                hospitals = [
-                    {"name": "C 의원", "distance_km": 0.5, "address": "서울특별시 강북구 도봉로 10", "phone": "02-222-1111", "doctors": 4, "beds": 6},
-                    {"name": "D 내과", "distance_km": 0.9, "address": "서울특별시 강북구 삼양로 220", "phone": "02-333-2222", "doctors": 6, "beds": 8},
-                    {"name": "E 가정의학과", "distance_km": 1.4, "address": "서울특별시 강북구 수유로 88", "phone": "02-444-3333", "doctors": 5, "beds": 10},
-                ]
-        st.session_state.diagnosis["hospitals"] = hospitals
+        if session.location_consent and session.location is None:
+            session.location = _patient_location(session)
+        session.diagnose(
+            directory=hospital_directory(),
+            classifier=ktas_model(),
+            min_confidence=_ktas_min_confidence(),
+        )